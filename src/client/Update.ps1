@@ -2,7 +2,6 @@
 Import-Module PSWindowsUpdate
 $logFilePath = "C:\Temp\UpdateGuardian\update_powershell_log.txt"
 $jsonFilePath = "C:\Temp\UpdateGuardian\update_status.json"
-$lockFilePath = "C:\Temp\UpdateGuardian\update_status.lock"
 
 # Function to log messages with timestamps
 function Write-Log
@@ -24,46 +23,23 @@ function Write-Log
 
 
 
-# Fonction modifiée pour attendre le fichier de verrouillage jusqu'à 10 secondes avant de forcer l'écriture
+# Writes the status to a temporary file, then renames it over the status file, so that update.exe never reads a
+# partially written file and no lock file is needed.
 function Write-JSON {
     param (
         [Parameter(Mandatory = $true)]
         [pscustomobject] $UpdateStatus
     )
 
-    $lockExists = Test-Path -Path $lockFilePath
-    $waitTime = 0
-
-    # Attendre jusqu'à 10 secondes pour que le fichier de verrouillage disparaisse
-    if ($lockExists) {
-        Write-Log "INFO: Lock file detected. Waiting for lock file to be removed before writing JSON."
-    }
-    while ($lockExists -and $waitTime -lt 10) {
-        Start-Sleep -Seconds 1
-        $lockExists = Test-Path -Path $lockFilePath
-        $waitTime++
-    }
-
-    # Si le fichier de verrouillage existe toujours après 10 secondes, log un avertissement et le supprime
-    if ($lockExists) {
-        Write-Log "WARNING: Lock file still exists after waiting. Attempting to override and write JSON."
-        Remove-Item -Path $lockFilePath -Force
-    }
-
-    # Création du fichier de verrouillage
-    Write-Log "INFO: Creating lock file to prevent concurrent writes to JSON file."
-    New-Item -Path $lockFilePath -ItemType File -Force | Out-Null
-
-    # Écriture dans le fichier JSON
-    $UpdateStatus | ConvertTo-Json -Depth 100 | Out-File -FilePath $jsonFilePath -Encoding UTF8
-
-    # Suppression du fichier de verrouillage
-    Write-Log "INFO: Removing lock file after writing JSON."
-    Remove-Item -Path $lockFilePath -Force
+    $temporaryFilePath = "$jsonFilePath.tmp"
+    $UpdateStatus | ConvertTo-Json -Depth 100 | Out-File -FilePath $temporaryFilePath -Encoding UTF8
+    Move-Item -Path $temporaryFilePath -Destination $jsonFilePath -Force
 }
 
-# Initialize JSON object
+# Initialize JSON object. Stage is scanning, scanned, downloading, downloaded, installing then installed, and is sent
+# to the server by update.exe as the progress of the updates.
 $updateStatus = @{
+    Stage = "scanning";
     UpdateCount = 0;
     UpdateNames = @();
     UpdateFinished = $false;
@@ -105,6 +81,7 @@ try
     {
         Write-Log "No updates found" -new_lines 1
         Write-Log "Script ended"
+        $updateStatus.Stage = "scanned"
         $updateStatus.UpdateFinished = $true
         Write-JSON -UpdateStatus $updateStatus
         exit 0
@@ -118,16 +95,24 @@ try
         # Update JSON status
         $updateStatus.UpdateCount++
         $updateStatus.UpdateNames += $update.Title
-        Write-JSON -UpdateStatus $updateStatus
     }
+    $updateStatus.Stage = "scanned"
+    Write-JSON -UpdateStatus $updateStatus
 
     Write-Log "Downloading updates..." -new_lines 1
+    $updateStatus.Stage = "downloading"
+    Write-JSON -UpdateStatus $updateStatus
     $output = Get-WindowsUpdate -Download -AcceptAll -IgnoreReboot | Out-String
     Write-Log $output
+    $updateStatus.Stage = "downloaded"
+    Write-JSON -UpdateStatus $updateStatus
 
     Write-Log "Installing updates..." -new_lines 1
+    $updateStatus.Stage = "installing"
+    Write-JSON -UpdateStatus $updateStatus
     $output = Get-WindowsUpdate -Install -AcceptAll -IgnoreReboot | Out-String
     Write-Log $output
+    $updateStatus.Stage = "installed"
 
 
     Write-Log "Update process completed" -new_lines 1
@@ -0,0 +1,57 @@
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ArtifactRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the client files to the other computers of the subnet, read only, and remembers the last request. Only the
+    files given on the command line are served, not the logs of the folder.
+    """
+
+    def do_GET(self):
+        self.server.last_request = time.monotonic()
+        if self.is_allowed():
+            super().do_GET()
+
+    def do_HEAD(self):
+        self.server.last_request = time.monotonic()
+        if self.is_allowed():
+            super().do_HEAD()
+
+    def is_allowed(self) -> bool:
+        if self.path.lstrip("/") in self.server.file_names:
+            return True
+        self.send_error(404)
+        return False
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(folder: str, port: int, idle_timeout: float, file_names: list[str], host: str = "") -> None:
+    """
+    Serves files of the folder over http, until no request came for idle_timeout seconds.
+    """
+    handler = functools.partial(ArtifactRequestHandler, directory=folder)
+    with ThreadingHTTPServer((host, port), handler) as server:
+        server.file_names = set(file_names)
+        server.last_request = time.monotonic()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while time.monotonic() - server.last_request < idle_timeout:
+            time.sleep(1)
+        server.shutdown()
+
+
+def main(arguments: list[str]) -> int:
+    """
+    update.exe --serve-artifacts <folder> <port> <idle timeout> <file>...: serves the client files to the other
+    computers.
+    """
+    if len(arguments) < 5 or arguments[0] != "--serve-artifacts":
+        print("Usage: update.exe --serve-artifacts <folder> <port> <idle timeout> <file>...")
+        return 2
+    serve(arguments[1], int(arguments[2]), float(arguments[3]), arguments[4:])
+    return 0
@@ -0,0 +1,90 @@
+import hashlib
+import itertools
+import json
+import os
+import struct
+import zlib
+
+# Must stay identical to the format of src/server/update_management/delta_sync.py, which writes the patches.
+PATCH_MAGIC: bytes = b"UGDELTA1"
+COPY_OPERATION: int = 1
+DATA_OPERATION: int = 2
+
+
+def weak_checksum(block: bytes) -> int:
+    """
+    The rolling checksum of rsync: the server computes it at every offset of the new file to find the blocks the
+    computer already has.
+    """
+    a: int = sum(block) & 0xFFFF
+    b: int = sum(itertools.accumulate(block)) & 0xFFFF
+    return a | (b << 16)
+
+
+def strong_checksum(block: bytes) -> str:
+    return hashlib.md5(block).hexdigest()
+
+
+def compute_signature(file_path: str, block_size: int) -> dict:
+    """
+    :return: The checksums of every block of the file, sent to the server so that it only sends the changed blocks.
+    """
+    blocks: list[list] = []
+    with open(file_path, "rb") as file:
+        while block := file.read(block_size):
+            blocks.append([weak_checksum(block), strong_checksum(block)])
+    return {"size": os.path.getsize(file_path), "block_size": block_size, "blocks": blocks}
+
+
+def apply_patch(basis_path: str, patch_path: str, output_path: str) -> None:
+    """
+    Rebuilds the new version of a file from its current version and the patch sent by the server.
+    :raises ValueError: If the patch is invalid, or the rebuilt file is not the one the server has.
+    """
+    with open(patch_path, "rb") as file:
+        patch: bytes = zlib.decompress(file.read())
+    if patch[:len(PATCH_MAGIC)] != PATCH_MAGIC:
+        raise ValueError("The file is not a delta patch.")
+
+    position: int = len(PATCH_MAGIC)
+    block_size, = struct.unpack_from("<I", patch, position)
+    expected_hash: bytes = patch[position + 4:position + 36]
+    position += 36
+
+    hasher = hashlib.sha256()
+    with open(basis_path, "rb") as basis, open(output_path, "wb") as output:
+        while position < len(patch):
+            operation: int = patch[position]
+            if operation == COPY_OPERATION:
+                index, count = struct.unpack_from("<II", patch, position + 1)
+                position += 9
+                basis.seek(index * block_size)
+                chunk: bytes = basis.read(count * block_size)
+            elif operation == DATA_OPERATION:
+                length, = struct.unpack_from("<I", patch, position + 1)
+                chunk = patch[position + 5:position + 5 + length]
+                position += 5 + length
+            else:
+                raise ValueError(f"Unknown delta operation {operation}.")
+            output.write(chunk)
+            hasher.update(chunk)
+
+    if hasher.digest() != expected_hash:
+        os.remove(output_path)
+        raise ValueError("The patched file does not match the file of the server.")
+
+
+def main(arguments: list[str]) -> int:
+    """
+    update.exe --delta-signature <file> <block size>: prints the signature of the file in json.
+    update.exe --delta-patch <file> <patch> <output>: writes the patched file to output.
+    """
+    if len(arguments) == 3 and arguments[0] == "--delta-signature":
+        print(json.dumps(compute_signature(arguments[1], int(arguments[2]))))
+        return 0
+    if len(arguments) == 4 and arguments[0] == "--delta-patch":
+        apply_patch(arguments[1], arguments[2], arguments[3])
+        print("DELTA_APPLIED")
+        return 0
+    print("Usage: update.exe --delta-signature <file> <block size> | --delta-patch <file> <patch> <output>")
+    return 2
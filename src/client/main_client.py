@@ -1,5 +1,8 @@
 import logging
+import sys
 
+import artifact_server
+import delta_sync
 from update_windows import start_client_update
 
 LOGS_FILENAME: str = "update_windows.log"
@@ -28,4 +31,8 @@ def main_loop() -> None:
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1].startswith("--delta-"):
+        sys.exit(delta_sync.main(sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve-artifacts":
+        sys.exit(artifact_server.main(sys.argv[1:]))
     main_loop()
@@ -5,7 +5,7 @@ a = Analysis(
     ['main_client.py'],
     pathex=[],
     binaries=[],
-    datas=[('update_windows.py', '.')],
+    datas=[('update_windows.py', '.'), ('delta_sync.py', '.'), ('artifact_server.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
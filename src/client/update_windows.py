@@ -12,8 +12,7 @@ import psutil
 import requests
 
 counter: int = 0
-
-lock_file_path = "C:\\Temp\\UpdateGuardian\\update_status.lock"
+last_stage: str | None = None
 
 
 class SystemPowerStatus(ctypes.Structure):
@@ -36,8 +35,17 @@ GetSystemPowerStatus.restype = wintypes.BOOL
 TEMP_FOLDER = "C:\\Temp"
 UPDATE_FOLDER = os.path.join(TEMP_FOLDER, 'UpdateGuardian')
 STATUS_FILENAME = os.path.join(UPDATE_FOLDER, "update_status.json")
+RESULTS_FILENAME = "results.json"
 SCRIPT_PATH = os.path.abspath("Update.ps1")
 TASK_NAME = "TestTask"
+# The last line printed by update.exe, read by the server from the output of the command instead of downloading
+# results.json.
+RESULT_EVENT = "result"
+PROGRESS_EVENT = "progress"
+
+FILE_NOTIFY_CHANGE_FILE_NAME = 0x1
+FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+WAIT_TIMEOUT_MS = 5000
 
 
 def is_on_ac_power():
@@ -127,15 +135,38 @@ def save_updates_info():
     json_infos = get_updates_info()
     if json_infos is None:
         print_and_log_client("Error occurred while getting updates infos.", "error")
-        with open("results.json", "w") as file:
-            with open(STATUS_FILENAME, "r") as file_read:
-                file.write(file_read.read())
-                os.remove(STATUS_FILENAME)
-                return
-    with open("results.json", "w") as json_file:
-        json.dump(json_infos, json_file)
+        with open(STATUS_FILENAME, "r", encoding="utf-8-sig") as file_read:
+            content = file_read.read()
+        write_file_atomically(RESULTS_FILENAME, content)
+        os.remove(STATUS_FILENAME)
+        print_result_event(content)
+        return
+    content = json.dumps(json_infos)
+    write_file_atomically(RESULTS_FILENAME, content)
     os.remove(STATUS_FILENAME)
     print_and_log_client("Windows Update finished, json file dumped.")
+    print_result_event(content)
+
+
+def write_file_atomically(file_path: str, content: str) -> None:
+    """
+    Writes a temporary file, then renames it over the file, so that the file is never read partially written.
+    """
+    temporary_file_path = file_path + ".tmp"
+    with open(temporary_file_path, "w") as file:
+        file.write(content)
+    os.replace(temporary_file_path, file_path)
+
+
+def print_result_event(content: str) -> None:
+    """
+    Prints the results as a single json line on stdout, the last one of the program.
+    """
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        result = {"ErrorMessage": "The update status file is not valid json.", "UpdateFinished": False}
+    print(json.dumps({"event": RESULT_EVENT, "data": result}), flush=True)
 
 
 def process_data_json_updates_results(data: dict):
@@ -177,10 +208,24 @@ def check_file_empty(file_path):
 def process_json_file(file_path):
     with open(file_path, 'r', encoding="utf-8-sig") as json_file:
         data = json.load(json_file)
+        print_progress_event(data)
         will_return, res = process_data_json_updates_results(data)
         return will_return, res
 
 
+def print_progress_event(data: dict) -> None:
+    """
+    Prints the stage of the updates as a json line on stdout when it changed, read by the server while the updates run.
+    """
+    global last_stage
+    stage = data.get("Stage", None)
+    if stage is None or stage == last_stage:
+        return
+    last_stage = stage
+    progress = {"Stage": stage, "UpdateCount": data.get("UpdateCount", 0), "UpdateNames": data.get("UpdateNames", [])}
+    print(json.dumps({"event": PROGRESS_EVENT, "data": progress}), flush=True)
+
+
 def handle_json_decode_error(e, json_file_path):
     global counter
     with open(json_file_path, 'r', encoding="utf-8-sig") as faulty_json_file:
@@ -202,71 +247,76 @@ def handle_general_error(e):
     sys.exit(0)
 
 
-def wait_for_lock_to_release(max_wait_time=20):
-    wait_time = 0
-    while os.path.exists(lock_file_path) and wait_time < max_wait_time:
-        if wait_time == 0:  # Log only at the beginning
-            print_and_log_client("Lock file exists. Waiting for it to be released...", "info")
-        time.sleep(1)
-        wait_time += 1
-    if os.path.exists(lock_file_path):
-        print_and_log_client(f"Lock file still exists after waiting {max_wait_time} seconds."
-                             "There is likely a deadlock. Exiting program", "error")
-        sys.exit(1)
-    else:
-        if wait_time > 0:  # If we waited, log that the lock was released
-            print_and_log_client(f"Lock file released after {max_wait_time} seconds. "
-                                 "Reading the file...", "info")
+class FolderChangeWatcher:
+    """
+    Waits for a file of a folder to be written or renamed, instead of checking it every second. The changes are
+    signaled from the creation of the watcher, so a change between two checks is not missed. It waits at most
+    WAIT_TIMEOUT_MS, and falls back on sleeping if the folder cannot be watched.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.handle = None
+
+    def __enter__(self):
+        kernel32 = ctypes.windll.kernel32
+        kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+        handle = kernel32.FindFirstChangeNotificationW(self.folder, False, FILE_NOTIFY_CHANGE_FILE_NAME
+                                                       | FILE_NOTIFY_CHANGE_LAST_WRITE)
+        if handle is not None and handle != wintypes.HANDLE(-1).value:
+            self.handle = handle
+        return self
+
+    def wait(self) -> None:
+        if self.handle is None:
+            time.sleep(1)
+            return
+        ctypes.windll.kernel32.WaitForSingleObject(wintypes.HANDLE(self.handle), WAIT_TIMEOUT_MS)
+        ctypes.windll.kernel32.FindNextChangeNotification(wintypes.HANDLE(self.handle))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.handle is not None:
+            ctypes.windll.kernel32.FindCloseChangeNotification(wintypes.HANDLE(self.handle))
+            self.handle = None
 
 
 def get_updates_info() -> dict | None:
     global counter
     already_printed: bool = False
-    json_file_path: str = "C:\\Temp\\updateguardian\\update_status.json"
-    lock_file = None
-    while True:
-        if not file_exists(json_file_path, already_printed):
-            already_printed = True
-            time.sleep(1)
-            continue
-
-        if already_printed:
-            print_and_log_client("File exists, processing...")
-            already_printed = False
-
-        try:
-            wait_for_lock_to_release()  # Attente pour la libération du fichier de verrouillage
-            lock_file = open(lock_file_path, "w")
-            if check_file_empty(json_file_path):
-                time.sleep(1)
+    json_file_path: str = STATUS_FILENAME
+    # The status file is renamed in place by Update.ps1 once written, so it is always complete when it exists.
+    with FolderChangeWatcher(UPDATE_FOLDER) as watcher:
+        while True:
+            if not file_exists(json_file_path, already_printed):
+                already_printed = True
+                watcher.wait()
                 continue
-            will_return, res = process_json_file(json_file_path)
-            if will_return:
-                return res
-            counter = 0
-            lock_file.close()
-            os.remove(lock_file_path)
-            lock_file = None
-        except json.JSONDecodeError as e:
-            handle_json_decode_error(e, json_file_path)
-            if counter >= 20:
-                print_and_log_client("JSONDecodeError occurred 20 times. Exiting...")
+
+            if already_printed:
+                print_and_log_client("File exists, processing...")
+                already_printed = False
+
+            try:
+                if check_file_empty(json_file_path):
+                    watcher.wait()
+                    continue
+                will_return, res = process_json_file(json_file_path)
+                if will_return:
+                    return res
+                counter = 0
+            except json.JSONDecodeError as e:
+                handle_json_decode_error(e, json_file_path)
+                if counter >= 20:
+                    print_and_log_client("JSONDecodeError occurred 20 times. Exiting...")
+                    return None
+            except FileNotFoundError as e:
+                handle_file_not_found_error(e, already_printed=already_printed)
+                already_printed = True
+            except Exception as e:
+                handle_general_error(e)
                 return None
-        except FileNotFoundError as e:
-            handle_file_not_found_error(e, already_printed=already_printed)
-            already_printed = True
-        except Exception as e:
-            handle_general_error(e)
-            return None
-        finally:
-            if os.path.exists(lock_file_path) and lock_file is not None:
-                lock_file.close()
-                os.remove(lock_file_path)
-                lock_file = None
-
-            # If the file is there, but not handled by the program, it will be checked again
-            # and if it is a mistake, it will be signaled in wait_for_lock_to_release
-            time.sleep(1)
+
+            watcher.wait()
 
 
 def check_internet_connection():
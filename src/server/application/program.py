@@ -10,6 +10,7 @@ from src.server.factory.auto_update_factory import AutoUpdateFactory
 
 from src.server.application.cli import Cli
 from src.server.application.scheduler_manager import SchedulerManager
+from src.server.infrastructure.rollout_config import RolloutConfig
 from src.server.infrastructure.setup_manager import SetupManager
 from src.server.logs_management.server_logger import log_error
 from src.server.update_management.network_update_manager import UpdateManager
@@ -32,7 +33,11 @@ class Program:
         return args.force
 
     def start(self, args):
-        if self.already_updated(args):
+        # The rollouts configure them again from config.json, the other commands of the cli use these settings.
+        RolloutConfig.load().apply()
+        if args.resume:
+            self.update_manager.resume_update()
+        elif self.already_updated(args):
             self.update_manager.force_execute_update(already_updated=True)
         else:
             AutoUpdateFactory.create_auto_update(force_update=False).update()
@@ -63,5 +68,7 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--force", action="store_true")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume the last rollout if the server stopped in the middle of it.")
     arguments = parser.parse_args()
     Program().start(arguments)
@@ -7,3 +7,5 @@ class Computer:
     hostname: str
     mac_address: str
     username: str
+    # The code page of the console of the computer, learned by its OutputDecoder.
+    encoding: str | None = None
@@ -0,0 +1,63 @@
+import json
+import os
+from threading import Lock
+
+from src.server.infrastructure.paths import ServerPath
+
+
+class HostRecordStore:
+    """
+    Saves what is learned about a computer during a rollout (for instance the code page of its console) in its record
+    of computers_database.json. The values are kept in memory as they are learned, and written all at once by flush,
+    at the end of the rollout: the file is read and written under the lock of the database, and replaced at once, so
+    that the other records are not lost.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path: str | None = path
+        self.lock = Lock()
+        self.pending_lock = Lock()
+        self.pending: dict[str, dict] = {}
+
+    def get_path(self) -> str:
+        return self.path if self.path is not None else ServerPath.get_database_path()
+
+    def update(self, hostname: str, values: dict) -> None:
+        """
+        Keeps values of the record of a computer, until the next flush.
+        :param hostname: The hostname of the computer.
+        :param values: The keys of the record to set.
+        """
+        with self.pending_lock:
+            self.pending.setdefault(hostname, {}).update(values)
+
+    def flush(self) -> int:
+        """
+        Writes the values kept since the last flush in the database, with a single write.
+        :return: The number of records saved. The computers that are not in the database are ignored.
+        """
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+
+        path: str = self.get_path()
+        with self.lock:
+            try:
+                with open(path, "r") as file:
+                    hosts: dict = json.load(file)
+            except FileNotFoundError:
+                return 0
+            saved: int = 0
+            for hostname, values in pending.items():
+                if hostname in hosts:
+                    hosts[hostname].update(values)
+                    saved += 1
+            temporary_path: str = path + ".tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(hosts, file, indent=4)
+            os.replace(temporary_path, path)
+            return saved
+
+
+host_record_store = HostRecordStore()
@@ -0,0 +1,73 @@
+import asyncio
+
+
+async def is_port_open(ip: str, port: int = 22, timeout: float = 5.0) -> bool:
+    """
+    Non-blocking version of RemoteComputerManager.is_pc_on, to be awaited from the event loop.
+    :param ip: The ip address of the computer to probe.
+    :param port: The port to test.
+    :param timeout: How long to wait for the TCP handshake, in seconds.
+    :return: True if a TCP connection could be opened on the port, False otherwise.
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+    except (asyncio.TimeoutError, OSError):
+        return False
+
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def wait_for_port_state(ip: str, is_open: bool, timeout: float, port: int = 22,
+                              probe_timeout: float = 5.0, interval: float = 5.0) -> bool:
+    """
+    Waits, without holding any thread, until the port of a computer is open (or closed).
+    :param ip: The ip address of the computer to probe.
+    :param is_open: The state to wait for. True to wait for the computer to be up, False to wait for it to be down.
+    :param timeout: How long to wait for the state, in seconds.
+    :param port: The port to test.
+    :param probe_timeout: The timeout of a single probe.
+    :param interval: How long to sleep between two probes.
+    :return: True if the state was reached before the timeout, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if await is_port_open(ip, port, probe_timeout) == is_open:
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+
+async def scan_reachability(ips: list[str], port: int = 22, timeout: float = 5.0,
+                            max_probes_in_flight: int = 256) -> dict[str, bool]:
+    """
+    Probes the port of every computer concurrently. The whole fleet is scanned in about one timeout period, as long
+    as it has fewer computers than max_probes_in_flight.
+    :param ips: The ip addresses of the computers to probe.
+    :param port: The port to test.
+    :param timeout: How long to wait for the TCP handshake of each computer, in seconds.
+    :param max_probes_in_flight: The maximum number of sockets open at the same time.
+    :return: Whether the port is open, by ip address.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_probes_in_flight))
+
+    async def probe(ip: str) -> bool:
+        async with semaphore:
+            return await is_port_open(ip, port, timeout)
+
+    unique_ips: list[str] = list(dict.fromkeys(ips))
+    states: list[bool] = await asyncio.gather(*(probe(ip) for ip in unique_ips))
+    return dict(zip(unique_ips, states))
+
+
+def scan_reachability_blocking(ips: list[str], port: int = 22, timeout: float = 5.0,
+                               max_probes_in_flight: int = 256) -> dict[str, bool]:
+    """
+    Same as scan_reachability, for the code not running in an event loop.
+    """
+    return asyncio.run(scan_reachability(ips, port, timeout, max_probes_in_flight))
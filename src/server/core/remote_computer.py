@@ -6,6 +6,7 @@ from src.server.core.computer import Computer
 from src.server.infrastructure.paths import ServerPath
 from src.server.logs_management.computer_logger import ComputerLogger
 from src.server.ssh.connect import SSHConnect
+from src.server.ssh.connection_pool import ssh_connection_pool
 from src.server.ssh.ssh_key_manager import SSHKeyManager
 
 
@@ -16,6 +17,7 @@ class RemoteComputer:
         self.computer_logger = None
         self.ssh_key_manager = SSHKeyManager(computer, self.log_error, self.log)
         self.ssh_session: paramiko.SSHClient | None = None
+        self.last_connection_error: Exception | None = None
 
         if init_logger:
             self.computer_logger = ComputerLogger(self.logs_filename)
@@ -33,8 +35,15 @@ class RemoteComputer:
     def get_hostname(self):
         return self.__computer.hostname
 
+    def get_encoding(self) -> str | None:
+        return self.__computer.encoding
+
+    def set_encoding(self, encoding: str) -> None:
+        self.__computer.encoding = encoding
+
     def connect(self):
         self.log(message=f"Connecting to {self.get_hostname()} computer via SSH...")
+        self.last_connection_error = None
         try:
             if not self.connect_ssh_procedures():
                 return False
@@ -42,6 +51,7 @@ class RemoteComputer:
             self.log(f"Connected via SSH to computer {self.get_hostname()}.")
             return True
         except paramiko.AuthenticationException as e:
+            self.last_connection_error = e
             self.log_add_vertical_space()
             self.log_error("Authentication failed: " + str(e))
             self.log_error(f"Please, check your username and password for the computer {self.get_hostname()}.")
@@ -57,21 +67,43 @@ class RemoteComputer:
                            f"\n\tusername: {self.get_username()}")
             return False
         except Exception as e:
+            self.last_connection_error = e
             self.log_error(f"Unhandled error. Could not connect to {self.get_hostname()}:\n " + str(e))
             self.log_error(f"Here is the traceback: \n{traceback.format_exc()}\n")
             return False
 
     def connect_ssh_procedures(self) -> bool:
+        """
+        Gets the session of the computer from the SSH connection pool. A handshake is only made if there is no healthy
+        session.
+        """
+        self.ssh_session = ssh_connection_pool.get_session(self.get_hostname(), self.open_ssh_session)
+        return self.ssh_session is not None
+
+    def open_ssh_session(self) -> paramiko.SSHClient | None:
         private_key = self.ssh_key_manager.get_private_key()
         if not private_key:
             self.log_error("Could not get the private key.")
-            return False
-        self.ssh_session: paramiko.SSHClient = SSHConnect.private_key_connexion(self.__computer, private_key)
-        return True
+            return None
+        return SSHConnect.private_key_connexion(self.__computer, private_key)
 
     def get_ssh_session(self) -> paramiko.SSHClient:
         return self.ssh_session
 
+    def borrow_ssh_session(self) -> paramiko.SSHClient | None:
+        """
+        :return: The SSH session, transparently reconnected if it died. None if the computer was never connected.
+        """
+        if self.ssh_session is None or ssh_connection_pool.is_healthy(self.ssh_session):
+            return self.ssh_session
+
+        self.log("The SSH session is not active anymore, reconnecting...")
+        try:
+            self.connect_ssh_procedures()
+        except (paramiko.SSHException, OSError) as e:
+            self.log_error(f"Could not reconnect to {self.get_hostname()}: {e}")
+        return self.ssh_session
+
     def log_add_vertical_space(self, new_lines: int = 1, print_in_console: bool = False):
         self.computer_logger.log_add_vertical_space(new_lines=new_lines, print_in_console=print_in_console)
 
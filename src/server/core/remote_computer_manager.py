@@ -2,23 +2,39 @@ import hashlib
 import logging
 import socket
 import time
+from typing import Callable
 
 import paramiko
 
+from src.server.core.host_records import host_record_store
 from src.server.core.remote_computer import RemoteComputer
 from src.server.factory.ssh_commands_factory import SSHCommandsFactory
 from src.server.infrastructure.paths import ServerPath, ClientPath
 from src.server.security.encryption import Hasher
 from src.server.wake_on_lan.wake_on_lan_utils import send_wol
 from src.server.ssh.commands import SSHCommands, SSHCommandResult
+from src.server.ssh.output_decoder import OutputDecoder
+from src.server.ssh.sftp_session import sftp_settings
 
 
 class RemoteComputerManager:
     def __init__(self, computer: 'RemoteComputer') -> None:
         self.remote_computer: 'RemoteComputer' = computer
-        self.ssh_commands: 'SSHCommands' = SSHCommandsFactory.create(computer.get_ssh_session())
+        self.ssh_commands: 'SSHCommands' = SSHCommandsFactory.create(
+            computer.get_ssh_session(), computer.borrow_ssh_session,
+            OutputDecoder(computer.get_encoding(), self.save_encoding)
+        )
         self.paths: 'ClientPath' = ClientPath(self.get_hostname(), self.get_username())
 
+    def save_encoding(self, encoding: str) -> None:
+        """
+        Keeps the code page of the computer in its record, so that it is not learned again by the next rollouts. The
+        records are written at the end of the rollout.
+        """
+        self.remote_computer.set_encoding(encoding)
+        self.log(f"Code page of the computer: {encoding}.")
+        host_record_store.update(self.get_hostname(), {"encoding": encoding})
+
     def set_ssh_session_to_commands(self) -> None:
         self.ssh_commands.set_ssh_session(self.remote_computer.get_ssh_session())
 
@@ -30,6 +46,31 @@ class RemoteComputerManager:
         """
         return self.ssh_commands.execute_command(command)
 
+    def execute_command_streaming(self, command: str, on_line: Callable[[str], None],
+                                  timeout: float | None = None) -> SSHCommandResult:
+        """
+        Executes a command on the remote computer, giving every line of its stdout to on_line as soon as it is
+        received.
+        :param command: The command to execute.
+        :param on_line: Called with every line of stdout.
+        :param timeout: The deadline of the command in seconds, the default one if None.
+        """
+        return self.ssh_commands.execute_command_streaming(command, on_line, timeout)
+
+    def execute_powershell(self, script: str, timeout: float | None = None) -> SSHCommandResult:
+        """
+        Runs a PowerShell script on the remote computer, in its persistent shell if it is enabled.
+        :param script: The script to run.
+        :param timeout: The deadline of the script in seconds, the default one if None.
+        """
+        return self.ssh_commands.execute_powershell(script, timeout)
+
+    def cancel_commands(self) -> None:
+        """
+        Interrupts the commands running on the computer, and kills them on the computer.
+        """
+        self.ssh_commands.cancel_commands()
+
     def is_pc_on(self, port: int = 22, timeout: float = 5.0, print_log_connected: bool = True) -> bool:
         """
         Give true if the pc is on.
@@ -89,9 +130,9 @@ class RemoteComputerManager:
         """
         self.log("Stopping sshd service...")
 
-        result = self.execute_command("powershell -Command \"Stop-Service sshd\"")
+        result = self.execute_powershell("Stop-Service sshd")
         if result.stderr:
-            self.log_error("Failed to stop sshd service. \nStderr: \n" + stderr)
+            self.log_error("Failed to stop sshd service. \nStderr: \n" + result.stderr)
             return False
 
         self.log("Sshd service stopped.")
@@ -104,27 +145,27 @@ class RemoteComputerManager:
         :param retry_interval: How long to wait between each attempt to connect to the ssh server.
         :return: A boolean, True if the ssh server is available and the computer is reconnected to it, False otherwise.
         """
-        self.ssh_commands.close_ssh_session()
+        self.close_ssh_session()
 
         start_time = time.time()
         connected = False
 
         original_logging_level = logging.getLogger("paramiko").level
         logging.getLogger("paramiko").setLevel(logging.NOTSET)
-        attempts: int = 5
 
         # Try to connect to the ssh server every retry_interval seconds until timeout is reached
         while time.time() - start_time < timeout and not connected:
             try:
                 if not self.is_pc_on(timeout=retry_interval):
                     continue
-                success_count = 0
-                for _ in range(attempts):  # check connection stability n times
-                    self.remote_computer.connect_ssh_procedures()
-                    success_count += 1
-                    time.sleep(0.2)
 
-                if success_count >= attempts:  # if all n connection attempts succeeded
+                # A single handshake, then a round trip on the session to make sure the ssh server is stable.
+                if not self.remote_computer.connect_ssh_procedures():
+                    time.sleep(retry_interval)
+                    continue
+                self.set_ssh_session_to_commands()
+                time.sleep(1)
+                if self.execute_command("echo ok").stdout == "ok":
                     connected = True
                     self.remote_computer.log("Connected to remote computer via SSH.")
 
@@ -140,26 +181,37 @@ class RemoteComputerManager:
         logging.getLogger("paramiko").setLevel(original_logging_level)
         return connected
 
-    def is_client_file_different(self, remote_file_path: str, local_file_path: str) -> bool:
+    def get_files_sha256(self, remote_file_paths: list[str]) -> list[str | None]:
+        """
+        Computes the sha256 of files on the remote computer, in a single round trip.
+        :param remote_file_paths: The paths of the files on the remote computer.
+        :return: The hash of every file, an empty string if it does not exist, None if it could not be computed.
+        """
+        return self.ssh_commands.get_files_sha256(remote_file_paths)
+
+    def is_client_file_different(self, remote_file_path: str, local_file_path: str,
+                                 local_hash: str | None = None) -> bool:
         """
         Checks if a file on the remote computer is different from a local file.
         :param remote_file_path: The path of the file on the remote computer.
         :param local_file_path: The path of the file on the local computer.
+        :param local_hash: The sha256 of the local file, if it is already known.
         :return: True if the files are different, False otherwise.
         """
-        # Create the sftp session
+        # The sftp session of the computer, shared, so it is not closed here
         sftp = self.ssh_commands.get_sftp()
 
         try:
-            # Get the remote file content
+            # Calculate the cryptographic summary of the remote file, read by chunks prefetched in parallel
+            hasher = hashlib.sha256()
             with sftp.open(remote_file_path, 'rb') as remote_file:
-                contenu_distant = remote_file.read()
-
-            # Calculate the cryptographic summary of the remote file
-            hachage_distant = hashlib.sha256(contenu_distant).hexdigest()
+                remote_file.prefetch(max_concurrent_requests=sftp_settings.max_prefetch_requests)
+                while chunk := remote_file.read(Hasher.CHUNK_SIZE):
+                    hasher.update(chunk)
+            hachage_distant = hasher.hexdigest()
 
             # Calculate the cryptographic summary of the local file
-            hachage_local = Hasher.sha256(local_file_path)
+            hachage_local = local_hash if local_hash is not None else Hasher.sha256(local_file_path)
 
             # Compare the two summaries
             return hachage_distant == hachage_local
@@ -169,12 +221,21 @@ class RemoteComputerManager:
                                      f"The local path that is not checked : {local_file_path}", level="warning")
             # False because the file is not on the remote computer, so it will be sent
             return False
-        finally:
-            sftp.close()
 
     def does_path_exists(self, file_path: str) -> bool:
         return self.ssh_commands.does_path_exists(file_path)
 
+    def do_paths_exist(self, file_paths: list[str]) -> list[bool]:
+        return self.ssh_commands.do_paths_exist(file_paths)
+
+    def batch(self, commands: list[str]) -> list[SSHCommandResult]:
+        """
+        Executes many commands on the remote computer in a single round trip.
+        :param commands: The commands to execute, in order.
+        :return: The result of every command, with its exit code, in the same order.
+        """
+        return self.ssh_commands.batch(commands)
+
     def reboot(self):
         """
         Reboots the remote computer.
@@ -221,6 +282,23 @@ class RemoteComputerManager:
         """
         return self.ssh_commands.delete_file(self.remote_computer, file_path)
 
+    def read_file(self, file_path: str) -> str | None:
+        """
+        Reads a small text file on the remote computer.
+        :param file_path: The path of the file to read.
+        :return: The content of the file, or None if it could not be read.
+        """
+        return self.ssh_commands.read_file(file_path)
+
+    def write_file(self, file_path: str, content: str) -> bool:
+        """
+        Writes a small text file on the remote computer.
+        :param file_path: The path of the file to write.
+        :param content: The content of the file.
+        :return: True if the file was written successfully, False otherwise.
+        """
+        return self.ssh_commands.write_file(file_path, content)
+
     def download_file(self, remote_file_path: str, local_file_path: str) -> bool:
         """
         Downloads a file from the remote computer.
@@ -246,13 +324,13 @@ class RemoteComputerManager:
         :param remote_path: The path where to save the files.
         :return: True if the files were uploaded successfully, False otherwise.
         """
-        return self.ssh_commands.upload_files(files, remote_path)
+        return self.ssh_commands.upload_files(files, remote_path, self.remote_computer)
 
     def close_ssh_session(self) -> None:
         """
         Closes the ssh session.
         """
-        self.ssh_commands.close_ssh_session()
+        self.ssh_commands.close_ssh_session(self.remote_computer.get_hostname())
 
     def connect_if_awake(self) -> bool:
         if not self.is_pc_on(timeout=20):
@@ -275,7 +353,7 @@ class RemoteComputerManager:
         Turn on the pc to update windows.
         :return: True if the pc is on, False otherwise.
         """
-        send_wol(mac_address=self.get_mac_address(), ip_address=self.get_ipv4())
+        self.send_wake_on_lan()
 
         if not self.is_pc_on(timeout=20):
             self.log_error("Error, the pc is still off.")
@@ -284,6 +362,12 @@ class RemoteComputerManager:
         self.log("The pc is awake...")
         return True
 
+    def send_wake_on_lan(self) -> None:
+        """
+        Sends a wake on lan packet to the pc, without waiting for it to be awake.
+        """
+        send_wol(mac_address=self.get_mac_address(), ip_address=self.get_ipv4())
+
     def download_log_file_ssh(self) -> bool:
         """
         Download the log file from the client.
@@ -309,6 +393,12 @@ class RemoteComputerManager:
     def get_sftp(self) -> paramiko.SFTPClient:
         return self.ssh_commands.get_sftp()
 
+    def get_local_address(self) -> str:
+        """
+        :return: The address of the server on the network of the computer: the local address of its SSH connection.
+        """
+        return self.ssh_commands.commands.get_ssh_session().get_transport().sock.getsockname()[0]
+
     def get_private_key_filepath(self):
         return self.remote_computer.get_private_key_filepath()
 
@@ -1,11 +1,12 @@
 import json
 import os.path
 
-from threading import Lock
-
+from src.server.core.host_records import host_record_store
+from src.server.core.reachability import scan_reachability_blocking
 from src.server.core.remote_computer_manager import RemoteComputerManager
 from src.server.factory.remote_computer_manager_factory import RemoteComputerManagerFactory
 from src.server.infrastructure.paths import ServerPath
+from src.server.infrastructure.rollout_config import RolloutConfig
 from src.server.report.mails import load_email_infos
 from src.server.ssh.ssh_keygen import gen_keys_and_save_them
 from src.server.infrastructure.config import Infos
@@ -17,7 +18,8 @@ class RemoteComputerDatabase:
     It loads the computers from the computers_database.json file.
     It contains a list of Computer objects and methods to add, remove, and find computers.
     """
-    computer_database_lock = Lock()
+    # Shared with the HostRecordStore, which saves the records of the computers during a rollout.
+    computer_database_lock = host_record_store.lock
 
     def __init__(self) -> None:
         """
@@ -148,10 +150,27 @@ class RemoteComputerDatabase:
 
 
     def shutdown_all_computers(self):
+        """
+        Shuts down the computers that are on. The whole fleet is probed at once, and the computers that are already
+        off are skipped.
+        """
+        config: RolloutConfig = RolloutConfig.load()
+        config.apply()
+        reachability_config = config.reachability
+        states: dict[str, bool] = scan_reachability_blocking(
+            [computer.get_ipv4() for computer in self.computers],
+            timeout=reachability_config.probe_timeout,
+            max_probes_in_flight=reachability_config.max_probes_in_flight
+        )
         for computer in self.computers:
-            if not computer.connect_if_awake():
+            if not states[computer.get_ipv4()]:
+                computer.log("The computer is already off.")
+                continue
+            if not computer.connect():
+                computer.log("Could not connect to computer...", "warning")
                 continue
             computer.shutdown()
+        host_record_store.flush()
 
     @staticmethod
     def load_email_infos():
@@ -58,7 +58,7 @@ class ComputerUpdaterManagerFactory(HostFactory):
             raise ValueError("The dictionary must contain the following keys: ipv4, hostname, mac_address, username."
                              "Here is the dictionary: \n" + str(dict_computer))
 
-        computer = Computer(ipv4, hostname, mac_address, username)
+        computer = Computer(ipv4, hostname, mac_address, username, dict_computer.get("encoding", None))
         remote_computer = RemoteComputer(computer, init_logger)
         remote_computer_manager = RemoteComputerManager(remote_computer)
         return ComputerUpdateManager(remote_computer_manager)
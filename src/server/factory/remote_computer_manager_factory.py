@@ -56,7 +56,7 @@ class RemoteComputerManagerFactory:
             raise ValueError("The dictionary must contain the following keys: ipv4, hostname, mac_address, username."
                              "Here is the dictionary: \n" + str(dict_computer))
 
-        computer = Computer(ipv4, hostname, mac_address, username)
+        computer = Computer(ipv4, hostname, mac_address, username, dict_computer.get("encoding", None))
         remote_computer = RemoteComputer(computer, init_logger)
         return RemoteComputerManager(remote_computer)
 
@@ -81,7 +81,7 @@ class RemoteComputerManagerFactory:
             raise ValueError("The dictionary must contain the following keys: ipv4, hostname, mac_address, username."
                              "Here is the dictionary: \n" + str(dict_computer))
 
-        computer = Computer(ipv4, hostname, mac_address, username)
+        computer = Computer(ipv4, hostname, mac_address, username, dict_computer.get("encoding", None))
         remote_computer = RemoteComputer(computer, init_logger)
         remote_computer.ssh_session = ssh
         return RemoteComputerManager(remote_computer)
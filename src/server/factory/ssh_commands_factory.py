@@ -1,6 +1,9 @@
+from typing import Callable
+
 import paramiko
 
 from src.server.ssh.commands import SSHCommands, SSHCommandExecutor
+from src.server.ssh.output_decoder import OutputDecoder
 
 
 class SSHCommandsFactory:
@@ -9,11 +12,14 @@ class SSHCommandsFactory:
     """
 
     @staticmethod
-    def create(ssh: paramiko.SSHClient) -> SSHCommands:
+    def create(ssh: paramiko.SSHClient, session_provider: Callable[[], paramiko.SSHClient] | None = None,
+               decoder: OutputDecoder | None = None) -> SSHCommands:
         """
         Creates an SSHCommands object.
         :param ssh: The ssh session.
+        :param session_provider: The function giving the session to use for every command, if any.
+        :param decoder: The decoder of the outputs of the computer, a new one learning its code page if None.
         :return: The SSHCommands object.
         """
-        ssh_command_executor: SSHCommandExecutor = SSHCommandExecutor(ssh)
+        ssh_command_executor: SSHCommandExecutor = SSHCommandExecutor(ssh, session_provider, decoder)
         return SSHCommands(ssh_command_executor)
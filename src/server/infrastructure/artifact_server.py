@@ -0,0 +1,227 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.server.logs_management.server_logger import log, log_error
+from src.server.security.encryption import Hasher
+
+
+@dataclass(frozen=True)
+class PublishedArtifact:
+    """
+    A file served by the ArtifactServer, under a URL made of its hash so that a URL always serves the same content.
+    """
+    path: str
+    sha256: str
+    size: int
+
+    def get_url_path(self) -> str:
+        return f"/artifacts/{self.sha256}/{os.path.basename(self.path)}"
+
+
+class ArtifactRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the published artifacts, with their hash as ETag, and byte ranges so that the computers can download a
+    file in several parts at once, and resume an interrupted download.
+    """
+    CHUNK_SIZE: int = 1024 * 1024
+    RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+    # noinspection PyShadowingBuiltins
+    def log_message(self, format, *args):
+        return
+
+    # noinspection PyPep8Naming
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    # noinspection PyPep8Naming
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def serve(self, send_body: bool) -> None:
+        artifact: PublishedArtifact | None = self.server.artifacts.get(self.path)
+        if artifact is None:
+            self.send_error(404, "Artifact not found.")
+            return
+
+        etag: str = f"\"{artifact.sha256}\""
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end = 0, artifact.size - 1
+        range_header: str | None = self.headers.get("Range")
+        # A Range is ignored if If-Range names another version of the file, the whole file is sent instead.
+        if range_header is not None and self.headers.get("If-Range", etag) == etag:
+            byte_range: tuple[int, int] | None = self.parse_range(range_header, artifact.size)
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{artifact.size}")
+                self.end_headers()
+                return
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{artifact.size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        if send_body:
+            self.send_file_range(artifact.path, start, end)
+
+    def parse_range(self, range_header: str, size: int) -> tuple[int, int] | None:
+        """
+        :return: The first and last byte of a single range, or None if it cannot be satisfied.
+        """
+        match = self.RANGE_PATTERN.match(range_header.strip())
+        if match is None or match.group(1) == match.group(2) == "":
+            return None
+        if match.group(1) == "":
+            # bytes=-N is the last N bytes.
+            start, end = max(0, size - int(match.group(2))), size - 1
+        else:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        if start > end or start >= size:
+            return None
+        return start, end
+
+    def send_file_range(self, path: str, start: int, end: int) -> None:
+        remaining: int = end - start + 1
+        with open(path, "rb") as file:
+            file.seek(start)
+            while remaining > 0:
+                chunk: bytes = file.read(min(self.CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class ArtifactServer:
+    """
+    Threaded http server the computers download the client bundle and the large client files from, instead of the
+    server pushing them over SFTP.
+    The transfer is moved off the SSH channel, and each computer downloads with several connections at once.
+    """
+
+    def __init__(self, enabled: bool = False, host: str = "", port: int = 8081, advertised_address: str = "",
+                 connections: int = 4, min_segment_size: int = 1024 * 1024):
+        self.enabled: bool = enabled
+        self.host: str = host
+        self.port: int = port
+        self.advertised_address: str = advertised_address
+        self.connections: int = connections
+        self.min_segment_size: int = min_segment_size
+        self.artifacts: dict[str, PublishedArtifact] = {}
+        self.lock = threading.Lock()
+        self.httpd: ThreadingHTTPServer | None = None
+
+    def configure(self, enabled: bool, host: str, port: int, advertised_address: str, connections: int,
+                  min_segment_size: int) -> None:
+        self.enabled = enabled
+        self.host = host
+        self.port = port
+        self.advertised_address = advertised_address
+        self.connections = max(1, connections)
+        self.min_segment_size = min_segment_size
+
+    def is_running(self) -> bool:
+        return self.httpd is not None
+
+    def start(self) -> bool:
+        """
+        Starts serving in a daemon thread.
+        :return: True if the server is running, False if it could not listen on its port.
+        """
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), ArtifactRequestHandler)
+        except OSError as e:
+            log_error(f"Could not start the artifact server on port {self.port}: {e}")
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.artifacts = self.artifacts
+        threading.Thread(target=self.httpd.serve_forever, name="artifact-server", daemon=True).start()
+        log(f"Artifact server listening on port {self.port}.", print_formatted=False)
+        return True
+
+    def stop(self) -> None:
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def publish(self, path: str, sha256: str | None = None) -> PublishedArtifact:
+        """
+        Serves a file, under a URL made of its hash. The file must not change once published, unless its new hash is
+        given: it is then published again.
+        :param path: The path of the file.
+        :param sha256: The hash of the file, if it is already known.
+        """
+        with self.lock:
+            for url_path, artifact in list(self.artifacts.items()):
+                if artifact.path == path:
+                    if sha256 is None or artifact.sha256 == sha256:
+                        return artifact
+                    del self.artifacts[url_path]
+            artifact = PublishedArtifact(path, sha256 or Hasher.sha256(path), os.path.getsize(path))
+            self.artifacts[artifact.get_url_path()] = artifact
+            return artifact
+
+    def get_url(self, artifact: PublishedArtifact, server_address: str) -> str:
+        """
+        :param server_address: The address of the server seen by the computer, used if none is configured.
+        """
+        return f"http://{self.advertised_address or server_address}:{self.port}{artifact.get_url_path()}"
+
+    def get_segments(self, size: int) -> list[tuple[int, int]]:
+        """
+        :return: The byte ranges downloaded in parallel by a computer, at least min_segment_size bytes each.
+        """
+        count: int = max(1, min(self.connections, size // max(1, self.min_segment_size)))
+        segment_size: int = -(-size // count)
+        return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+    def get_pull_script(self, artifact: PublishedArtifact, url: str, output_path: str) -> str:
+        """
+        :return: The PowerShell script downloading the artifact on a computer, one curl.exe per segment at the same
+        time. The segments are kept until they are all complete, so that a download interrupted again is resumed
+        without the segments already downloaded. It prints PULL_OK if the file has the right hash.
+        """
+        segments: str = ",".join(f"@({start},{end})" for start, end in self.get_segments(artifact.size))
+        return (
+            f"$out = '{output_path}'; $url = '{url}'; $segments = @({segments}); $processes = @()\n"
+            "for ($i = 0; $i -lt $segments.Count; $i++) {\n"
+            "  $part = \"$out.part$i\"; $length = $segments[$i][1] - $segments[$i][0] + 1\n"
+            "  if (-not (Test-Path $part) -or (Get-Item $part).Length -ne $length) {\n"
+            "    $arguments = @('-fsS', '--retry', '3', '-r', \"$($segments[$i][0])-$($segments[$i][1])\", "
+            "'-o', \"`\"$part`\"\", $url)\n"
+            "    $processes += Start-Process -FilePath curl.exe -ArgumentList $arguments -NoNewWindow -PassThru\n"
+            "  }\n"
+            "}\n"
+            "$processes | Wait-Process\n"
+            "for ($i = 0; $i -lt $segments.Count; $i++) {\n"
+            "  $part = \"$out.part$i\"; $length = $segments[$i][1] - $segments[$i][0] + 1\n"
+            "  if (-not (Test-Path $part) -or (Get-Item $part).Length -ne $length) { exit 1 }\n"
+            "}\n"
+            "$stream = [IO.File]::Create($out)\n"
+            "for ($i = 0; $i -lt $segments.Count; $i++) {\n"
+            "  $part = [IO.File]::OpenRead(\"$out.part$i\"); $part.CopyTo($stream); $part.Close()\n"
+            "}\n"
+            "$stream.Close()\n"
+            "for ($i = 0; $i -lt $segments.Count; $i++) { Remove-Item \"$out.part$i\" }\n"
+            f"if ((Get-FileHash $out -Algorithm SHA256).Hash -eq '{artifact.sha256}') {{ 'PULL_OK' }}\n"
+        )
+
+
+artifact_server = ArtifactServer()
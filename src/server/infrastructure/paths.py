@@ -36,6 +36,14 @@ class ServerPath:
     def get_log_folder_path():
         return ServerPath.join(ServerPath.get_project_root(), "logs")
 
+    @staticmethod
+    def get_rollout_journals_folder():
+        return ServerPath.join(ServerPath.get_log_folder_path(), "rollouts")
+
+    @staticmethod
+    def get_client_bundles_folder():
+        return ServerPath.join(ServerPath.get_project_root(), "client_bundles")
+
     @staticmethod
     def get_database_path():
         return ServerPath.join(ServerPath.get_project_root(), ServerPath.json_computers_database_filename)
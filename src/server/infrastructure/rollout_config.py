@@ -0,0 +1,315 @@
+import json
+from dataclasses import dataclass, field, fields, asdict
+
+from src.server.infrastructure.artifact_server import artifact_server
+from src.server.infrastructure.paths import ServerPath
+from src.server.ssh.commands import command_deadlines
+from src.server.ssh.connection_pool import ssh_connection_pool
+from src.server.ssh.persistent_shell import persistent_shell_settings
+from src.server.ssh.sftp_session import sftp_settings
+from src.server.update_management.client_bundle import client_bundle_service
+from src.server.update_management.delta_sync import delta_sync_service
+from src.server.update_management.peer_distribution import peer_distributor
+
+
+def _section_from_dict(section_class, data: dict | None):
+    """
+    Builds a config section dataclass from a dictionary, ignoring unknown keys so that an old or hand edited
+    config.json never prevents the server from starting.
+    """
+    if not data:
+        return section_class()
+    known_keys = {f.name for f in fields(section_class)}
+    return section_class(**{key: value for key, value in data.items() if key in known_keys})
+
+
+@dataclass
+class OrchestratorConfig:
+    """
+    How the rollout is driven.
+    mode "threads" keeps one thread per computer (limited by max_computers_per_iteration), mode "asyncio" drives
+    every computer from a single event loop and only hands the blocking steps to a bounded executor.
+    """
+    mode: str = "threads"
+    max_executor_workers: int = 16
+    max_concurrent_hosts: int = 256
+
+
+@dataclass
+class PhaseLimitsConfig:
+    """
+    Maximum number of computers in each phase of the asyncio rollout. Waiting phases (wake) are cheap and can run
+    wide, while upload and install use the network and should stay throttled. Rebooting computers are not limited,
+    they are parked in the reboot watcher.
+    """
+    wake: int = 64
+    connect: int = 16
+    upload: int = 4
+    install: int = 8
+    shutdown: int = 32
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class RebootWatcherConfig:
+    """
+    Settings of the component probing all the rebooting computers of the asyncio rollout.
+    """
+    probe_interval: float = 10.0
+    probe_timeout: float = 5.0
+    max_probes_in_flight: int = 256
+    reboot_timeout: int = 60 * 60 * 4
+
+
+@dataclass
+class AdaptiveConcurrencyConfig:
+    """
+    Settings of the AIMD controller tuning the number of computers updated at the same time in the asyncio
+    rollout. When enabled, it starts at max_computers_per_iteration and replaces orchestrator.max_concurrent_hosts.
+    """
+    enabled: bool = False
+    floor: int = 1
+    ceiling: int = 32
+    additive_increase: int = 1
+    multiplicative_decrease: float = 0.5
+    window_size: int = 10
+    max_failure_rate: float = 0.2
+    max_latency_ratio: float = 2.0
+
+
+@dataclass
+class ReachabilityConfig:
+    """
+    Settings of the scan probing the SSH port of the whole fleet at the start of a rollout.
+    """
+    probe_timeout: float = 5.0
+    max_probes_in_flight: int = 256
+
+
+@dataclass
+class BulkWakeConfig:
+    """
+    Settings of the wake on lan burst sent to all the computers found off at the start of a rollout.
+    subnets are the networks (like "192.168.1.0/24") whose computers are woken with the directed broadcast address of
+    the network. The other computers get the packet on their own address.
+    """
+    enabled: bool = True
+    packets_per_second: float = 100.0
+    subnets: list[str] = field(default_factory=list)
+    port: int = 9
+    check_interval: float = 5.0
+    resend_interval: float = 30.0
+    max_resends: int = 3
+
+
+@dataclass
+class PendingScanConfig:
+    """
+    Settings of the pending update scan: before the update, the computers that are on are asked for their pending
+    updates, max_concurrent_scans at the same time, and the ones without any skip the upload and install phases.
+    """
+    enabled: bool = False
+    max_concurrent_scans: int = 32
+    scan_timeout: float = 600
+
+
+@dataclass
+class SSHPoolConfig:
+    """
+    Settings of the SSH connection pool shared by all the phases of the rollout.
+    """
+    max_concurrent_handshakes: int = 8
+    keepalive_interval: int = 30
+    dead_peer_probes: int = 4
+
+
+@dataclass
+class CommandTimeoutsConfig:
+    """
+    Deadlines of the remote commands in seconds, 0 for none: the default one of every command, and the one of the
+    client program, which runs the whole Windows Update. A command past its deadline is killed on the computer.
+    """
+    default_timeout: float = 15 * 60
+    client_program_timeout: float = 3 * 60 * 60
+    kill_on_timeout: bool = True
+
+
+@dataclass
+class PersistentShellConfig:
+    """
+    Settings of the persistent shell: the short commands of a computer run one after the other in a PowerShell
+    process kept open on a single channel, instead of a new channel and process each.
+    """
+    enabled: bool = False
+
+
+@dataclass
+class SFTPConfig:
+    """
+    Settings of the SFTP transfers: the SSH window and packet sizes of the SFTP channels, the number of files sent at
+    the same time to a computer, and the number of reads in flight when downloading.
+    """
+    window_size: int = 16 * 1024 * 1024
+    max_packet_size: int = 32768
+    max_concurrent_transfers: int = 4
+    max_prefetch_requests: int = 64
+
+
+@dataclass
+class ClientBundleConfig:
+    """
+    Settings of the client bundle: the client files are uploaded as a single compressed archive, extracted on the
+    computer, instead of one file at a time. It needs the tar.exe shipped with Windows 10 1803 and later.
+    """
+    enabled: bool = False
+    compression_level: int = 9
+
+
+@dataclass
+class ArtifactServerConfig:
+    """
+    Settings of the http server the computers download the client bundle and the client files of at least
+    min_segment_size bytes from, with up to connections segments of at least min_segment_size bytes at once. The
+    computers reach it on advertised_address, or by default on the address of the server on their SSH connection.
+    """
+    enabled: bool = False
+    host: str = ""
+    port: int = 8081
+    advertised_address: str = ""
+    connections: int = 4
+    min_segment_size: int = 1024 * 1024
+
+
+@dataclass
+class DeltaSyncConfig:
+    """
+    Settings of the delta transfer of the client files bigger than min_file_size: only the blocks that changed are
+    sent. block_size 0 picks it from the size of the file. A file is uploaded entirely when more than
+    max_literal_ratio of it changed. It is only used on the computers whose update.exe has one of the
+    supported_client_hashes, the sha256 of the update.exe releases supporting the --delta-* commands, the other ones
+    get the files uploaded entirely.
+    """
+    enabled: bool = False
+    min_file_size: int = 1024 * 1024
+    block_size: int = 0
+    max_literal_ratio: float = 0.5
+    supported_client_hashes: list[str] = field(default_factory=list)
+
+
+@dataclass
+class PeerDistributionConfig:
+    """
+    Settings of the peer distribution of the client files: up to seeds_per_subnet computers of each subnet serve them
+    on port to the others, for idle_timeout seconds after the last request. The subnet of a computer is the subnet of
+    subnets containing it, or its /prefix_length network. The port must be allowed by the firewall of the computers.
+    """
+    enabled: bool = False
+    seeds_per_subnet: int = 2
+    prefix_length: int = 24
+    subnets: list[str] = field(default_factory=list)
+    port: int = 8765
+    idle_timeout: int = 600
+
+
+def _default_retry_policies() -> dict[str, dict]:
+    return {
+        "wake": {"max_retries": 2, "base_delay": 120, "max_delay": 900},
+        "auth": {"max_retries": 0, "base_delay": 60, "max_delay": 60},
+        "transient_ssh": {"max_retries": 3, "base_delay": 30, "max_delay": 600},
+        "other": {"max_retries": 1, "base_delay": 300, "max_delay": 300},
+    }
+
+
+@dataclass
+class RetryConfig:
+    """
+    Settings of the retries of the failed computers during the rollout. Each kind of failure (wake, auth,
+    transient_ssh, other) has its own policy. No retry is scheduled after time_budget seconds of rollout.
+    """
+    enabled: bool = True
+    time_budget: float = 60 * 60 * 2
+    jitter: float = 0.5
+    policies: dict[str, dict] = field(default_factory=_default_retry_policies)
+
+
+@dataclass
+class RolloutConfig:
+    max_computers_per_iteration: int = 2
+    orchestrator: OrchestratorConfig = field(default_factory=OrchestratorConfig)
+    phase_limits: PhaseLimitsConfig = field(default_factory=PhaseLimitsConfig)
+    reboot_watcher: RebootWatcherConfig = field(default_factory=RebootWatcherConfig)
+    adaptive_concurrency: AdaptiveConcurrencyConfig = field(default_factory=AdaptiveConcurrencyConfig)
+    retry: RetryConfig = field(default_factory=RetryConfig)
+    reachability: ReachabilityConfig = field(default_factory=ReachabilityConfig)
+    bulk_wake: BulkWakeConfig = field(default_factory=BulkWakeConfig)
+    pending_scan: PendingScanConfig = field(default_factory=PendingScanConfig)
+    ssh_pool: SSHPoolConfig = field(default_factory=SSHPoolConfig)
+    command_timeouts: CommandTimeoutsConfig = field(default_factory=CommandTimeoutsConfig)
+    persistent_shell: PersistentShellConfig = field(default_factory=PersistentShellConfig)
+    sftp: SFTPConfig = field(default_factory=SFTPConfig)
+    client_bundle: ClientBundleConfig = field(default_factory=ClientBundleConfig)
+    artifact_server: ArtifactServerConfig = field(default_factory=ArtifactServerConfig)
+    delta_sync: DeltaSyncConfig = field(default_factory=DeltaSyncConfig)
+    peer_distribution: PeerDistributionConfig = field(default_factory=PeerDistributionConfig)
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'RolloutConfig':
+        return cls(
+            max_computers_per_iteration=int(config.get("max_computers_per_iteration", 2)),
+            orchestrator=_section_from_dict(OrchestratorConfig, config.get("orchestrator")),
+            phase_limits=_section_from_dict(PhaseLimitsConfig, config.get("phase_limits")),
+            reboot_watcher=_section_from_dict(RebootWatcherConfig, config.get("reboot_watcher")),
+            adaptive_concurrency=_section_from_dict(AdaptiveConcurrencyConfig, config.get("adaptive_concurrency")),
+            retry=_section_from_dict(RetryConfig, config.get("retry")),
+            reachability=_section_from_dict(ReachabilityConfig, config.get("reachability")),
+            bulk_wake=_section_from_dict(BulkWakeConfig, config.get("bulk_wake")),
+            pending_scan=_section_from_dict(PendingScanConfig, config.get("pending_scan")),
+            ssh_pool=_section_from_dict(SSHPoolConfig, config.get("ssh_pool")),
+            command_timeouts=_section_from_dict(CommandTimeoutsConfig, config.get("command_timeouts")),
+            persistent_shell=_section_from_dict(PersistentShellConfig, config.get("persistent_shell")),
+            sftp=_section_from_dict(SFTPConfig, config.get("sftp")),
+            client_bundle=_section_from_dict(ClientBundleConfig, config.get("client_bundle")),
+            artifact_server=_section_from_dict(ArtifactServerConfig, config.get("artifact_server")),
+            delta_sync=_section_from_dict(DeltaSyncConfig, config.get("delta_sync")),
+            peer_distribution=_section_from_dict(PeerDistributionConfig, config.get("peer_distribution")),
+        )
+
+    @classmethod
+    def load(cls) -> 'RolloutConfig':
+        """
+        Loads the rollout settings from the config.json file. Missing keys keep their default value.
+        :return: The RolloutConfig object.
+        """
+        config_filename: str = ServerPath.get_config_json_file()
+        if not ServerPath.exists(config_filename):
+            return cls()
+
+        with open(config_filename, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def apply(self) -> None:
+        """
+        Configures the process-wide services with these settings. Must be called by every entry point starting a
+        rollout, before the rollout starts.
+        """
+        ssh_connection_pool.configure(self.ssh_pool.max_concurrent_handshakes, self.ssh_pool.keepalive_interval,
+                                      self.ssh_pool.dead_peer_probes)
+        command_deadlines.configure(self.command_timeouts.default_timeout, self.command_timeouts.client_program_timeout,
+                                    self.command_timeouts.kill_on_timeout)
+        persistent_shell_settings.configure(self.persistent_shell.enabled)
+        sftp_settings.configure(self.sftp.window_size, self.sftp.max_packet_size, self.sftp.max_concurrent_transfers,
+                                self.sftp.max_prefetch_requests)
+        client_bundle_service.configure(self.client_bundle.enabled, self.client_bundle.compression_level)
+        delta_sync_service.configure(self.delta_sync.enabled, self.delta_sync.min_file_size, self.delta_sync.block_size,
+                                     self.delta_sync.max_literal_ratio, self.delta_sync.supported_client_hashes)
+        peer_distributor.configure(self.peer_distribution.enabled, self.peer_distribution.seeds_per_subnet,
+                                   self.peer_distribution.prefix_length, self.peer_distribution.subnets,
+                                   self.peer_distribution.port, self.peer_distribution.idle_timeout)
+        artifact_server.configure(self.artifact_server.enabled, self.artifact_server.host, self.artifact_server.port,
+                                  self.artifact_server.advertised_address, self.artifact_server.connections,
+                                  self.artifact_server.min_segment_size)
+
+    def is_asyncio_mode(self) -> bool:
+        return self.orchestrator.mode.lower() == "asyncio"
@@ -2,6 +2,9 @@ import hashlib
 
 
 class Hasher:
+    # Size of the chunks read to hash a file, so that big files are not loaded in memory at once.
+    CHUNK_SIZE: int = 1024 * 1024
+
     @staticmethod
     def sha256(file: str) -> str:
         """
@@ -11,6 +14,6 @@ class Hasher:
         """
         hasher = hashlib.sha256()
         with open(file, 'rb') as f:
-            buf = f.read()
-            hasher.update(buf)
+            while chunk := f.read(Hasher.CHUNK_SIZE):
+                hasher.update(chunk)
         return hasher.hexdigest()
@@ -1,19 +1,57 @@
+import base64
 import logging
 import os
+import re
+import time
+import threading
 import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Callable
 
-import chardet
 import paramiko
 
 from paramiko.sftp_client import SFTPClient
 
 from src.server.core.remote_computer import RemoteComputer
-from src.server.exceptions.DecodingExceptions import DecodingError
+from src.server.ssh.connection_pool import ssh_connection_pool
+from src.server.ssh.output_decoder import OutputDecoder, normalize_output
+from src.server.ssh.persistent_shell import PersistentShell, ShellResult, ShellTimeout, persistent_shell_settings
+from src.server.ssh.sftp_session import SFTPSession, TransferStats, sftp_settings
 
 from abc import ABC, abstractmethod
 
 
+def encode_powershell_command(script: str) -> str:
+    """
+    :return: The command running the PowerShell script, encoded so that it needs no quoting for cmd.
+    """
+    encoded: str = base64.b64encode(script.encode("utf-16-le")).decode()
+    return f"powershell -NoProfile -NonInteractive -EncodedCommand {encoded}"
+
+
+class CommandDeadlines:
+    """
+    Process-wide deadlines of the remote commands, configured from the command_timeouts section of config.json. A
+    deadline of 0 means no deadline.
+    """
+
+    def __init__(self, default_timeout: float = 15 * 60, client_program_timeout: float = 3 * 60 * 60,
+                 kill_on_timeout: bool = True):
+        self.default_timeout: float = default_timeout
+        self.client_program_timeout: float = client_program_timeout
+        self.kill_on_timeout: bool = kill_on_timeout
+
+    def configure(self, default_timeout: float, client_program_timeout: float, kill_on_timeout: bool) -> None:
+        self.default_timeout = default_timeout
+        self.client_program_timeout = client_program_timeout
+        self.kill_on_timeout = kill_on_timeout
+
+
+command_deadlines = CommandDeadlines()
+
+
 class ISSHCommand(ABC):
     @abstractmethod
     def execute(self, command: str):
@@ -23,49 +61,251 @@ class ISSHCommand(ABC):
 @dataclass
 class SSHCommandResult:
     """
-    A dataclass containing the stdout and stderr outputs of a command executed on a remote computer.
+    A dataclass containing the stdout and stderr outputs of a command executed on a remote computer, and its exit
+    code when it is known.
     """
     stdout: str
     stderr: str
+    exit_code: int | None = None
+
+
+@dataclass
+class SSHCommandTimeoutResult(SSHCommandResult):
+    """
+    The result of a command that did not end by itself: it reached its deadline, was cancelled, or the connection was
+    lost. The outputs are the ones received until then, and the exit code is None.
+    """
+    reason: str = "timeout"
+    timeout: float = 0.0
+
+    TIMEOUT = "timeout"
+    CANCELLED = "cancelled"
+    CONNECTION_LOST = "connection lost"
+
+
+class RunningCommand:
+    """
+    A command running on the remote computer. Its cmd process is tagged with a token on its command line, so that it
+    can be found and killed with its children once its channel is closed.
+    """
+
+    def __init__(self, channel: paramiko.Channel | None, token: str):
+        """
+        :param channel: The channel of the command, None for a command of the persistent shell.
+        """
+        self.channel: paramiko.Channel | None = channel
+        self.token: str = token
+        self.interrupt_reason: str | None = None
+
+    def interrupt(self, reason: str) -> None:
+        """
+        Closes the channel, the reads of the outputs end right away.
+        """
+        if self.interrupt_reason is None:
+            self.interrupt_reason = reason
+        self.channel.close()
+
+    def get_kill_command(self) -> str:
+        """
+        :return: The command killing the cmd process of the command and all its children.
+        """
+        script: str = (f"Get-CimInstance Win32_Process -Filter \"Name = 'cmd.exe' AND CommandLine LIKE "
+                       f"'%UGCMD={self.token}%'\" | ForEach-Object {{ taskkill.exe /PID $_.ProcessId /T /F }}")
+        return encode_powershell_command(script)
 
 
 class SSHCommandExecutor(ISSHCommand):
-    def __init__(self, ssh: paramiko.SSHClient):
-        self.ssh = ssh
+    # How long the exit status of a command is waited for once its outputs are over, in seconds.
+    EXIT_STATUS_TIMEOUT: float = 30
 
-    def execute(self, command: str) -> SSHCommandResult:
+    def __init__(self, ssh: paramiko.SSHClient, session_provider: Callable[[], paramiko.SSHClient] | None = None,
+                 decoder: OutputDecoder | None = None):
+        """
+        :param ssh: The ssh session.
+        :param session_provider: If given, the session is borrowed from it for every command instead, so that a dead
+        session is transparently replaced (see RemoteComputer.borrow_ssh_session).
+        :param decoder: The decoder of the outputs of the computer. If its code page is not known, it is learned with
+        chcp before the first command.
+        """
+        self.ssh = ssh
+        self.session_provider: Callable[[], paramiko.SSHClient] | None = session_provider
+        self.decoder: OutputDecoder = decoder if decoder is not None else OutputDecoder()
+        self.encoding_probed: bool = self.decoder.is_learned()
+        self.persistent_shell = PersistentShell()
+        self.running: list[RunningCommand] = []
+        self.running_lock = threading.Lock()
+
+    def get_ssh_session(self) -> paramiko.SSHClient:
+        if self.session_provider is not None:
+            return self.session_provider()
+        return self.ssh
+
+    def execute(self, command: str, delayed_expansion: bool = False,
+                timeout: float | None = None) -> SSHCommandResult:
         """
         Executes a command on the remote computer and returns the stdout and stderr outputs decoded in the correct
         format.
         :param command: The command to execute
-        :return: An object SSHCommandResult containing the stdout and stderr outputs decoded in the correct format.
+        :param delayed_expansion: True to run cmd with /V:ON, so that !VARIABLE! is expanded at execution time.
+        :param timeout: The deadline of the command in seconds, command_deadlines.default_timeout if None.
+        :return: An object SSHCommandResult containing the stdout and stderr outputs decoded in the correct format, or
+        an SSHCommandTimeoutResult if the command did not end by itself.
+        """
+        return self.__run(command, delayed_expansion, timeout, None)
+
+    def execute_streaming(self, command: str, on_line: Callable[[str], None], delayed_expansion: bool = False,
+                          timeout: float | None = None) -> SSHCommandResult:
+        """
+        Executes a command on the remote computer like execute, but gives every line of its stdout to on_line as soon
+        as it is received, instead of only returning the outputs once the command ended.
+        :param command: The command to execute
+        :param on_line: Called with every non-empty line of stdout, decoded, in the thread running the command.
+        :param delayed_expansion: True to run cmd with /V:ON, so that !VARIABLE! is expanded at execution time.
+        :param timeout: The deadline of the command in seconds, command_deadlines.default_timeout if None.
+        :return: An object SSHCommandResult containing the whole stdout and stderr outputs decoded, or an
+        SSHCommandTimeoutResult if the command did not end by itself.
         """
-        if not self.ssh:
+        return self.__run(command, delayed_expansion, timeout, on_line)
+
+    def __run(self, command: str, delayed_expansion: bool, timeout: float | None,
+              on_line: Callable[[str], None] | None) -> SSHCommandResult:
+        ssh: paramiko.SSHClient = self.get_ssh_session()
+        if not ssh:
             raise ValueError("The SSHClient object cannot be None")
-        _, stdout, stderr = self.ssh.exec_command("cmd /C \"" + command + "\"")
-        stdout = SSHCommandExecutor.__decode_stream(stdout.read())
-        stderr = SSHCommandExecutor.__decode_stream(stderr.read())
-        return SSHCommandResult(stdout, stderr)
+        if timeout is None:
+            timeout = command_deadlines.default_timeout
+        token: str = uuid.uuid4().hex[:16]
+        if on_line is None and persistent_shell_settings.enabled:
+            arguments: str = f"{'/V:ON ' if delayed_expansion else ''}/C \"set UGCMD={token}&& {command}\""
+            result: SSHCommandResult | None = self.__run_in_shell(ssh, "Invoke-UGCommand", token, arguments, timeout)
+            if result is not None:
+                return result
+        if not self.encoding_probed:
+            self.learn_encoding(ssh)
+        shell: str = "cmd /V:ON /C" if delayed_expansion else "cmd /C"
+        _, stdout, stderr = ssh.exec_command(f"{shell} \"set UGCMD={token}&& {command}\"")
+        running = RunningCommand(stdout.channel, token)
+        with self.running_lock:
+            self.running.append(running)
+        deadline: threading.Timer | None = None
+        if timeout > 0:
+            deadline = threading.Timer(timeout, running.interrupt, (SSHCommandTimeoutResult.TIMEOUT,))
+            deadline.daemon = True
+            deadline.start()
 
-    @staticmethod
-    def __decode_stream(stream) -> str | None:
+        try:
+            if on_line is None:
+                stdout_decoded: str | None = self.decoder.decode(stdout.read())
+            else:
+                stdout_decoded = self.__read_lines(stdout.channel, on_line)
+            stderr_decoded: str | None = self.decoder.decode(stderr.read())
+            # The channel is closed when the command ends, is interrupted or when the connection is lost. Its outputs
+            # are over, so the exit status is only waited for a moment: a missing one is handled as a lost connection.
+            stdout.channel.status_event.wait(self.EXIT_STATUS_TIMEOUT)
+        finally:
+            if deadline is not None:
+                deadline.cancel()
+            with self.running_lock:
+                self.running.remove(running)
+
+        if running.interrupt_reason is None and stdout.channel.exit_status_ready() \
+                and stdout.channel.exit_status != -1:
+            return SSHCommandResult(stdout_decoded, stderr_decoded, stdout.channel.exit_status)
+
+        reason: str = running.interrupt_reason or SSHCommandTimeoutResult.CONNECTION_LOST
+        if command_deadlines.kill_on_timeout:
+            self.__kill(ssh, running)
+        return SSHCommandTimeoutResult(stdout_decoded, stderr_decoded, None, reason, timeout)
+
+    def execute_powershell(self, script: str, timeout: float | None = None) -> SSHCommandResult:
+        """
+        Runs a PowerShell script on the remote computer, in its persistent shell if it is enabled, so that PowerShell
+        is not started again for every script.
+        :param script: The script, it may have several lines.
+        :param timeout: The deadline of the script in seconds, command_deadlines.default_timeout if None.
+        :return: An object SSHCommandResult containing the outputs of the script, its errors being on stderr.
         """
-        Decode a stream.
-        :param stream: Stream used to decode.
-        :return: The decoded stream.
+        if persistent_shell_settings.enabled:
+            ssh: paramiko.SSHClient = self.get_ssh_session()
+            if timeout is None:
+                timeout = command_deadlines.default_timeout
+            result: SSHCommandResult | None = self.__run_in_shell(ssh, "Invoke-UGScript", uuid.uuid4().hex[:16],
+                                                                  script, timeout)
+            if result is not None:
+                return result
+        return self.execute(encode_powershell_command(script), timeout=timeout)
+
+    def __run_in_shell(self, ssh: paramiko.SSHClient, function: str, token: str, argument: str,
+                       timeout: float) -> SSHCommandResult | None:
         """
-        if stream is None or stream == b'':
+        :return: The result of the command run in the persistent shell, or None if the shell is busy or could not be
+        opened, the command was then not run.
+        """
+        try:
+            shell_result: ShellResult | None = self.persistent_shell.try_run(ssh, function, token, argument, timeout)
+        except ShellTimeout as e:
+            reason: str = SSHCommandTimeoutResult.TIMEOUT if e.reason == "timeout" \
+                else SSHCommandTimeoutResult.CONNECTION_LOST
+            if function == "Invoke-UGCommand" and command_deadlines.kill_on_timeout:
+                self.__kill(ssh, RunningCommand(None, token))
+            return SSHCommandTimeoutResult(None, None, None, reason, timeout)
+        if shell_result is None:
             return None
+        return SSHCommandResult(shell_result.stdout, shell_result.stderr, shell_result.exit_code)
+
+    def __read_lines(self, channel: paramiko.Channel, on_line: Callable[[str], None]) -> str | None:
+        # A binary file on the channel, as the text one decodes the lines in utf-8.
+        decoder = self.decoder.get_incremental_decoder()
+        lines: list[str] = []
+        for raw_line in iter(channel.makefile("rb").readline, b""):
+            text: str = decoder.decode(raw_line)
+            lines.append(text)
+            line: str | None = normalize_output(text)
+            if line:
+                on_line(line)
+        lines.append(decoder.decode(b"", final=True))
+        return normalize_output("".join(lines))
+
+    def learn_encoding(self, ssh: paramiko.SSHClient, timeout: float = 30) -> None:
+        """
+        Learns the code page of the computer with chcp, once. The default one is used if it cannot be learned.
+        """
+        self.encoding_probed = True
+        try:
+            _, stdout, _ = ssh.exec_command("chcp", timeout=timeout)
+            encoding: str | None = self.decoder.learn(stdout.read())
+        except (paramiko.SSHException, OSError) as e:
+            logging.warning(f"Could not get the code page of the computer: {e}")
+            return
+        if encoding is None:
+            logging.warning(f"Could not get the code page of the computer, using {self.decoder.get_encoding()}.")
 
-        encodings = ['cp850', chardet.detect(stream)['encoding'], 'cp1252', 'iso-8859-1', 'utf-8', 'utf-16', 'utf-32']
-
-        for encoding in encodings:
-            try:
-                return stream.decode(encoding, errors="replace").strip().replace("\r\n", "\n").replace("\r", "")
-            except UnicodeDecodeError:
-                pass
+    @staticmethod
+    def __kill(ssh: paramiko.SSHClient, running: RunningCommand, timeout: float = 30) -> None:
+        """
+        Kills the remote process tree of an interrupted command, as closing its channel does not stop it on Windows.
+        """
+        transport: paramiko.Transport | None = ssh.get_transport()
+        if transport is None or not transport.is_active():
+            logging.warning(f"Could not kill the interrupted command {running.token}, the connection is lost.")
+            return
+        try:
+            _, stdout, _ = ssh.exec_command(running.get_kill_command(), timeout=timeout)
+            stdout.channel.status_event.wait(timeout)
+            stdout.channel.close()
+        except (paramiko.SSHException, OSError) as e:
+            logging.warning(f"Could not kill the interrupted command {running.token}: {e}")
 
-        raise DecodingError("None of the tested encodings were able to decode the stream")
+    def cancel_all(self) -> None:
+        """
+        Interrupts every command running on the computer. They return an SSHCommandTimeoutResult, and are killed on
+        the computer. The persistent shell is closed.
+        """
+        with self.running_lock:
+            running: list[RunningCommand] = list(self.running)
+        for command in running:
+            command.interrupt(SSHCommandTimeoutResult.CANCELLED)
+        self.persistent_shell.close()
 
     def set_ssh_session(self, param):
         self.ssh = param
@@ -75,26 +315,150 @@ class SSHCommands:
     """
     This class contains all the methods that can be used to execute commands on a remote computer.
     """
+    # The maximum length of a cmd command line is 8191 characters, keep a margin for the cmd call itself.
+    MAX_BATCH_LENGTH: int = 8000
+    # Exit code of certutil when the file does not exist (HRESULT 0x80070002).
+    FILE_NOT_FOUND_ERROR: int = -2147024894
 
     def __init__(self, ssh_command_executor: SSHCommandExecutor):
         self.commands = ssh_command_executor
         self.__execute_command: SSHCommandExecutor.execute = ssh_command_executor.execute
-        self.__ssh: paramiko.SSHClient = ssh_command_executor.ssh
+        self.sftp_session = SFTPSession()
 
-    def execute_command(self, command: str) -> SSHCommandResult:
+    def execute_command(self, command: str, timeout: float | None = None) -> SSHCommandResult:
         """
         Executes a command on the remote computer and returns the stdout and stderr outputs decoded in the correct
         format.
         :param command: The command to execute
+        :param timeout: The deadline of the command in seconds, command_deadlines.default_timeout if None.
         :return: An object SSHCommandResult containing the stdout and stderr outputs
-        decoded in the correct format.
+        decoded in the correct format, or an SSHCommandTimeoutResult if the command did not end by itself.
         """
-        return self.__execute_command(command)
+        if timeout is None:
+            return self.__execute_command(command)
+        return self.__execute_command(command, timeout=timeout)
+
+    def execute_command_streaming(self, command: str, on_line: Callable[[str], None],
+                                  timeout: float | None = None) -> SSHCommandResult:
+        """
+        Executes a command on the remote computer, giving every line of its stdout to on_line as soon as it is
+        received (see SSHCommandExecutor.execute_streaming).
+        :param timeout: The deadline of the command in seconds, command_deadlines.default_timeout if None.
+        """
+        return self.commands.execute_streaming(command, on_line, timeout=timeout)
+
+    def cancel_commands(self) -> None:
+        """
+        Interrupts the commands running on the computer, and kills them.
+        """
+        self.commands.cancel_all()
+
+    def execute_powershell(self, script: str, timeout: float | None = None) -> SSHCommandResult:
+        """
+        Runs a PowerShell script on the remote computer, in its persistent shell if it is enabled (see
+        SSHCommandExecutor.execute_powershell).
+        """
+        return self.commands.execute_powershell(script, timeout)
+
+    def batch(self, commands: list[str]) -> list[SSHCommandResult]:
+        """
+        Executes many commands in a single cmd process, over a single channel, instead of one round trip per command.
+
+        Every command is surrounded by markers written on stdout and stderr, so that its outputs and its exit code can
+        be separated from the others. The commands are split in several round trips only when the script would be
+        longer than the cmd limit. The script runs with delayed expansion, so the commands must not contain '!'.
+        :param commands: The commands to execute, in order.
+        :return: The SSHCommandResult of every command, in the same order. The exit code is None if the command did not
+        run, for instance if the connection was lost.
+        """
+        results: list[SSHCommandResult] = []
+        for chunk in self.__split_batch(commands):
+            results.extend(self.__execute_batch(chunk))
+        return results
+
+    def __split_batch(self, commands: list[str]) -> list[list[str]]:
+        chunks: list[list[str]] = [[]]
+        length: int = 0
+        for command in commands:
+            # The markers add about 150 characters to every command.
+            command_length: int = len(command) + 150
+            if chunks[-1] and length + command_length > self.MAX_BATCH_LENGTH:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(command)
+            length += command_length
+        return [chunk for chunk in chunks if chunk]
+
+    def __execute_batch(self, commands: list[str]) -> list[SSHCommandResult]:
+        token: str = "UG" + uuid.uuid4().hex[:8]
+        script: list[str] = []
+        for index, command in enumerate(commands):
+            # (call ) resets ERRORLEVEL to 0, so that each exit code belongs to its own command.
+            script.append(f"echo {token}B{index}& >&2 echo {token}B{index}& (call )& ({command})& "
+                          f"echo {token}E{index} !ERRORLEVEL!& >&2 echo {token}E{index}")
+        result: SSHCommandResult = self.commands.execute("& ".join(script), delayed_expansion=True)
+
+        stdouts, exit_codes = SSHCommands.__split_batch_output(result.stdout, token, len(commands))
+        stderrs, _ = SSHCommands.__split_batch_output(result.stderr, token, len(commands))
+        return [SSHCommandResult(stdout, stderr, exit_code)
+                for stdout, stderr, exit_code in zip(stdouts, stderrs, exit_codes)]
+
+    @staticmethod
+    def __split_batch_output(output: str | None, token: str,
+                             count: int) -> tuple[list[str | None], list[int | None]]:
+        """
+        Splits the output of a batch between its commands, using the markers.
+        :return: The output of every command (None when empty), and the exit codes found in the end markers.
+        """
+        outputs: list[list[str]] = [[] for _ in range(count)]
+        exit_codes: list[int | None] = [None] * count
+        current: int | None = None
+        for line in (output or "").split("\n"):
+            stripped_line: str = line.strip()
+            if stripped_line.startswith(f"{token}B"):
+                current = int(stripped_line[len(token) + 1:])
+            elif stripped_line.startswith(f"{token}E"):
+                marker: list[str] = stripped_line[len(token) + 1:].split()
+                if len(marker) > 1:
+                    exit_codes[int(marker[0])] = int(marker[1])
+                current = None
+            elif current is not None:
+                outputs[current].append(line)
+        return ["\n".join(lines).strip() or None for lines in outputs], exit_codes
+
+    def get_files_sha256(self, file_paths: list[str]) -> list[str | None]:
+        """
+        Asks the remote computer for the sha256 of files with certutil, in a single round trip, so that the files do
+        not have to be downloaded to be hashed.
+        :param file_paths: The paths of the files ON the remote computer.
+        :return: The hash of every file, in the same order. An empty string if the file does not exist, None if the
+        hash could not be computed remotely (certutil not available, unexpected output).
+        """
+        results: list[SSHCommandResult] = self.batch([f"certutil -hashfile \"{file_path}\" SHA256"
+                                                      for file_path in file_paths])
+        hashes: list[str | None] = []
+        for result in results:
+            match = re.search(r"^\s*((?:[0-9a-fA-F]{2} ?){32})\s*$", result.stdout or "", re.MULTILINE)
+            if match is not None:
+                hashes.append(match.group(1).replace(" ", "").lower())
+            elif result.exit_code == self.FILE_NOT_FOUND_ERROR or "80070002" in (result.stdout or ""):
+                hashes.append("")
+            else:
+                hashes.append(None)
+        return hashes
 
     def does_path_exists(self, file_path: str) -> bool:
         result = self.__execute_command(f"if exist \"{file_path}\" (echo True) else (echo False)")
         return True if result.stdout == 'True' else False
 
+    def do_paths_exist(self, file_paths: list[str]) -> list[bool]:
+        """
+        Same as does_path_exists for many paths, in a single round trip.
+        """
+        results: list[SSHCommandResult] = self.batch([f"if exist \"{file_path}\" (echo True) else (echo False)"
+                                                      for file_path in file_paths])
+        return [result.stdout == 'True' for result in results]
+
     def reboot(self) -> None:
         """
         Reboots the remote computer by executing 'shutdown /r /t 2' on it.
@@ -161,6 +525,31 @@ class SSHCommands:
             return False
         return True
 
+    def read_file(self, file_path: str) -> str | None:
+        """
+        Reads a small text file on the remote computer.
+        :param file_path: The path of the file ON the remote computer.
+        :return: The content of the file, or None if it could not be read.
+        """
+        result = self.__execute_command(f"type \"{file_path}\"")
+        if result.exit_code != 0 or result.stderr:
+            return None
+        return result.stdout or ""
+
+    def write_file(self, file_path: str, content: str) -> bool:
+        """
+        Writes a small text file on the remote computer, replacing it if it exists.
+        :param file_path: The path of the file ON the remote computer.
+        :param content: The content of the file.
+        :return: True if the file was written, False otherwise.
+        """
+        try:
+            with self.get_sftp().open(file_path, 'w') as file:
+                file.write(content)
+        except IOError:
+            return False
+        return True
+
     def delete_file(self, computer: 'RemoteComputer', file_path: str) -> bool:
         result = self.__execute_command(f"del \"{file_path}\"")
 
@@ -175,7 +564,7 @@ class SSHCommands:
 
     def download_file(self, local_file_path: str, remote_file_path: str) -> bool:
         """
-        Downloads a file from the remote computer.
+        Downloads a file from the remote computer. The reads are prefetched, so that many of them are in flight.
         :param local_file_path: The path of the downloaded file ON the local computer.
         :param remote_file_path: The path of the file to download ON the remote computer.
         """
@@ -183,12 +572,12 @@ class SSHCommands:
         logging.getLogger("paramiko").setLevel(logging.CRITICAL)
         # noinspection PyBroadException
         try:
-            sftp: SFTPClient = self.__ssh.open_sftp()
-            sftp.get(remote_file_path, local_file_path)
-            sftp.close()
+            self.get_sftp().get(remote_file_path, local_file_path,
+                                max_concurrent_prefetch_requests=sftp_settings.max_prefetch_requests)
         except Exception:
-            logging.getLogger("paramiko").setLevel(original_logging_level)
             return False
+        finally:
+            logging.getLogger("paramiko").setLevel(original_logging_level)
         return True
 
     def upload_file(self, local_path: str, remote_path: str, computer: 'RemoteComputer') -> bool:
@@ -204,9 +593,10 @@ class SSHCommands:
 
         # noinspection PyBroadException
         try:
-            sftp = self.__ssh.open_sftp()
-            sftp.put(local_path, os.path.join(remote_path, os.path.basename(local_path)))
-            sftp.close()
+            start: float = time.monotonic()
+            size: int = self.__put(self.get_sftp(), local_path, remote_path)
+            stats = TransferStats(size, time.monotonic() - start)
+            computer.log(f"Uploaded {os.path.basename(local_path)}: {stats.describe()}.")
         except Exception as e:
             computer.log_error(f"{e}")
             computer.log_error(f"Error while uploading the file {local_path} to {remote_path}, here is the traceback:")
@@ -214,25 +604,82 @@ class SSHCommands:
             return False
         return True
 
-    def upload_files(self, local_paths: list[str], remote_path: str) -> bool:
+    def upload_files(self, local_paths: list[str], remote_path: str, computer: 'RemoteComputer | None' = None) -> bool:
         """
         Sends multiple files to the remote computer. The files will be sent to the remote_path folder,
-         and will keep their original name.
+         and will keep their original name. Up to max_concurrent_transfers files are sent at the same time, each one
+         on its own SFTP channel of the SSH session.
         :param local_paths: List of the files local paths to send.
         :param remote_path: The remote path of the folder where the files will be sent.
+        :param computer: The computer on which to send the files, to log the throughput and the errors.
         :return: True if the files were sent successfully, False otherwise.
         """
-        sftp = self.__ssh.open_sftp()
-        for local_path in local_paths:
-            sftp.put(local_path, os.path.join(remote_path, os.path.basename(local_path)))
-        sftp.close()
+        start: float = time.monotonic()
+        workers: int = min(len(local_paths), sftp_settings.max_concurrent_transfers)
+        try:
+            if workers <= 1:
+                sizes: list[int] = [self.__put(self.get_sftp(), local_path, remote_path) for local_path in local_paths]
+            else:
+                ssh: paramiko.SSHClient = self.commands.get_ssh_session()
+
+                def upload(local_path: str) -> int:
+                    sftp: SFTPClient = self.sftp_session.open(ssh)
+                    try:
+                        return self.__put(sftp, local_path, remote_path)
+                    finally:
+                        sftp.close()
+
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sftp") as executor:
+                    # list() raises the first error of the uploads.
+                    sizes = list(executor.map(upload, local_paths))
+        # Opening a channel fails with an SSHException when the server refuses it (MaxSessions reached).
+        except (paramiko.SSHException, paramiko.SFTPError, OSError) as e:
+            if computer is not None:
+                computer.log_error(f"Error while uploading the files to {remote_path}: {e!r}")
+            return False
+
+        stats = TransferStats(sum(sizes), time.monotonic() - start)
+        if computer is not None:
+            computer.log(f"Uploaded {len(local_paths)} files: {stats.describe()}.")
         return True
 
-    def close_ssh_session(self):
-        self.__ssh.close()
+    @staticmethod
+    def __put(sftp: SFTPClient, local_path: str, remote_path: str) -> int:
+        """
+        Sends a file with pipelined writes: the writes do not wait for their acknowledgment, which are only checked
+        when the file is closed. The file is read by chunks of max_prefetch_requests packets, the number of requests
+        in flight the downloads use.
+        :return: The size of the file.
+        :raises IOError: If the size of the remote file is not the size of the local file.
+        """
+        remote_file_path: str = os.path.join(remote_path, os.path.basename(local_path))
+        chunk_size: int = sftp_settings.max_packet_size * max(1, sftp_settings.max_prefetch_requests)
+        with open(local_path, "rb") as local_file, sftp.open(remote_file_path, "wb") as remote_file:
+            remote_file.set_pipelined(True)
+            while chunk := local_file.read(chunk_size):
+                remote_file.write(chunk)
+
+        size: int = os.path.getsize(local_path)
+        remote_size: int | None = sftp.stat(remote_file_path).st_size
+        if remote_size != size:
+            raise IOError(f"Size mismatch in put! {remote_size} != {size}")
+        return size
+
+    def close_ssh_session(self, hostname: str) -> None:
+        """
+        Closes the SFTP session and the persistent shell of the computer, and its SSH session through the connection
+        pool, so that the next connection makes a new handshake.
+        :param hostname: The hostname of the computer, the key of its session in the pool.
+        """
+        self.sftp_session.close()
+        self.commands.persistent_shell.close()
+        ssh_connection_pool.discard(hostname)
 
     def get_sftp(self) -> paramiko.SFTPClient:
-        return self.__ssh.open_sftp()
+        """
+        :return: The SFTP session of the computer, shared by the transfers. It must not be closed by the caller.
+        """
+        return self.sftp_session.get(self.commands.get_ssh_session())
 
     def is_os_windows(self, computer: 'RemoteComputer') -> bool:
         # Try to get OS information using 'uname' command (usually works on Unix-like systems)
@@ -254,5 +701,4 @@ class SSHCommands:
         return False
 
     def set_ssh_session(self, param):
-        self.__ssh = param
         self.commands.set_ssh_session(param)
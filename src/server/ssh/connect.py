@@ -1,34 +1,38 @@
 import paramiko
 
-from src.server.infrastructure.paths import ServerPath
 from src.server.core.computer import Computer
+from src.server.ssh.host_key_store import HostKeyStore, host_key_store
 
 
 class SSHConnect:
     @staticmethod
-    def private_key_connexion(computer: 'Computer', private_key) -> paramiko.SSHClient or False:
+    def private_key_connexion(computer: 'Computer', private_key,
+                              host_keys: 'HostKeyStore' = host_key_store) -> paramiko.SSHClient or False:
         """
         Connect to a computer via SSH.
         Nothing is checked here, the connection is made with the given parameters.
         Make sure to check the parameters before calling this method.
+        :param host_keys: The store giving the known keys of the computer.
         """
         hostname, username = computer.hostname, computer.username
 
         ssh_session = paramiko.SSHClient()
         ssh_session.set_missing_host_key_policy(paramiko.RejectPolicy())
-        ssh_session.load_host_keys(ServerPath.join(ServerPath.get_home_path(), ".ssh", "known_hosts"))
+        host_keys.apply_to(ssh_session, hostname)
         ssh_session.connect(hostname=hostname, username=username, pkey=private_key)
         return ssh_session
 
     @staticmethod
-    def private_key_connexion_no_computer(hostname: str, username: str, private_key) -> paramiko.SSHClient or False:
+    def private_key_connexion_no_computer(hostname: str, username: str, private_key,
+                                          host_keys: 'HostKeyStore' = host_key_store) -> paramiko.SSHClient or False:
         """
         Connect to a computer via SSH.
         Nothing is checked here, the connection is made with the given parameters.
         Make sure to check the parameters before calling this method.
+        :param host_keys: The store giving the known keys of the computer.
         """
         ssh_session = paramiko.SSHClient()
         ssh_session.set_missing_host_key_policy(paramiko.RejectPolicy())
-        ssh_session.load_host_keys(ServerPath.join(ServerPath.get_home_path(), ".ssh", "known_hosts"))
+        host_keys.apply_to(ssh_session, hostname)
         ssh_session.connect(hostname=hostname, username=username, pkey=private_key)
         return ssh_session
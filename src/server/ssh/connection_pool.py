@@ -0,0 +1,127 @@
+import socket
+from threading import BoundedSemaphore, Lock
+from typing import Callable
+
+import paramiko
+
+
+class SSHConnectionPool:
+    """
+    Keeps one SSH session per computer, shared by all the phases of the update.
+
+    A session is reused as long as its transport is active, and a new handshake is only made when there is none or
+    when it died. Handshakes are the most expensive part of a connection, so only max_concurrent_handshakes of them
+    run at the same time. Every session sends a keepalive every keepalive_interval seconds, so that idle sessions are
+    not dropped by the computer or the network. The socket of the session detects a dead computer: since the SSH
+    keepalive keeps sending data, it is the TCP user timeout that resets the connection once sent data stays
+    unacknowledged for dead_peer_probes keepalive intervals, and the TCP keepalive does it for an idle connection.
+    The commands running on a reset connection end at once instead of waiting forever.
+    """
+
+    def __init__(self, max_concurrent_handshakes: int = 8, keepalive_interval: int = 30, dead_peer_probes: int = 4):
+        self.handshakes_semaphore = BoundedSemaphore(max(1, max_concurrent_handshakes))
+        self.keepalive_interval: int = keepalive_interval
+        self.dead_peer_probes: int = dead_peer_probes
+        self.sessions: dict[str, paramiko.SSHClient] = {}
+        self.host_locks: dict[str, Lock] = {}
+        self.lock = Lock()
+        self.handshakes: int = 0
+
+    def configure(self, max_concurrent_handshakes: int, keepalive_interval: int, dead_peer_probes: int) -> None:
+        """
+        Changes the settings of the pool. Must be called before the rollout starts, when no handshake is running.
+        """
+        self.handshakes_semaphore = BoundedSemaphore(max(1, max_concurrent_handshakes))
+        self.keepalive_interval = keepalive_interval
+        self.dead_peer_probes = dead_peer_probes
+
+    @staticmethod
+    def is_healthy(session: paramiko.SSHClient | None) -> bool:
+        """
+        :return: True if the transport of the session is still active.
+        """
+        if session is None:
+            return False
+        transport: paramiko.Transport | None = session.get_transport()
+        return transport is not None and transport.is_active()
+
+    def get_session(self, key: str, connect: Callable[[], paramiko.SSHClient | None]) -> paramiko.SSHClient | None:
+        """
+        Returns the session of a computer, and connects to it if there is no healthy session.
+        :param key: The key of the computer, its hostname.
+        :param connect: The function opening a new session, returning None if it could not.
+        :return: The session, or None if the connection failed.
+        """
+        with self.lock:
+            host_lock: Lock = self.host_locks.setdefault(key, Lock())
+
+        # One handshake at most per computer, the other callers wait for it and share the session.
+        with host_lock:
+            with self.lock:
+                session: paramiko.SSHClient | None = self.sessions.get(key)
+            if self.is_healthy(session):
+                return session
+            if session is not None:
+                session.close()
+
+            with self.handshakes_semaphore:
+                session = connect()
+            with self.lock:
+                self.handshakes += 1
+                if session is None:
+                    self.sessions.pop(key, None)
+                    return None
+                self.sessions[key] = session
+
+            transport: paramiko.Transport | None = session.get_transport()
+            if transport is not None:
+                transport.set_keepalive(self.keepalive_interval)
+                self.enable_dead_peer_detection(transport.sock)
+            return session
+
+    def get_dead_peer_timeout_ms(self) -> int:
+        """
+        :return: How long sent data may stay unacknowledged before the connection is reset, in milliseconds.
+        """
+        return self.keepalive_interval * max(1, self.dead_peer_probes) * 1000
+
+    def enable_dead_peer_detection(self, sock: socket.socket) -> None:
+        """
+        Makes the socket reset the connection of a dead computer after about keepalive_interval * dead_peer_probes
+        seconds.
+
+        The SSH keepalive sends data every keepalive_interval seconds, so a dead computer leaves unacknowledged data
+        in the socket, which is retransmitted instead of probed by the TCP keepalive, until tcp_retries2 gives up
+        after about 15 minutes. TCP_USER_TIMEOUT (Linux) bounds how long sent data may stay unacknowledged. The TCP
+        keepalive still covers the connections without an SSH keepalive, and the systems without TCP_USER_TIMEOUT.
+        """
+        if self.keepalive_interval <= 0 or not isinstance(sock, socket.socket):
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in (("TCP_KEEPIDLE", self.keepalive_interval), ("TCP_KEEPINTVL", self.keepalive_interval),
+                                  ("TCP_KEEPCNT", self.dead_peer_probes),
+                                  ("TCP_USER_TIMEOUT", self.get_dead_peer_timeout_ms())):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        except OSError:
+            pass
+
+    def discard(self, key: str) -> None:
+        """
+        Closes the session of a computer, the next get_session makes a new handshake.
+        """
+        with self.lock:
+            session: paramiko.SSHClient | None = self.sessions.pop(key, None)
+        if session is not None:
+            session.close()
+
+    def close_all(self) -> None:
+        with self.lock:
+            sessions: list[paramiko.SSHClient] = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+ssh_connection_pool = SSHConnectionPool()
@@ -0,0 +1,105 @@
+import os
+from threading import Lock
+
+import paramiko
+
+from src.server.infrastructure.paths import ServerPath
+
+
+def get_file_mtime(path: str) -> float | None:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class HostKeyStore:
+    """
+    Process-wide copy of the known_hosts file, indexed by hostname.
+
+    The file is parsed once, and again only when its modification time changes (a computer was added), so that a
+    connection costs a dictionary lookup instead of parsing the whole file. Hashed entries cannot be indexed, they
+    are looked up with paramiko when the hostname is not in the index.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path: str | None = path
+        self.lock = Lock()
+        self.mtime: float | None = None
+        self.index: dict[str, dict[str, paramiko.PKey]] = {}
+        self.hashed_host_keys = paramiko.HostKeys()
+
+    def get_path(self) -> str:
+        if self.path is None:
+            self.path = ServerPath.join(ServerPath.get_home_path(), ".ssh", "known_hosts")
+        return self.path
+
+    def reload_if_changed(self) -> None:
+        path: str = self.get_path()
+        mtime: float | None = get_file_mtime(path)
+        if mtime == self.mtime:
+            return
+
+        host_keys = paramiko.HostKeys()
+        if mtime is not None:
+            host_keys.load(path)
+
+        index: dict[str, dict[str, paramiko.PKey]] = {}
+        hashed_host_keys = paramiko.HostKeys()
+        for entry in host_keys._entries:
+            for hostname in entry.hostnames:
+                if hostname.startswith("|1|"):
+                    hashed_host_keys._entries.append(entry)
+                else:
+                    index.setdefault(hostname, {})[entry.key.get_name()] = entry.key
+
+        self.index, self.hashed_host_keys, self.mtime = index, hashed_host_keys, mtime
+
+    def get_host_keys(self, hostname: str) -> dict[str, paramiko.PKey]:
+        """
+        :return: The known keys of the computer, by key type.
+        """
+        with self.lock:
+            self.reload_if_changed()
+            keys: dict[str, paramiko.PKey] | None = self.index.get(hostname)
+            if keys is not None:
+                return keys
+            hashed_keys = self.hashed_host_keys.lookup(hostname)
+            return dict(hashed_keys) if hashed_keys is not None else {}
+
+    def apply_to(self, ssh_session: paramiko.SSHClient, hostname: str) -> None:
+        """
+        Gives the known keys of the computer to an SSH client, instead of loading the whole known_hosts file in it.
+        """
+        for key_type, key in self.get_host_keys(hostname).items():
+            ssh_session.get_host_keys().add(hostname, key_type, key)
+
+
+class PrivateKeyCache:
+    """
+    Process-wide cache of the private keys, by path. A key is read again if its file changed.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.keys: dict[str, tuple[float | None, paramiko.PKey]] = {}
+
+    def get(self, path: str) -> paramiko.PKey:
+        """
+        :return: The private key stored in the file.
+        :raises FileNotFoundError: If the file does not exist.
+        """
+        mtime: float | None = get_file_mtime(path)
+        with self.lock:
+            cached: tuple[float | None, paramiko.PKey] | None = self.keys.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        key: paramiko.PKey = paramiko.Ed25519Key.from_private_key_file(path)
+        with self.lock:
+            self.keys[path] = (mtime, key)
+        return key
+
+
+host_key_store = HostKeyStore()
+private_key_cache = PrivateKeyCache()
@@ -0,0 +1,97 @@
+import codecs
+import re
+from typing import Callable
+
+import chardet
+
+CODE_PAGE_PATTERN = re.compile(r"(\d{3,5})\D*$")
+
+
+def get_code_page_encoding(chcp_output: str) -> str | None:
+    """
+    :param chcp_output: The output of chcp, for instance "Active code page: 850" or "Page de codes active : 850".
+    :return: The python name of the code page, or None if it is unknown.
+    """
+    match = CODE_PAGE_PATTERN.search(chcp_output.strip())
+    if match is None:
+        return None
+    code_page: int = int(match.group(1))
+    encoding: str = "utf-8" if code_page == 65001 else f"cp{code_page}"
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def normalize_output(text: str) -> str | None:
+    text = text.strip().replace("\r\n", "\n").replace("\r", "")
+    return text if text else None
+
+
+class OutputDecoder:
+    """
+    Decodes the outputs of the commands of a computer with the code page of its console, learned once with chcp and
+    kept in its record of computers_database.json, instead of guessing the encoding of every output.
+
+    Until the code page is learned, the encoding of every output is detected by chardet, cp850 being only used when
+    nothing is detected. Once it is learned, an output that is not valid in it is decoded with the detected encoding,
+    which only happens with the multibyte code pages (utf-8, cp932...): a single byte one decodes any output.
+    """
+    DEFAULT_ENCODING: str = "cp850"
+
+    def __init__(self, encoding: str | None = None, on_learned: Callable[[str], None] | None = None):
+        """
+        :param encoding: The code page of the computer, if already known.
+        :param on_learned: Called with the code page once it is learned, to save it.
+        """
+        self.encoding: str | None = encoding
+        self.on_learned: Callable[[str], None] | None = on_learned
+
+    def is_learned(self) -> bool:
+        return self.encoding is not None
+
+    def learn(self, chcp_output: bytes | None) -> str | None:
+        """
+        Learns the code page of the computer from the output of chcp.
+        :return: The code page, or None if the output has none, the default one is used until it is learned.
+        """
+        encoding: str | None = get_code_page_encoding(chcp_output.decode("ascii", errors="ignore")) \
+            if chcp_output else None
+        if encoding is None:
+            return None
+        self.encoding = encoding
+        if self.on_learned is not None:
+            self.on_learned(encoding)
+        return encoding
+
+    def get_encoding(self) -> str:
+        return self.encoding or self.DEFAULT_ENCODING
+
+    def decode(self, stream: bytes | None) -> str | None:
+        """
+        :return: The decoded output, without its surrounding blank lines and with \n line endings, or None if it is
+        empty.
+        """
+        if not stream:
+            return None
+        if self.encoding is None:
+            return normalize_output(self.decode_detected(stream))
+        try:
+            text: str = stream.decode(self.encoding)
+        except UnicodeDecodeError:
+            text = self.decode_detected(stream)
+        return normalize_output(text)
+
+    def decode_detected(self, stream: bytes) -> str:
+        encoding: str = chardet.detect(stream)["encoding"] or self.get_encoding()
+        try:
+            return stream.decode(encoding, errors="replace")
+        except LookupError:
+            return stream.decode(self.get_encoding(), errors="replace")
+
+    def get_incremental_decoder(self) -> codecs.IncrementalDecoder:
+        """
+        :return: A decoder for an output received in pieces, a character split between two pieces is decoded once
+        the second one is received.
+        """
+        return codecs.getincrementaldecoder(self.get_encoding())(errors="replace")
@@ -0,0 +1,170 @@
+import base64
+import socket
+from threading import Lock
+
+import paramiko
+
+from src.server.ssh.output_decoder import normalize_output
+
+
+class PersistentShellSettings:
+    """
+    Process-wide settings of the persistent shells, configured from the persistent_shell section of config.json.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled: bool = enabled
+
+    def configure(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+
+persistent_shell_settings = PersistentShellSettings()
+
+
+class ShellResult:
+    """
+    The outputs and exit code of a command run in a persistent shell, read from its result line.
+    """
+
+    def __init__(self, stdout: str | None, stderr: str | None, exit_code: int):
+        self.stdout: str | None = stdout
+        self.stderr: str | None = stderr
+        self.exit_code: int = exit_code
+
+
+class ShellTimeout(Exception):
+    """
+    Raised when a command sent to the shell did not answer before its deadline, or the shell was lost while it ran.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason: str = reason
+
+
+class PersistentShell:
+    """
+    A PowerShell process kept open on a single channel of a computer, running the commands sent on its stdin one after
+    the other, instead of a new channel and a new process for every command.
+
+    Every command is sent as a single line with a token, its arguments encoded in base64, and answered by a single
+    line "UGR_<token> <exit code> <stdout> <stderr>", the outputs being utf-8 encoded in base64, so that the outputs
+    of the command can never be mistaken for the end of the command. The cmd commands are started from the shell with
+    their outputs redirected. Every PowerShell script runs from a temporary file in a runspace of its own, so that its
+    exit ends the script and not the shell, and gets the exit code powershell -EncodedCommand would give it: the value
+    of its exit, 1 if it was stopped by an error or its last statement failed, 0 otherwise.
+
+    The shell runs one command at a time. A command sent while it is busy is not queued: the caller runs it on its
+    own channel instead.
+    """
+    START_COMMAND: str = "powershell -NoLogo -NoProfile -NonInteractive -ExecutionPolicy Bypass -Command -"
+    BOOTSTRAP: tuple[str, ...] = (
+        "function Send-UGResult($token, $code, $out, $err) { "
+        "$o = [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes([string]$out)); "
+        "$e = [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes([string]$err)); "
+        "[Console]::Out.WriteLine(\"UGR_$token $code $o $e\"); [Console]::Out.Flush() }",
+        "function Invoke-UGCommand($token, $arguments) { try { "
+        "$a = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($arguments)); "
+        "$info = New-Object Diagnostics.ProcessStartInfo('cmd.exe', $a); $info.UseShellExecute = $false; "
+        "$info.RedirectStandardOutput = $true; $info.RedirectStandardError = $true; "
+        "$p = [Diagnostics.Process]::Start($info); $e = $p.StandardError.ReadToEndAsync(); "
+        "$o = $p.StandardOutput.ReadToEnd(); $p.WaitForExit(); Send-UGResult $token $p.ExitCode $o $e.Result "
+        "} catch { Send-UGResult $token -1 '' $_.ToString() } }",
+        "function Invoke-UGScript($token, $script) { $o = ''; $e = @(); $code = 1; "
+        "$path = Join-Path ([IO.Path]::GetTempPath()) \"ug_$token.ps1\"; $ps = [PowerShell]::Create(); try { "
+        "$s = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($script)); "
+        "[IO.File]::WriteAllText($path, \"$s`n`$global:UGSucceeded = `$?; `$global:UGCompleted = `$true`n\", "
+        "[Text.Encoding]::UTF8); $none = New-Object 'Management.Automation.PSDataCollection[psobject]'; "
+        "$output = New-Object 'Management.Automation.PSDataCollection[psobject]'; $failed = $false; "
+        "try { [void]$ps.EndInvoke($ps.AddCommand($path).BeginInvoke($none, $output)) } "
+        "catch { $failed = $true; $e += $_.Exception.GetBaseException().Message }; "
+        "$o = $output | Out-String; $e = @($ps.Streams.Error | ForEach-Object { $_.ToString() }) + $e; "
+        "$state = $ps.Runspace.SessionStateProxy; "
+        "if ($failed) { $code = 1 } elseif ($state.GetVariable('UGCompleted')) { "
+        "$code = $(if ($state.GetVariable('UGSucceeded')) { 0 } else { 1 }) } "
+        "else { $code = [int]$state.GetVariable('LASTEXITCODE') } "
+        "} catch { $e += $_.ToString() } finally { $ps.Dispose(); Remove-Item -LiteralPath $path -ErrorAction "
+        "SilentlyContinue }; Send-UGResult $token $code $o ($e -join \"`n\") }",
+    )
+
+    def __init__(self):
+        self.lock = Lock()
+        self.channel: paramiko.Channel | None = None
+        self.reader = None
+
+    @staticmethod
+    def encode(text: str) -> str:
+        return base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def parse_result(line: str, token: str) -> ShellResult | None:
+        """
+        :return: The result of the command if the line is its result line, None otherwise.
+        """
+        parts: list[str] = line.rstrip("\r\n").split(" ")
+        if len(parts) != 4 or parts[0] != f"UGR_{token}":
+            return None
+        stdout: str = base64.b64decode(parts[2]).decode("utf-8", errors="replace")
+        stderr: str = base64.b64decode(parts[3]).decode("utf-8", errors="replace")
+        return ShellResult(normalize_output(stdout), normalize_output(stderr), int(parts[1]))
+
+    def is_open(self, ssh: paramiko.SSHClient) -> bool:
+        return self.channel is not None and not self.channel.closed \
+            and self.channel.get_transport() is ssh.get_transport()
+
+    def open(self, ssh: paramiko.SSHClient) -> None:
+        self.close()
+        channel: paramiko.Channel = ssh.get_transport().open_session()
+        channel.set_combine_stderr(True)
+        channel.exec_command(self.START_COMMAND)
+        self.channel, self.reader = channel, channel.makefile("rb")
+        for line in self.BOOTSTRAP:
+            self.send(line)
+
+    def send(self, line: str) -> None:
+        self.channel.sendall(line.encode("ascii") + b"\r\n")
+
+    def close(self) -> None:
+        if self.channel is not None:
+            self.channel.close()
+        self.channel, self.reader = None, None
+
+    def try_run(self, ssh: paramiko.SSHClient, function: str, token: str, argument: str,
+                timeout: float) -> ShellResult | None:
+        """
+        Runs a command in the shell, and opens the shell first if needed.
+        :param function: Invoke-UGCommand for the arguments of cmd, Invoke-UGScript for a PowerShell script.
+        :param timeout: The deadline of the command in seconds, 0 for none.
+        :return: The result, or None if the shell is busy or could not be opened, the command was not sent.
+        :raises ShellTimeout: If the command was sent, but its result did not come before the deadline, or the shell
+        was lost. The shell is closed.
+        """
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            try:
+                if not self.is_open(ssh):
+                    self.open(ssh)
+                self.channel.settimeout(timeout if timeout > 0 else None)
+                self.send(f"{function} '{token}' '{self.encode(argument)}'")
+            except (paramiko.SSHException, OSError):
+                self.close()
+                return None
+            return self.read_result(token)
+        finally:
+            self.lock.release()
+
+    def read_result(self, token: str) -> ShellResult:
+        try:
+            for raw_line in iter(self.reader.readline, b""):
+                result: ShellResult | None = self.parse_result(raw_line.decode("ascii", errors="replace"), token)
+                if result is not None:
+                    return result
+        except socket.timeout:
+            self.close()
+            raise ShellTimeout("timeout")
+        except (paramiko.SSHException, OSError):
+            pass
+        self.close()
+        raise ShellTimeout("connection lost")
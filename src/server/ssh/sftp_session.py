@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from threading import Lock
+
+import paramiko
+
+
+class SFTPSettings:
+    """
+    Process-wide settings of the SFTP transfers, configured from the sftp section of config.json.
+
+    A bigger window lets more data be in flight before the computer acknowledges it, which is what limits the
+    throughput on links with a high latency.
+    """
+
+    def __init__(self, window_size: int = 16 * 1024 * 1024, max_packet_size: int = 32768,
+                 max_concurrent_transfers: int = 4, max_prefetch_requests: int = 64):
+        self.window_size: int = window_size
+        self.max_packet_size: int = max_packet_size
+        self.max_concurrent_transfers: int = max_concurrent_transfers
+        self.max_prefetch_requests: int = max_prefetch_requests
+
+    def configure(self, window_size: int, max_packet_size: int, max_concurrent_transfers: int,
+                  max_prefetch_requests: int) -> None:
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+        self.max_concurrent_transfers = max(1, max_concurrent_transfers)
+        self.max_prefetch_requests = max_prefetch_requests
+
+
+sftp_settings = SFTPSettings()
+
+
+@dataclass
+class TransferStats:
+    """
+    The bytes sent over SFTP to a computer, and the time it took.
+    """
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def get_throughput(self) -> float:
+        """
+        :return: The throughput in bytes per second.
+        """
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def describe(self) -> str:
+        return f"{self.bytes / 1e6:.2f} MB in {self.seconds:.2f} s ({self.get_throughput() / 1e6:.2f} MB/s)"
+
+
+class SFTPSession:
+    """
+    The SFTP session of a computer, opened once and reused by every transfer as long as its SSH session lives,
+    instead of opening a new SFTP channel for every file.
+    """
+
+    def __init__(self, settings: SFTPSettings = sftp_settings):
+        self.settings: SFTPSettings = settings
+        self.lock = Lock()
+        self.sftp: paramiko.SFTPClient | None = None
+
+    def open(self, ssh: paramiko.SSHClient) -> paramiko.SFTPClient:
+        """
+        Opens a new SFTP channel, for the transfers running next to the one of the cached session.
+        """
+        return paramiko.SFTPClient.from_transport(ssh.get_transport(), window_size=self.settings.window_size,
+                                                  max_packet_size=self.settings.max_packet_size)
+
+    def get(self, ssh: paramiko.SSHClient) -> paramiko.SFTPClient:
+        """
+        :return: The cached SFTP session, or a new one if it was closed or the SSH session changed.
+        """
+        with self.lock:
+            if self.sftp is not None:
+                channel: paramiko.Channel = self.sftp.get_channel()
+                if not channel.closed and channel.get_transport() is ssh.get_transport():
+                    return self.sftp
+                self.sftp.close()
+            self.sftp = self.open(ssh)
+            return self.sftp
+
+    def close(self) -> None:
+        with self.lock:
+            if self.sftp is not None:
+                self.sftp.close()
+                self.sftp = None
@@ -5,14 +5,16 @@ import paramiko
 from typing import TYPE_CHECKING
 
 from src.server.infrastructure.paths import ServerPath
+from src.server.ssh.host_key_store import PrivateKeyCache, private_key_cache
 
 if TYPE_CHECKING:
     from src.server.core.computer import Computer
 
 
 class SSHKeyManager:
-    def __init__(self, computer: 'Computer', log_error: callable, log: callable):
-        self.__private_key: paramiko.PKey | None = None
+    def __init__(self, computer: 'Computer', log_error: callable, log: callable,
+                 key_cache: 'PrivateKeyCache' = private_key_cache):
+        self.key_cache: 'PrivateKeyCache' = key_cache
         self.__public_key: str | None = None
         self.private_key_filepath: str = os.path.join(
             ServerPath.get_ssh_keys_folder(), f"private_key_{computer.hostname}")
@@ -30,9 +32,7 @@ class SSHKeyManager:
             self.log_error("Error, the private key filepath is not defined.")
             return None
 
-        if self.__private_key is None:
-            self.__private_key = paramiko.Ed25519Key.from_private_key_file(self.private_key_filepath)
-        return self.__private_key
+        return self.key_cache.get(self.private_key_filepath)
 
     def get_public_key(self):
         """
@@ -0,0 +1,134 @@
+import asyncio
+import statistics
+from collections import deque
+
+from src.server.logs_management.server_logger import log
+from src.server.update_management.rollout_phases import RolloutPhase
+
+
+class HostSlots:
+    """
+    Limits how many computers are updated at the same time. Unlike asyncio.Semaphore, the limit can be changed while
+    the rollout is running: lowering it lets the running computers finish, raising it starts the queued ones at once.
+    Waiting computers are served in arrival order, and retries only get a slot when no first attempt is waiting.
+    """
+
+    def __init__(self, limit: int):
+        self.limit: int = limit
+        self.in_use: int = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.retry_waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self, is_retry: bool = False) -> None:
+        """
+        Waits for a free slot.
+        :param is_retry: True for a computer tried again after a failure, so that it does not delay first attempts.
+        """
+        if self.in_use < self.limit and not self.waiters and not (is_retry and self.retry_waiters):
+            self.in_use += 1
+            return
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        (self.retry_waiters if is_retry else self.waiters).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been given right before the cancellation.
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self.wake_up_waiters()
+
+    def set_limit(self, limit: int) -> None:
+        self.limit = limit
+        self.wake_up_waiters()
+
+    def wake_up_waiters(self) -> None:
+        while self.in_use < self.limit and (self.waiters or self.retry_waiters):
+            future = self.waiters.popleft() if self.waiters else self.retry_waiters.popleft()
+            if not future.done():
+                self.in_use += 1
+                future.set_result(True)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD (additive increase, multiplicative decrease) controller of the number of computers updated at the same time.
+
+    The duration and the result of every phase of every computer are recorded. Every window_size samples, the window
+    is compared with the baseline of each phase: if the failure rate or the median duration of a phase spiked, the
+    limit is multiplied by multiplicative_decrease, otherwise additive_increase is added to it. The limit always stays
+    between floor and ceiling, and every adjustment is logged.
+    """
+    BASELINE_SMOOTHING: float = 0.2
+
+    def __init__(self, slots: 'HostSlots', floor: int, ceiling: int, additive_increase: int = 1,
+                 multiplicative_decrease: float = 0.5, window_size: int = 10, max_failure_rate: float = 0.2,
+                 max_latency_ratio: float = 2.0):
+        self.slots: 'HostSlots' = slots
+        self.floor: int = max(1, floor)
+        self.ceiling: int = max(self.floor, ceiling)
+        self.additive_increase: int = additive_increase
+        self.multiplicative_decrease: float = multiplicative_decrease
+        self.window_size: int = window_size
+        self.max_failure_rate: float = max_failure_rate
+        self.max_latency_ratio: float = max_latency_ratio
+
+        self.baselines: dict[RolloutPhase, float] = {}
+        self.window: list[tuple[RolloutPhase, float, bool]] = []
+        self.slots.set_limit(min(self.ceiling, max(self.floor, slots.limit)))
+
+    def record(self, phase: RolloutPhase, duration: float, success: bool) -> None:
+        """
+        Records the duration and the result of a phase of a computer.
+        """
+        self.window.append((phase, duration, success))
+        if len(self.window) >= self.window_size:
+            self.adjust()
+            self.window.clear()
+
+    def adjust(self) -> None:
+        failure_rate: float = sum(1 for _, _, success in self.window if not success) / len(self.window)
+        durations: dict[RolloutPhase, list[float]] = {}
+        for phase, duration, success in self.window:
+            if success:
+                durations.setdefault(phase, []).append(duration)
+        medians: dict[RolloutPhase, float] = {phase: statistics.median(values) for phase, values in durations.items()}
+
+        reason: str | None = None
+        if failure_rate > self.max_failure_rate:
+            reason = f"failure rate {failure_rate:.0%} above {self.max_failure_rate:.0%}"
+        else:
+            for phase, median in medians.items():
+                baseline = self.baselines.get(phase)
+                if baseline and median > baseline * self.max_latency_ratio:
+                    reason = f"{phase.value} median duration {median:.1f}s, baseline {baseline:.1f}s"
+                    break
+
+        if reason is not None:
+            self.set_limit(int(self.slots.limit * self.multiplicative_decrease), f"backing off, {reason}")
+            return
+
+        for phase, median in medians.items():
+            baseline = self.baselines.get(phase)
+            self.baselines[phase] = median if baseline is None else \
+                baseline + self.BASELINE_SMOOTHING * (median - baseline)
+        self.set_limit(self.slots.limit + self.additive_increase, f"healthy window, failure rate {failure_rate:.0%}")
+
+    def set_limit(self, limit: int, reason: str) -> None:
+        limit = min(self.ceiling, max(self.floor, limit))
+        if limit == self.slots.limit:
+            return
+        log(f"Adaptive concurrency: {self.slots.limit} -> {limit} computers at the same time ({reason}).",
+            print_formatted=False)
+        self.slots.set_limit(limit)
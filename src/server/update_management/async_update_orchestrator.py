@@ -0,0 +1,358 @@
+import asyncio
+import functools
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from src.server.core.reachability import is_port_open, scan_reachability, wait_for_port_state
+from src.server.exceptions.ConnectionSSHException import ConnectionSSHException
+from src.server.infrastructure.rollout_config import RolloutConfig
+from src.server.logs_management.server_logger import log, log_error
+from src.server.update_management.adaptive_concurrency import AdaptiveConcurrencyController, HostSlots
+from src.server.update_management.computer_update_manager import ComputerUpdateManager
+from src.server.update_management.reboot_watcher import RebootWatcher
+from src.server.update_management.retry_scheduler import FailureKind, RetryScheduler
+from src.server.update_management.rollout_phases import PhaseLimiter, PhaseSlot, RolloutPhase
+from src.server.wake_on_lan.bulk_wake import BulkWaker
+
+
+class AsyncUpdateOrchestrator:
+    """
+    Drives the update of the whole fleet from a single asyncio event loop.
+
+    Every computer is a coroutine. Waiting (wake on lan, reboot) is done with non-blocking socket probes, so a waiting
+    computer holds no thread. Only the blocking steps (SSH connection, uploads, shutdown) are run in a bounded
+    ThreadPoolExecutor. The client program runs for as long as the install, so it has its own executor, with a thread
+    for every computer that can be updated at the same time: the long installs never hold up the short steps.
+
+    The pipeline is split in phases (see RolloutPhase), each with its own queue and concurrency limit, so a computer
+    waiting for a reboot does not use the slot of a computer uploading files. Rebooting computers give their slot
+    back and are parked in the RebootWatcher until SSH is back.
+
+    In adaptive mode, the number of computers updated at the same time starts at max_computers_per_iteration and is
+    tuned by an AdaptiveConcurrencyController fed with the duration and result of every phase.
+
+    A failed computer waits for the delay given by the RetryScheduler without holding a slot, then is queued again
+    behind the first attempts.
+    """
+    WAKE_TIMEOUT: int = 20
+
+    def __init__(self, computers: list['ComputerUpdateManager'], config: 'RolloutConfig',
+                 retry_scheduler: RetryScheduler | None = None):
+        self.computers: list['ComputerUpdateManager'] = computers
+        self.config: 'RolloutConfig' = config
+        self.retry_scheduler: RetryScheduler = retry_scheduler if retry_scheduler is not None else \
+            RetryScheduler.from_config(config.retry)
+        self.executor: ThreadPoolExecutor | None = None
+        self.install_executor: ThreadPoolExecutor | None = None
+        self.host_slots: HostSlots | None = None
+        self.concurrency_controller: AdaptiveConcurrencyController | None = None
+        self.phases: PhaseLimiter | None = None
+        self.reboot_watcher: RebootWatcher | None = None
+        self.bulk_waker: BulkWaker | None = None
+        self.bulk_wake_task: asyncio.Task | None = None
+
+    def run(self) -> None:
+        """
+        Updates all the computers, and returns when every one of them is done.
+        """
+        asyncio.run(self.update_all_computers())
+
+    async def update_all_computers(self) -> None:
+        orchestrator_config = self.config.orchestrator
+        self.create_host_slots()
+        log(f"Starting asyncio rollout of {len(self.computers)} computers "
+            f"({orchestrator_config.max_executor_workers} executor workers, "
+            f"{self.host_slots.limit} computers at the same time).", print_formatted=False)
+        log(f"Phase limits: {self.config.phase_limits.as_dict()}", print_formatted=False)
+
+        self.phases = PhaseLimiter(self.config.phase_limits.as_dict())
+        watcher_config = self.config.reboot_watcher
+        self.reboot_watcher = RebootWatcher(watcher_config.probe_interval, watcher_config.probe_timeout,
+                                            watcher_config.max_probes_in_flight)
+        await self.scan_fleet()
+        self.reboot_watcher.start()
+        try:
+            with ThreadPoolExecutor(max_workers=orchestrator_config.max_executor_workers,
+                                    thread_name_prefix="update-worker") as self.executor, \
+                    ThreadPoolExecutor(max_workers=self.get_max_running_installs(),
+                                       thread_name_prefix="install-worker") as self.install_executor:
+                try:
+                    results = await asyncio.gather(*(self.update_one_computer(computer)
+                                                     for computer in self.computers), return_exceptions=True)
+                except BaseException:
+                    # Aborted (Ctrl-C): the running commands are cancelled, so that the executors do not wait for them.
+                    for computer in self.computers:
+                        computer.cancel_commands()
+                    raise
+        finally:
+            await self.reboot_watcher.stop()
+            if self.bulk_wake_task is not None:
+                self.bulk_wake_task.cancel()
+
+        for computer, result in zip(self.computers, results):
+            if isinstance(result, BaseException):
+                log_error(f"Computer update failed for {computer} with exception: {result!r}")
+
+    async def scan_fleet(self) -> None:
+        """
+        Probes every computer at once, so that only the computers that are off are woken up, all at the same time.
+        """
+        reachability_config = self.config.reachability
+        states: dict[str, bool] = await scan_reachability([computer.ipv4 for computer in self.computers],
+                                                          timeout=reachability_config.probe_timeout,
+                                                          max_probes_in_flight=reachability_config.max_probes_in_flight)
+        for computer in self.computers:
+            computer.set_scanned_state(states[computer.ipv4])
+        log(f"Reachability scan: {sum(states.values())} of {len(states)} computers are on.", print_formatted=False)
+
+        off_computers = [computer for computer in self.computers if not states[computer.ipv4]]
+        if off_computers and self.config.bulk_wake.enabled:
+            self.bulk_waker = BulkWaker.from_config(self.config.bulk_wake, reachability_config)
+            self.bulk_wake_task = self.bulk_waker.start([(computer.mac_address, computer.ipv4)
+                                                         for computer in off_computers])
+
+    def create_host_slots(self) -> None:
+        adaptive_config = self.config.adaptive_concurrency
+        if not adaptive_config.enabled:
+            self.host_slots = HostSlots(self.config.orchestrator.max_concurrent_hosts)
+            return
+
+        self.host_slots = HostSlots(self.config.max_computers_per_iteration)
+        self.concurrency_controller = AdaptiveConcurrencyController(
+            self.host_slots,
+            floor=adaptive_config.floor,
+            ceiling=adaptive_config.ceiling,
+            additive_increase=adaptive_config.additive_increase,
+            multiplicative_decrease=adaptive_config.multiplicative_decrease,
+            window_size=adaptive_config.window_size,
+            max_failure_rate=adaptive_config.max_failure_rate,
+            max_latency_ratio=adaptive_config.max_latency_ratio
+        )
+        log(f"Adaptive concurrency enabled, between {self.concurrency_controller.floor} and "
+            f"{self.concurrency_controller.ceiling} computers at the same time.", print_formatted=False)
+
+    def get_max_running_installs(self) -> int:
+        """
+        :return: The maximum number of client programs running at the same time. A computer runs the client program
+        while holding its host slot, so there are never more than the computers updated at the same time.
+        """
+        max_hosts: int = self.concurrency_controller.ceiling if self.concurrency_controller is not None else \
+            self.host_slots.limit
+        return max(1, min(max_hosts, len(self.computers)))
+
+    async def run_blocking(self, function, *args, executor: ThreadPoolExecutor | None = None):
+        """
+        Runs a blocking function in the executor (the shared one by default), and awaits its result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor or self.executor, function, *args)
+
+    async def record_phase(self, computer: 'ComputerUpdateManager', phase: RolloutPhase, **details) -> None:
+        """
+        Writes the completed phase in the rollout journal from the executor, as the journal syncs every entry to the
+        disk.
+        """
+        await self.run_blocking(functools.partial(computer.record_phase, phase, **details))
+
+    async def run_phase(self, phase: RolloutPhase, function, *args):
+        """
+        Runs a blocking function in the executor, inside the given phase. The duration and the result (an exception,
+        False or None being a failure) are given to the adaptive concurrency controller.
+        """
+        async with self.phases.phase(phase):
+            return await self.run_measured(phase, function, *args)
+
+    async def run_measured(self, phase: RolloutPhase, function, *args, executor: ThreadPoolExecutor | None = None):
+        """
+        Runs a blocking function in the executor, and gives its duration and result to the adaptive concurrency
+        controller.
+        """
+        start: float = time.monotonic()
+        success: bool = False
+        try:
+            result = await self.run_blocking(function, *args, executor=executor)
+            success = result is not False and result is not None
+            return result
+        finally:
+            if self.concurrency_controller is not None:
+                self.concurrency_controller.record(phase, time.monotonic() - start, success)
+
+    @asynccontextmanager
+    async def released_host_slot(self):
+        """
+        Gives the slot of the current computer to the next computers while it waits, and takes a slot again (after
+        the computers already queued) before continuing.
+        """
+        self.host_slots.release()
+        try:
+            yield
+        finally:
+            await self.host_slots.acquire()
+
+    async def update_one_computer(self, computer: 'ComputerUpdateManager') -> None:
+        is_retry: bool = False
+        while True:
+            await self.host_slots.acquire(is_retry)
+            try:
+                retry_delay: float | None = await self.attempt_update(computer)
+            finally:
+                self.host_slots.release()
+
+            if retry_delay is None:
+                return
+            await asyncio.sleep(retry_delay)
+            await self.run_blocking(computer.reset_for_retry)
+            is_retry = True
+
+    async def attempt_update(self, computer: 'ComputerUpdateManager') -> float | None:
+        """
+        Updates the computer once, and asks the retry scheduler what to do if it failed.
+        :return: The delay before the computer is tried again, in seconds, or None if it is done.
+        """
+        log(message="Updating computer " + computer.get_hostname() + "...")
+        try:
+            updated: bool = await self.update(computer)
+            return await self.run_blocking(self.retry_scheduler.finish_attempt, computer, updated)
+        finally:
+            log(f"Rollout status: {self.phases.get_status()}", print_formatted=False)
+
+    async def update(self, computer: 'ComputerUpdateManager') -> bool:
+        """
+        Asynchronous counterpart of ComputerUpdateManager.update, handling the errors the same way.
+        :return: True if the computer was updated, False otherwise.
+        """
+        # noinspection PyBroadException
+        try:
+            async with self.phases.phase(RolloutPhase.WAKE):
+                await self.wake_up(computer)
+            await self.record_phase(computer, RolloutPhase.WAKE)
+
+            computer.log_add_vertical_space()
+            await self.run_phase(RolloutPhase.CONNECT, computer.connect)
+            await self.record_phase(computer, RolloutPhase.CONNECT)
+
+            if not computer.is_phase_completed(RolloutPhase.UPLOAD):
+                computer.log_add_vertical_space()
+                if not await self.run_phase(RolloutPhase.UPLOAD, computer.install_prerequisites_client):
+                    return computer.log_error("Could not install prerequisites on the client... Cannot Update.")
+                await self.record_phase(computer, RolloutPhase.UPLOAD)
+
+            if computer.is_phase_completed(RolloutPhase.INSTALL):
+                up = computer.get_resumed_install_result()
+            else:
+                computer.log_add_vertical_space()
+                update_successful, up = await self.install_update(computer)
+                if not update_successful:
+                    return computer.log_error("Could not install update on client.")
+
+            async with self.phases.phase(RolloutPhase.SHUTDOWN):
+                await self.run_blocking(computer.finish_update, up)
+            await self.record_phase(computer, RolloutPhase.SHUTDOWN)
+            return True
+        except Exception as e:
+            await self.run_blocking(computer.handle_update_error, e, traceback.format_exc())
+            return False
+
+    async def wake_up(self, computer: 'ComputerUpdateManager') -> None:
+        computer.log(f"Updating computer {computer.get_hostname()}... Checking if the PC is awake...")
+        is_awake: bool | None = computer.get_scanned_state()
+        if is_awake is False and self.bulk_waker is not None and self.bulk_waker.is_waking(computer.ipv4):
+            computer.log("Waiting for the pc, woken up with the rest of the fleet...")
+            is_awake = await self.bulk_waker.wait_until_awake(computer.ipv4)
+            if not is_awake:
+                self.wake_up_failed(computer)
+            computer.log("The pc is awake...")
+            return
+
+        if is_awake is None:
+            is_awake = await is_port_open(computer.ipv4)
+        if is_awake:
+            return
+
+        computer.log("Waking up the pc...")
+        await self.run_blocking(computer.computer.send_wake_on_lan)
+        if not await wait_for_port_state(computer.ipv4, is_open=True, timeout=self.WAKE_TIMEOUT, interval=1):
+            self.wake_up_failed(computer)
+        computer.log("The pc is awake...")
+
+    @staticmethod
+    def wake_up_failed(computer: 'ComputerUpdateManager') -> None:
+        """
+        :raises ConnectionSSHException: Always, after logging the failure.
+        """
+        computer.log_error("Error, the pc is still off.")
+        computer.log_error("Could not awake computer... Cannot Update.")
+        computer.failure_kind = FailureKind.WAKE
+        raise ConnectionSSHException()
+
+    async def install_update(self, computer: 'ComputerUpdateManager') -> tuple[bool, str | None]:
+        """
+        Asynchronous counterpart of ComputerUpdateManager.install_update. The reboot wait does not hold any thread.
+        """
+        computer.log("Installing update on the client...")
+        async with self.phases.phase(RolloutPhase.INSTALL) as slot:
+            computer.progress_listener = self.get_install_progress_listener(computer, slot)
+            try:
+                result: dict | None = await self.run_measured(RolloutPhase.INSTALL, computer.run_client_program,
+                                                              executor=self.install_executor)
+            finally:
+                computer.progress_listener = None
+        if result is None:
+            return False, None
+        await self.record_phase(computer, RolloutPhase.INSTALL, no_updates=not result["RebootRequired"] and
+                                result["UpdateCount"] == 0, reboot_required=result["RebootRequired"])
+
+        if result["RebootRequired"]:
+            computer.log("Pc is rebooting...")
+            computer.withdraw_seed()
+            rebooted: bool = await self.wait_for_reboot(computer)
+            if rebooted:
+                rebooted = await self.run_phase(RolloutPhase.CONNECT, computer.computer.connect)
+            if not rebooted:
+                computer.log_error("Could not wait for pc to be online again.")
+                return False, None
+            await self.record_phase(computer, RolloutPhase.REBOOT_WAIT)
+            return True, None
+
+        if result["UpdateCount"] == 0:
+            computer.log("No updates found.")
+            return True, "no updates found"
+
+        return True, None
+
+    @staticmethod
+    def get_install_progress_listener(computer: 'ComputerUpdateManager', slot: PhaseSlot):
+        """
+        :return: The listener of the client progress giving the install slot to the next computer once the updates are
+        downloaded, as the slots limit the computers downloading from Windows Update at the same time.
+        """
+        loop = asyncio.get_running_loop()
+        released: list[bool] = [False]
+
+        def on_progress(progress: dict) -> None:
+            # The client may skip a stage if they follow each other quickly.
+            if progress.get("Stage") in ("downloaded", "installing", "installed") and not released[0]:
+                released[0] = True
+                computer.log("Updates downloaded, the next computer can start installing.")
+                loop.call_soon_threadsafe(slot.release)
+
+        return on_progress
+
+    async def wait_for_reboot(self, computer: 'ComputerUpdateManager') -> bool:
+        """
+        Parks the computer in the reboot watcher until it went down and came back up. The caller reconnects to it.
+        """
+        await self.run_blocking(computer.computer.force_close_ssh_session)
+        await self.run_blocking(computer.computer.close_ssh_session)
+
+        computer.log("Waiting for the reboot, the computer is parked in the reboot watcher...")
+        async with self.released_host_slot():
+            rebooted: bool = await self.reboot_watcher.wait_for_reboot(computer.get_hostname(), computer.ipv4,
+                                                                      self.config.reboot_watcher.reboot_timeout)
+        if not rebooted:
+            computer.log_error(f"Failed to reconnect to {computer.get_hostname()}, timeout likely reached.")
+            return False
+
+        computer.log("SSH server is up again.")
+        return True
@@ -0,0 +1,82 @@
+import os
+import tarfile
+import tempfile
+from threading import Lock
+
+from src.server.infrastructure.paths import ServerPath
+from src.server.update_management.client_manifest import ClientManifest
+
+
+class ClientBundleService:
+    """
+    Packs the client files in a single compressed archive, built once per version of the client manifest.
+
+    The archive is uploaded once to a computer and extracted there by the tar.exe shipped with Windows, in a staging
+    folder that then replaces the install folder with a rename, so that a computer never runs a half uploaded client.
+    """
+
+    def __init__(self, enabled: bool = False, compression_level: int = 9, folder: str | None = None):
+        self.enabled: bool = enabled
+        self.compression_level: int = compression_level
+        self.folder: str | None = folder
+        self.lock = Lock()
+
+    def configure(self, enabled: bool, compression_level: int) -> None:
+        self.enabled = enabled
+        self.compression_level = compression_level
+
+    def get_folder(self) -> str:
+        if self.folder is None:
+            self.folder = ServerPath.get_client_bundles_folder()
+        return self.folder
+
+    def get_bundle(self, manifest: ClientManifest) -> str:
+        """
+        Returns the archive of the client files, and builds it if it does not exist for this version yet.
+        :param manifest: The manifest of the client files to pack.
+        :return: The path of the archive.
+        """
+        path: str = os.path.join(self.get_folder(), f"client_{manifest.version}.tar.gz")
+        with self.lock:
+            if os.path.exists(path):
+                return path
+
+            os.makedirs(self.get_folder(), exist_ok=True)
+            # Built next to its final path then renamed, so that an interrupted build is never used.
+            fd, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=self.get_folder())
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    with tarfile.open(fileobj=file, mode="w:gz", compresslevel=self.compression_level) as archive:
+                        for artifact in manifest.artifacts:
+                            archive.add(artifact.path, arcname=artifact.name)
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+            return path
+
+    @staticmethod
+    def get_install_command(archive_path: str, install_folder: str) -> str:
+        """
+        :param archive_path: The path of the uploaded archive, on the remote computer.
+        :param install_folder: The folder of the client files, on the remote computer.
+        :return: The cmd command extracting the archive and swapping it with the install folder. It prints
+        "BUNDLE_INSTALLED" only if the new folder is in place. If the new folder could not be moved in place, the old
+        one is moved back. The log files of the old folder are kept.
+        """
+        staging: str = install_folder + ".staging"
+        old: str = install_folder + ".old"
+        return (f"(if exist \"{staging}\" rmdir /s /q \"{staging}\")"
+                f" & (if exist \"{old}\" rmdir /s /q \"{old}\")"
+                f" & mkdir \"{staging}\""
+                f" && tar -xzf \"{archive_path}\" -C \"{staging}\""
+                f" && (if exist \"{install_folder}\" (move \"{install_folder}\" \"{old}\" >nul) else (call ))"
+                f" && (move \"{staging}\" \"{install_folder}\" >nul"
+                f" || ((if exist \"{old}\" (move \"{old}\" \"{install_folder}\" >nul)) & (call)))"
+                f" && echo BUNDLE_INSTALLED"
+                f" && (if exist \"{old}\" (move /Y \"{old}\\*.log\" \"{install_folder}\" >nul 2>&1"
+                f" & rmdir /s /q \"{old}\"))"
+                f" & del \"{archive_path}\"")
+
+
+client_bundle_service = ClientBundleService()
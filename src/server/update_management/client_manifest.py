@@ -0,0 +1,83 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from threading import Lock
+
+from src.server.infrastructure.paths import ServerPath
+from src.server.security.encryption import Hasher
+
+
+@dataclass(frozen=True)
+class ClientArtifact:
+    """
+    A client file uploaded to the computers, with its hash.
+    """
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+@dataclass(frozen=True)
+class ClientManifest:
+    """
+    The client files of the current run. The version identifies their content: it changes as soon as one file changes.
+    """
+    artifacts: tuple[ClientArtifact, ...]
+    version: str
+
+    def get_paths(self) -> list[str]:
+        return [artifact.path for artifact in self.artifacts]
+
+    def get_hash(self, path: str) -> str | None:
+        """
+        :return: The sha256 of the client file, or None if it is not in the manifest.
+        """
+        for artifact in self.artifacts:
+            if artifact.path == path:
+                return artifact.sha256
+        return None
+
+
+class ClientManifestService:
+    """
+    Hashes the client files once for the whole rollout, instead of once per computer.
+
+    A file is hashed again only when its size or modification time changed, so the manifest is always up to date and
+    costs a stat per file once computed.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.artifacts: dict[str, ClientArtifact] = {}
+
+    def get_artifact(self, path: str) -> ClientArtifact:
+        stat: os.stat_result = os.stat(path)
+        artifact: ClientArtifact | None = self.artifacts.get(path)
+        if artifact is not None and artifact.size == stat.st_size and artifact.mtime == stat.st_mtime:
+            return artifact
+
+        artifact = ClientArtifact(path, stat.st_size, stat.st_mtime, Hasher.sha256(path))
+        self.artifacts[path] = artifact
+        return artifact
+
+    def get_manifest(self) -> ClientManifest:
+        """
+        :return: The manifest of the client files.
+        :raises FileNotFoundError: If a client file does not exist.
+        """
+        with self.lock:
+            artifacts: tuple[ClientArtifact, ...] = tuple(self.get_artifact(path)
+                                                          for path in ServerPath.get_client_files())
+
+        version_hasher = hashlib.sha256()
+        for artifact in sorted(artifacts, key=lambda a: a.name):
+            version_hasher.update(f"{artifact.name}:{artifact.sha256}\n".encode())
+        return ClientManifest(artifacts, version_hasher.hexdigest()[:16])
+
+
+client_manifest_service = ClientManifestService()
@@ -1,16 +1,116 @@
 import os
+import tarfile
 
 from src.server.core.remote_computer_manager import RemoteComputerManager
 from src.server.exceptions.FilesExceptionsSSH import FileCreationError
+from src.server.infrastructure.artifact_server import PublishedArtifact, artifact_server
+from src.server.infrastructure.config import Infos
 from src.server.infrastructure.paths import ServerPath
+from src.server.update_management.client_bundle import ClientBundleService, client_bundle_service
+from src.server.update_management.client_manifest import ClientManifest, client_manifest_service
+from src.server.update_management.delta_sync import DeltaPatch, delta_sync_service
+from src.server.update_management.peer_distribution import peer_distributor
 
 
 class ComputerDependenciesManager:
+    # Written in the client folder once the files are verified, it holds the version of the client manifest.
+    VERSION_MARKER_FILENAME: str = "client_version.txt"
+
     def __init__(self, remote_computer_manager: 'RemoteComputerManager'):
         self.STDOUT_MESSAGE = "STDOUT :"
         self.computer: 'RemoteComputerManager' = remote_computer_manager
 
     def send_client_application(self):
+        manifest: ClientManifest = client_manifest_service.get_manifest()
+        if self.read_version_marker() == manifest.version:
+            self.computer.log(f"Files are up to date (version {manifest.version}).")
+            self.offer_as_seed(manifest)
+            return True
+
+        self.stop_serving()
+        if not self.verify_client_files():
+            return False
+
+        if not self.write_version_marker(manifest.version):
+            self.computer.log("Could not write the version of the client files, they will be checked again next "
+                              "time.", level="warning")
+        self.offer_as_seed(manifest)
+        return True
+
+    def offer_as_seed(self, manifest: ClientManifest) -> None:
+        """
+        Makes the computer serve its client files to the other computers of its subnet, if the subnet needs a seed.
+        :param manifest: The manifest of the client files, that the computer has.
+        """
+        ipv4: str = self.computer.get_ipv4()
+        if not peer_distributor.needs_seed(ipv4):
+            return
+
+        folder: str = self.computer.paths.get_project_directory()
+        update_exe: str = self.computer.paths.join(folder, Infos.client_exe_filename)
+        file_names: list[str] = [artifact.name for artifact in manifest.artifacts]
+        result = self.computer.execute_command(peer_distributor.get_serve_command(update_exe, folder, file_names))
+        if "SEED_STARTED" in (result.stdout or ""):
+            peer_distributor.add_seed(ipv4)
+            self.computer.log("Serving the client files to the other computers of the subnet.")
+        else:
+            self.computer.log(f"Could not serve the client files to the subnet: {result.stderr}", level="warning")
+
+    def stop_serving(self) -> None:
+        """
+        Withdraws the computer from the seeds, and stops the --serve-artifacts process a previous run may have left in
+        its client folder, as it holds the files that are about to be replaced.
+        """
+        if not peer_distributor.enabled:
+            return
+        peer_distributor.remove_seed(self.computer.get_ipv4())
+        folder: str = self.computer.paths.get_project_directory()
+        result = self.computer.execute_command(peer_distributor.get_stop_command(folder))
+        if "SEED_STOPPED" not in (result.stdout or ""):
+            self.computer.log(f"Could not stop serving the client files to the subnet: {result.stderr}",
+                              level="warning")
+
+    def download_from_peer(self) -> bool:
+        """
+        Downloads the client files from a seed of the subnet of the computer, and checks them against the manifest.
+        :return: True if the files were downloaded and are up to date, False otherwise.
+        """
+        seed: str | None = peer_distributor.get_seed(self.computer.get_ipv4())
+        if seed is None:
+            return False
+
+        folder: str = self.computer.paths.get_project_directory()
+        if not self.computer.create_folder(folder):
+            return False
+        file_names: list[str] = [os.path.basename(file) for file in ServerPath.get_client_files()]
+        result = self.computer.execute_command(peer_distributor.get_download_command(seed, file_names, folder))
+        if "PEER_DOWNLOADED" in (result.stdout or "") and not self.get_outdated_client_files():
+            self.computer.log(f"Downloaded the client files from the computer {seed} of the subnet.")
+            return True
+
+        self.computer.log(f"Could not download the client files from {seed}, it is not used as a seed anymore: "
+                          f"{result.stderr}", level="warning")
+        peer_distributor.remove_seed(seed)
+        return False
+
+    def get_version_marker_path(self) -> str:
+        return self.computer.paths.join(self.computer.paths.get_project_directory(), self.VERSION_MARKER_FILENAME)
+
+    def read_version_marker(self) -> str | None:
+        """
+        :return: The version of the client files on the remote computer, or None if it is not known.
+        """
+        content: str | None = self.computer.read_file(self.get_version_marker_path())
+        return content.strip() if content is not None else None
+
+    def write_version_marker(self, version: str) -> bool:
+        return self.computer.write_file(self.get_version_marker_path(), version)
+
+    def verify_client_files(self) -> bool:
+        """
+        Checks the client files one by one, and uploads them if they are missing or not up to date.
+        :return: True if the files are up to date, False otherwise.
+        """
         self.computer.log(f"Checking if the executable and other files are uploaded on the path : "
                           f"{self.computer.paths.get_project_directory()}...")
         installed: bool = self.check_client_files_uploaded()
@@ -25,12 +125,12 @@ class ComputerDependenciesManager:
                 return False
 
         self.computer.log("Checking if files are up to date...")
-        up_to_date: bool = self.are_client_files_up_to_date()
-        if up_to_date:
+        outdated_files: list[str] = self.get_outdated_client_files()
+        if not outdated_files:
             self.computer.log("Files are up to date.")
         else:
             self.computer.log("Files are not up to date, updating them...")
-            updated_python_scripts_success: bool = self.upload_client_files()
+            updated_python_scripts_success: bool = self.update_outdated_client_files(outdated_files)
             if not updated_python_scripts_success:
                 self.computer.log_error("Error, could not update scripts.")
                 return False
@@ -39,11 +139,17 @@ class ComputerDependenciesManager:
 
     def check_client_files_uploaded(self) -> bool:
         """
-        Checks if the client application files are installed on the remote computer
+        Checks if the client application files are installed on the remote computer.
+        The folder and all the files are checked in a single round trip.
         :return True if the files are sent, False otherwise.
         """
         client_folder_path: str = self.computer.paths.get_project_directory()
-        install_exists: bool = self.computer.does_path_exists(client_folder_path)
+        files: list[str] = self.get_remote_client_files()
+        if len(files) == 0:
+            self.computer.log_error("Error, no files to check.")
+            return False
+
+        install_exists, *files_exist = self.computer.do_paths_exist([client_folder_path] + files)
 
         if not install_exists:
             self.computer.log(
@@ -54,35 +160,54 @@ class ComputerDependenciesManager:
 
         self.computer.log("Folder exists, checking if all the files are here...")
 
-        return self.check_all_files_exists()
+        return self.check_all_files_exists(files_exist)
 
-    def check_all_files_exists(self) -> bool:
+    def get_remote_client_files(self) -> list[str]:
+        """
+        :return: The paths of the client files on the remote computer.
+        """
+        files: list[str] = ServerPath.get_client_files()
+        files = [os.path.basename(file) for file in files]
+        return [self.computer.paths.join(self.computer.paths.get_project_directory(), file) for file in files]
+
+    def check_all_files_exists(self, files_exist: list[bool] | None = None) -> bool:
         """
         Checks if all the installation files exist on the remote computer.
         It compares the two .ps1 and .exe files in the client folder, with the files on the remote computer
         in the %USERPROFILE%/Infos.project_name folder.
+        :param files_exist: The result of the check, if it was already done in the same batch as the folder.
         :return: True if all the files exist, False otherwise.
         """
-        files: list[str] = ServerPath.get_client_files()
-        files = [os.path.basename(file) for file in files]
-        files = [self.computer.paths.join(self.computer.paths.get_project_directory(), file) for file in files]
+        files: list[str] = self.get_remote_client_files()
 
         if len(files) == 0:
             self.computer.log_error("Error, no files to check.")
             return False
 
-        for file in files:
-            if not self.computer.does_path_exists(file):
+        if files_exist is None:
+            files_exist = self.computer.do_paths_exist(files)
+
+        for file, exists in zip(files, files_exist):
+            if not exists:
                 self.computer.log_error(f"The file path : '{file}' is not a valid path or does not exists.")
                 return False
         return True
 
     def upload_client_files(self) -> bool:
         """
-        Installs the client files on the computer. Overwrites the files if they already exist.
+        Installs the client files on the computer. Overwrites the files if they already exist. When the artifact
+        server runs, the computer downloads the large files from it, and only the other ones are uploaded.
 
         :return: True if the upload was successful, False otherwise.
         """
+        if self.download_from_peer():
+            return True
+
+        if client_bundle_service.enabled:
+            if self.upload_client_bundle():
+                return True
+            self.computer.log("Could not install the client bundle, uploading the files one by one.", level="warning")
+
         python_script_path: str = self.computer.paths.get_project_directory()
 
         created = self.computer.create_folder(python_script_path)
@@ -91,30 +216,175 @@ class ComputerDependenciesManager:
             self.computer.log_error(f"Error while creating the folder {python_script_path}")
             raise FileCreationError(f"Error while creating the folder {python_script_path}")
 
-        files_to_upload: list[str] = ServerPath.get_client_files()
-        try:
-            self.computer.upload_files(files_to_upload, python_script_path)
-            self.computer.log(f"Uploaded all the files : {files_to_upload}\n to the remote computer.")
-        except (FileNotFoundError, FileExistsError, IOError):
+        files_to_upload: list[str] = [file for file in ServerPath.get_client_files()
+                                      if not self.pull_client_file(file, python_script_path)]
+        if files_to_upload and not self.computer.upload_files(files_to_upload, python_script_path):
             self.computer.log_error(f"Error while uploading the files {files_to_upload} to the remote computer.")
             return False
 
+        self.computer.log(f"Uploaded all the files : {files_to_upload}\n to the remote computer.")
         return True
 
-    def are_client_files_up_to_date(self):
-        files: list[str] = ServerPath.get_client_files()
+    def upload_client_bundle(self) -> bool:
+        """
+        Sends the client files as a single compressed archive, and replaces the install folder with its content. The
+        computer pulls the archive from the artifact server if it runs, else it is uploaded over SFTP.
+        :return: True if the new files are installed, False otherwise.
+        """
+        try:
+            bundle: str = client_bundle_service.get_bundle(client_manifest_service.get_manifest())
+        except (OSError, tarfile.TarError) as e:
+            self.computer.log_error(f"Could not build the client bundle: {e}")
+            return False
+
+        home_directory: str = self.computer.paths.get_home_directory()
+        archive_path: str = self.computer.paths.join(home_directory, os.path.basename(bundle))
+        if not self.pull_artifact(bundle, archive_path) and not self.computer.upload_file(bundle, home_directory):
+            return False
+
+        install_folder: str = self.computer.paths.get_project_directory()
+        result = self.computer.execute_command(ClientBundleService.get_install_command(archive_path, install_folder))
+        if "BUNDLE_INSTALLED" not in (result.stdout or ""):
+            self.computer.log_error(f"Error while extracting the client bundle: {result.stderr}")
+            return False
+
+        self.computer.log(f"Installed the client bundle {os.path.basename(bundle)} "
+                          f"({os.path.getsize(bundle)} bytes) on the remote computer.")
+        return True
+
+    def pull_client_file(self, local_path: str, remote_folder: str) -> bool:
+        """
+        Makes the computer download a client file from the artifact server, if the file is at least one download
+        segment large. The smaller files are cheaper to upload together over SFTP.
+        :return: True if the computer downloaded the file, False if it has to be uploaded.
+        """
+        if not artifact_server.is_running() or os.path.getsize(local_path) < artifact_server.min_segment_size:
+            return False
+        remote_path: str = self.computer.paths.join(remote_folder, os.path.basename(local_path))
+        return self.pull_artifact(local_path, remote_path, client_manifest_service.get_manifest().get_hash(local_path))
+
+    def pull_artifact(self, local_path: str, remote_path: str, sha256: str | None = None) -> bool:
+        """
+        Makes the computer download a file from the artifact server, with several connections at once.
+        :param local_path: The path of the file on the server.
+        :param remote_path: The path where the computer saves it.
+        :param sha256: The hash of the file, if it is already known.
+        :return: True if the computer downloaded the file, and its hash is right. False if it did not, or if the
+        artifact server is not running.
+        """
+        if not artifact_server.is_running():
+            return False
+
+        artifact: PublishedArtifact = artifact_server.publish(local_path, sha256)
+        url: str = artifact_server.get_url(artifact, self.computer.get_local_address())
+        script: str = artifact_server.get_pull_script(artifact, url, remote_path)
+        result = self.computer.execute_powershell(script)
+        if "PULL_OK" not in (result.stdout or ""):
+            self.computer.log(f"Could not download {url} from the artifact server, uploading it instead: "
+                              f"{result.stderr}", level="warning")
+            return False
+
+        self.computer.log(f"Downloaded {os.path.basename(local_path)} from the artifact server.")
+        return True
+
+    def update_outdated_client_files(self, outdated_files: list[str]) -> bool:
+        """
+        Updates the client files that changed, with a delta transfer if it is enabled and the update.exe of the
+        remote computer supports it, or by uploading all of them.
+        :param outdated_files: The local paths of the client files that are not up to date on the remote computer.
+        :return: True if the files were updated, False otherwise.
+        """
+        if self.can_delta_update() and all(self.delta_update_client_file(file) for file in outdated_files):
+            return True
+        return self.upload_client_files()
+
+    def can_delta_update(self) -> bool:
+        """
+        :return: True if the delta transfer is enabled, and the update.exe of the remote computer is a release
+        supporting the --delta-* commands. An older one would start the update instead.
+        """
+        if not delta_sync_service.enabled:
+            return False
+        update_exe: str = self.computer.paths.join(self.computer.paths.get_project_directory(),
+                                                   Infos.client_exe_filename)
+        client_exe_hash: str | None = self.computer.get_files_sha256([update_exe])[0]
+        if delta_sync_service.is_supported_by(client_exe_hash):
+            return True
+        self.computer.log("The update.exe of the computer does not support the delta transfer, uploading the files "
+                          "entirely.")
+        return False
+
+    def delta_update_client_file(self, local_file: str) -> bool:
+        """
+        Updates a client file by only sending the blocks that changed since the version of the remote computer.
+        Small files, or files that changed too much, are uploaded entirely.
+        :param local_file: The local path of the client file.
+        :return: True if the file was updated, False otherwise.
+        """
+        project_directory: str = self.computer.paths.get_project_directory()
+        if not delta_sync_service.is_worth_it(local_file):
+            return self.computer.upload_file(local_file, project_directory)
+
+        remote_file: str = self.computer.paths.join(project_directory, os.path.basename(local_file))
+        update_exe: str = self.computer.paths.join(project_directory, Infos.client_exe_filename)
+        block_size: int = delta_sync_service.get_block_size(os.path.getsize(local_file))
+        result = self.computer.execute_command(f"cd /d \"{project_directory}\" && \"{update_exe}\" --delta-signature "
+                                               f"\"{remote_file}\" {block_size}")
+        try:
+            patch: DeltaPatch = delta_sync_service.get_patch(result.stdout or "", local_file)
+        except ValueError as e:
+            self.computer.log(f"Could not compute the delta of {remote_file}: {e}", level="warning")
+            return False
+
+        if patch.literal_bytes > delta_sync_service.max_literal_ratio * os.path.getsize(local_file):
+            self.computer.log(f"{remote_file} changed too much for a delta transfer, uploading it entirely.")
+            return self.computer.upload_file(local_file, project_directory)
+
+        if not self.computer.upload_file(patch.path, project_directory):
+            return False
+        remote_patch: str = self.computer.paths.join(project_directory, os.path.basename(patch.path))
+        result = self.computer.execute_command(
+            f"cd /d \"{project_directory}\" && \"{update_exe}\" --delta-patch \"{remote_file}\" \"{remote_patch}\" "
+            f"\"{remote_file}.new\" && move /Y \"{remote_file}.new\" \"{remote_file}\" >nul && echo DELTA_INSTALLED"
+            f" & del \"{remote_patch}\""
+        )
+        if "DELTA_INSTALLED" not in (result.stdout or ""):
+            self.computer.log(f"Could not apply the delta of {remote_file}: {result.stderr}", level="warning")
+            return False
+
+        self.computer.log(f"Updated {remote_file} with a delta of {patch.size} bytes instead of "
+                          f"{os.path.getsize(local_file)} bytes.")
+        return True
+
+    def are_client_files_up_to_date(self) -> bool:
+        return len(self.get_outdated_client_files()) == 0
+
+    def get_outdated_client_files(self) -> list[str]:
+        """
+        :return: The local paths of the client files that are missing or different on the remote computer.
+        """
+        manifest: ClientManifest = client_manifest_service.get_manifest()
+        files: list[str] = manifest.get_paths()
         remote_root_path: str = self.computer.paths.get_project_directory()
+        remote_files: list[str] = [self.computer.paths.join(remote_root_path, os.path.basename(file)) for file in files]
+
+        # The files are hashed on the remote computer, they are only downloaded if it could not hash them.
+        remote_hashes: list[str | None] = self.computer.get_files_sha256(remote_files)
 
         files_to_update: list[str] = []
-        for file in files:
-            remote_file: str = ServerPath.join(remote_root_path, os.path.basename(file))
-            if not self.computer.is_client_file_different(remote_file, file):
+        for file, remote_file, remote_hash in zip(files, remote_files, remote_hashes):
+            if remote_hash is None:
+                self.computer.log(f"Could not hash {remote_file} on the remote computer, downloading it to compare.",
+                                  level="warning")
+                up_to_date: bool = self.computer.is_client_file_different(remote_file, file, manifest.get_hash(file))
+            else:
+                up_to_date = remote_hash == manifest.get_hash(file)
+
+            if not up_to_date:
                 self.computer.log(f"File {file} is not up to date.")
                 files_to_update.append(file)
 
-        if len(files_to_update) > 0:
-            return False
-        return True
+        return files_to_update
 
     def reboot_and_reconnect(self) -> bool:
         self.computer.log("Rebooting remote computer...")
@@ -1,17 +1,31 @@
 import json
 import os
+import socket
+import time
 import traceback
+from typing import Callable
+
+import paramiko
 
 from src.server.core.remote_computer_manager import RemoteComputerManager
 from src.server.exceptions.ConnectionSSHException import ConnectionSSHException
 from src.server.infrastructure.config import Infos
 from src.server.logs_management.computer_logger import ComputerLogger
+from src.server.logs_management.server_logger import log_error
 from src.server.report.mails import send_error_email
-from src.server.ssh.commands import SSHCommandResult
+from src.server.ssh.commands import SSHCommandResult, SSHCommandTimeoutResult, command_deadlines
 from src.server.update_management.computer_dependencies_manager import ComputerDependenciesManager
+from src.server.update_management.peer_distribution import peer_distributor
+from src.server.update_management.rollout_journal import RolloutJournal, HostCheckpoint
+from src.server.update_management.retry_scheduler import FailureKind
+from src.server.update_management.rollout_phases import RolloutPhase
+from src.server.wake_on_lan.bulk_wake import BulkWaker
 
 
 class ComputerUpdateManager:
+    # How long the result of the fleet reachability scan is trusted, in seconds.
+    SCAN_MAX_AGE: int = 5 * 60
+
     def __init__(self, computer: 'RemoteComputerManager'):
         self.computer: 'RemoteComputerManager' = computer
         self.log = computer.log
@@ -27,57 +41,249 @@ class ComputerUpdateManager:
         self.no_updates = False
         self.traceback = None
         self.error = None
+        self.failure_kind: FailureKind | None = None
 
         self.updates_string = None
+        # Called with every progress event of the client program, from the thread running it.
+        self.progress_listener: Callable[[dict], None] | None = None
+
+        self.journal: RolloutJournal | None = None
+        self.checkpoint: HostCheckpoint | None = None
+
+        self.scanned_awake: bool | None = None
+        self.scan_time: float = 0.0
+        # Set by the fleet scan when the computer is woken up in the background with the rest of the fleet.
+        self.bulk_waker: BulkWaker | None = None
 
     def update(self):
         # noinspection PyBroadException
         try:
-            self.log(f"Updating computer {self.hostname}... Checking if the PC is awake...")
-            if not self.computer.is_pc_on():
-                self.log("Waking up the pc...")
-                if not self.computer.awake_pc():
-                    self.log_error("Could not awake computer... Cannot Update.")
-                    raise ConnectionSSHException()
+            self.wake_up()
+            self.record_phase(RolloutPhase.WAKE)
 
             self.log_add_vertical_space()
-            if not self.computer.connect():
-                self.log_error("Could not connect to computer... Cannot Update.")
-                raise ConnectionSSHException()
+            self.connect()
+            self.record_phase(RolloutPhase.CONNECT)
+
+            if not self.is_phase_completed(RolloutPhase.UPLOAD):
+                self.log_add_vertical_space()
+                if not self.install_prerequisites_client():
+                    return self.log_error("Could not install prerequisites on the client... Cannot Update.")
+                self.record_phase(RolloutPhase.UPLOAD)
+
+            if self.is_phase_completed(RolloutPhase.INSTALL):
+                up = self.get_resumed_install_result()
+            else:
+                self.log_add_vertical_space()
+                update_successful, up = self.install_update()
+                if not update_successful:
+                    return self.log_error("Could not install update on client.")
+                self.record_phase(RolloutPhase.INSTALL, no_updates=up is not None)
+
+            self.finish_update(up)
+            self.record_phase(RolloutPhase.SHUTDOWN)
+            return True
+        except Exception as e:
+            self.handle_update_error(e)
+            return False
 
-            self.log_add_vertical_space()
-            if not self.install_prerequisites_client():
-                return self.log_error("Could not install prerequisites on the client... Cannot Update.")
+    def wake_up(self) -> None:
+        """
+        Wakes the computer up with a wake on lan packet if it is not reachable. A computer already being woken up by
+        the bulk waker is waited for instead.
+        :raises ConnectionSSHException: If the computer could not be woken up.
+        """
+        self.log(f"Updating computer {self.hostname}... Checking if the PC is awake...")
+        is_awake: bool | None = self.get_scanned_state()
+        if is_awake is False and self.bulk_waker is not None and self.bulk_waker.is_waking(self.ipv4):
+            self.log("Waiting for the pc, woken up with the rest of the fleet...")
+            if not self.bulk_waker.wait_until_awake_blocking(self.ipv4):
+                self.log_error("Error, the pc is still off.")
+                self.wake_up_failed()
+            self.log("The pc is awake...")
+            return
+
+        if is_awake is None:
+            is_awake = self.computer.is_pc_on()
+        if not is_awake:
+            self.log("Waking up the pc...")
+            if not self.computer.awake_pc():
+                self.wake_up_failed()
+
+    def wake_up_failed(self) -> None:
+        """
+        :raises ConnectionSSHException: Always, after logging the failure.
+        """
+        self.log_error("Could not awake computer... Cannot Update.")
+        self.failure_kind = FailureKind.WAKE
+        raise ConnectionSSHException()
 
-            self.log_add_vertical_space()
-            update_successful, up = self.install_update()
-            if not update_successful:
-                return self.log_error("Could not install update on client.")
+    def set_scanned_state(self, is_awake: bool) -> None:
+        """
+        Stores the result of the fleet reachability scan, so that the wake up does not probe the computer again.
+        """
+        self.scanned_awake = is_awake
+        self.scan_time = time.monotonic()
 
-            self.no_updates = False
+    def get_scanned_state(self) -> bool | None:
+        """
+        :return: The state found by the reachability scan, or None if there is no recent one. It is used only once.
+        """
+        scanned_awake, self.scanned_awake = self.scanned_awake, None
+        if scanned_awake is None or time.monotonic() - self.scan_time >= self.SCAN_MAX_AGE:
+            return None
+        return scanned_awake
 
-            if up is not None:
-                self.no_updates = True
+    def connect(self) -> bool:
+        """
+        Connects to the computer via SSH.
+        :return: True, since a failure raises an exception.
+        :raises ConnectionSSHException: If the connection failed.
+        """
+        if not self.computer.connect():
+            self.log_error("Could not connect to computer... Cannot Update.")
+            if isinstance(self.computer.get_remote_computer().last_connection_error, paramiko.AuthenticationException):
+                self.failure_kind = FailureKind.AUTH
+            else:
+                self.failure_kind = FailureKind.TRANSIENT_SSH
+            raise ConnectionSSHException()
+        return True
 
-            self.log_add_vertical_space()
-            self.computer.shutdown()
+    def finish_update(self, up) -> None:
+        """
+        Marks the computer as updated and shuts it down.
+        :param up: The second value returned by install_update, not None when there were no updates.
+        """
+        self.no_updates = False
 
-            self.updated_successfully = True
-            return True
-        except Exception as e:
-            self.log_add_vertical_space(2)
-            self.log_raw("\n" + ComputerLogger.get_header_style_string("ERROR"))
-            self.log_error(f"Unhandled error. Could not update computer {self.hostname}: ")
-            self.log_add_vertical_space(1)
+        if up is not None:
+            self.no_updates = True
 
-            self.traceback: str = traceback.format_exc()
-            self.error = e
+        self.log_add_vertical_space()
+        self.withdraw_seed()
+        self.computer.shutdown()
 
-            self.log_error(f"Here is the traceback:\n{self.traceback}")
-            if Infos.email_send:
-                send_error_email(computer=self.computer, error=str(self.error), traceback=self.traceback)
+        self.updated_successfully = True
 
-            return False
+    def finish_without_updates(self) -> None:
+        """
+        Finishes a computer on which the pending update scan found nothing to install, without sending it the client
+        nor running it.
+        """
+        self.log("No pending updates, skipping the installation.")
+        self.record_phase(RolloutPhase.INSTALL, no_updates=True)
+        self.finish_update("no updates found")
+        self.record_phase(RolloutPhase.SHUTDOWN)
+
+    def withdraw_seed(self) -> None:
+        """
+        Stops sending the other computers of the subnet to this one for the client files, before it reboots or shuts
+        down.
+        """
+        peer_distributor.remove_seed(self.ipv4)
+
+    def get_failure_kind(self) -> FailureKind:
+        """
+        :return: Why the last update attempt failed. Failures without a known cause are FailureKind.OTHER.
+        """
+        return self.failure_kind if self.failure_kind is not None else FailureKind.OTHER
+
+    def reset_for_retry(self) -> None:
+        """
+        Clears the state of a failed attempt, before the computer is tried again. The phases completed by the failed
+        attempt are read back from the journal, so that the next attempt restarts after them.
+        """
+        self.updated_successfully = False
+        self.no_updates = False
+        self.traceback = None
+        self.error = None
+        self.failure_kind = None
+        self.updates_string = None
+        self.computer.close_ssh_session()
+        if self.journal is not None:
+            self.checkpoint = self.journal.load_checkpoints().get(self.hostname)
+
+    def cancel_commands(self) -> None:
+        """
+        Interrupts the commands running on the computer when the rollout is aborted, so that the worker updating it
+        returns instead of waiting for their deadline.
+        """
+        self.computer.cancel_commands()
+
+    def record_phase(self, phase: RolloutPhase, **details) -> None:
+        """
+        Writes the completed phase in the rollout journal, if there is one.
+        """
+        if self.journal is not None:
+            self.journal.record_phase(self.hostname, phase, **details)
+
+    def record_result(self) -> None:
+        """
+        Writes the final result of the computer in the rollout journal, if there is one.
+        """
+        if self.journal is None:
+            return
+        if not self.updated_successfully:
+            self.journal.record_result(self.hostname, RolloutJournal.RESULT_FAILED)
+        elif self.no_updates:
+            self.journal.record_result(self.hostname, RolloutJournal.RESULT_NO_UPDATES)
+        else:
+            self.journal.record_result(self.hostname, RolloutJournal.RESULT_UPDATED)
+
+    def is_phase_completed(self, phase: RolloutPhase) -> bool:
+        """
+        :return: True if the phase was completed before the server restarted, when resuming a rollout.
+        """
+        return self.checkpoint is not None and self.checkpoint.is_phase_completed(phase)
+
+    def get_resumed_install_result(self) -> str | None:
+        """
+        :return: The second value install_update returned before the server restarted.
+        """
+        self.log("The update was installed before the server restarted, skipping the installation.")
+        if self.checkpoint.phase_details[RolloutPhase.INSTALL].get("no_updates"):
+            return "no updates found"
+        return None
+
+    def handle_update_error(self, e: Exception, formatted_traceback: str | None = None) -> None:
+        """
+        Handles an exception that stopped an update attempt, the same way for both orchestrators: a connection
+        failure is logged, any other exception is reported as an unhandled error.
+        :param e: The exception.
+        :param formatted_traceback: The traceback of the exception, see report_unhandled_error.
+        """
+        if isinstance(e, ConnectionSSHException):
+            log_error("SSH connection error on :" + self.hostname)
+        else:
+            self.report_unhandled_error(e, formatted_traceback)
+
+    def report_unhandled_error(self, e: Exception, formatted_traceback: str | None = None) -> None:
+        """
+        Logs an unexpected error of the update process. It is only sent by email by report_final_failure, once the
+        computer is not tried again.
+        :param e: The exception.
+        :param formatted_traceback: The traceback of the exception. Defaults to the traceback of the exception being
+        handled, so it must be given when this is not called from the except block.
+        """
+        self.log_add_vertical_space(2)
+        self.log_raw("\n" + ComputerLogger.get_header_style_string("ERROR"))
+        self.log_error(f"Unhandled error. Could not update computer {self.hostname}: ")
+        self.log_add_vertical_space(1)
+
+        self.traceback: str = formatted_traceback if formatted_traceback is not None else traceback.format_exc()
+        self.error = e
+        if isinstance(e, (paramiko.SSHException, socket.error, EOFError)):
+            self.failure_kind = FailureKind.TRANSIENT_SSH
+
+        self.log_error(f"Here is the traceback:\n{self.traceback}")
+
+    def report_final_failure(self) -> None:
+        """
+        Sends the unhandled error of the last attempt by email if configured, once the retry scheduler gave up on the
+        computer.
+        """
+        if self.error is not None and Infos.email_send:
+            send_error_email(computer=self.computer, error=str(self.error), traceback=self.traceback)
 
     def install_prerequisites_client(self):
         self.log("Checking if pre-requisites are installed on the client...")
@@ -100,19 +306,14 @@ class ComputerUpdateManager:
     def install_update(self):
         self.log("Installing update on the client...")
         try:
-            result: dict = self.__start_client_program()
-
-            if not result:
-                self.log_error("Could not start python script.")
-                return False, None
+            result: dict | None = self.run_client_program()
 
-            if result["ErrorMessage"]:
-                self.log_error(f"An error occurred :\n{result['ErrorMessage']}.")
+            if result is None:
                 return False, None
 
-            self.updates_string = result["UpdateNames"]
             if result["RebootRequired"]:
                 self.log("Pc is rebooting...")
+                self.withdraw_seed()
                 four_hours: int = 60 * 60 * 4
                 if not self.wait_for_pc_to_be_online_again(timeout=four_hours):
                     self.log_error("Could not wait for pc to be online again.")
@@ -131,15 +332,40 @@ class ComputerUpdateManager:
 
         return True, None
 
+    def run_client_program(self) -> dict | None:
+        """
+        Runs the client program and checks its results, without waiting for a possible reboot.
+        :return: The results of the client program, or None if it failed.
+        """
+        result: dict = self.__start_client_program()
+
+        if not result:
+            self.log_error("Could not start python script.")
+            return None
+
+        if result["ErrorMessage"]:
+            self.log_error(f"An error occurred :\n{result['ErrorMessage']}.")
+            return None
+
+        self.updates_string = result["UpdateNames"]
+        return result
+
     def __start_client_program(self):
         self.log("Starting the client program...")
         command: str = "cd " + Infos.PROJECT_NAME + " && " + self.computer.paths.get_program_path()
 
-        res: 'SSHCommandResult' = self.computer.execute_command(command)
+        res: 'SSHCommandResult' = self.computer.execute_command_streaming(command, self.__on_client_line,
+                                                                          command_deadlines.client_program_timeout)
         stdout, stderr = res.stdout, res.stderr
 
         self.log("Python script started.")
 
+        if isinstance(res, SSHCommandTimeoutResult):
+            self.log_error(f"The client program did not end ({res.reason}, deadline of {res.timeout:.0f} seconds), "
+                           f"it was stopped. Its output:\n{stdout}")
+            self.failure_kind = FailureKind.TRANSIENT_SSH
+            return None
+
         if stderr:
             self.log_error(f"Error while starting the python script:\n{stderr}")
             return None
@@ -149,23 +375,70 @@ class ComputerUpdateManager:
                 return None
             self.log(f"Stdout : \n{stdout}")
 
-            json_filename: str = f"results-{self.hostname}.json"
-            remote_file_path: str = self.computer.paths.join(self.computer.paths.get_project_directory(),
-                                                             json_filename.replace(f"-{self.hostname}", ""))
+            json_res: dict | None = self.parse_result_event(stdout)
+            if json_res is None:
+                # Clients older than the result line only write results.json.
+                json_res = self.__download_results_file()
+                if json_res is None:
+                    return None
+            self.log(f"Here is the json file content:\n{json.dumps(json_res, indent=4)}", new_lines=1)
+            return json_res
+        self.log_error("The python script returned nothing.")
+        return None
 
-            if not self.computer.download_file(json_filename, remote_file_path):
-                self.log_error("Could not download the json file.")
-                return None
+    @staticmethod
+    def parse_event(line: str) -> dict | None:
+        """
+        :return: The event of a json line printed by update.exe ({"event": ..., "data": {...}}), or None if the line
+        is not an event.
+        """
+        line = line.strip()
+        if not line.startswith("{"):
+            return None
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(event, dict) and isinstance(event.get("event"), str) and isinstance(event.get("data"), dict):
+            return event
+        return None
+
+    @staticmethod
+    def parse_result_event(stdout: str) -> dict | None:
+        """
+        Reads the results of the updates from the output of update.exe, which prints them as its last json line, so
+        that results.json does not have to be downloaded.
+        :return: The results, or None if the output has no result line.
+        """
+        for line in reversed(stdout.splitlines()):
+            event: dict | None = ComputerUpdateManager.parse_event(line)
+            if event is not None and event["event"] == "result":
+                return event["data"]
+        return None
 
-            with open(json_filename, "r") as f:
-                json_res: dict = json.load(f)
-                self.log(f"Here is the json file content:\n{json.dumps(json_res, indent=4)}", new_lines=1)
+    def __on_client_line(self, line: str) -> None:
+        event: dict | None = self.parse_event(line)
+        if event is None or event["event"] != "progress":
+            return
+        progress: dict = event["data"]
+        self.log(f"Client progress: {progress.get('Stage')}, {progress.get('UpdateCount', 0)} update(s).")
+        if self.progress_listener is not None:
+            self.progress_listener(progress)
+
+    def __download_results_file(self) -> dict | None:
+        json_filename: str = f"results-{self.hostname}.json"
+        remote_file_path: str = self.computer.paths.join(self.computer.paths.get_project_directory(),
+                                                         json_filename.replace(f"-{self.hostname}", ""))
+
+        if not self.computer.download_file(json_filename, remote_file_path):
+            self.log_error("Could not download the json file.")
+            return None
 
-            os.remove(json_filename)
+        with open(json_filename, "r") as f:
+            json_res: dict = json.load(f)
 
-            return json_res
-        self.log_error("The python script returned nothing.")
-        return None
+        os.remove(json_filename)
+        return json_res
 
     def wait_for_pc_to_be_online_again(self, timeout: int):
         """
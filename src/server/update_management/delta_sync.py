@@ -0,0 +1,254 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from threading import Lock
+from typing import BinaryIO
+
+from src.server.infrastructure.paths import ServerPath
+
+# Must stay identical to the format of src/client/delta_sync.py, which applies the patches.
+PATCH_MAGIC: bytes = b"UGDELTA1"
+COPY_OPERATION: int = 1
+DATA_OPERATION: int = 2
+
+# The size of the reads of the new file, and of the biggest data operation of a patch.
+CHUNK_SIZE: int = 1024 * 1024
+
+
+@dataclass
+class DeltaSignature:
+    """
+    The checksums of the blocks of a file on a computer, computed by update.exe --delta-signature.
+    """
+    size: int
+    block_size: int
+    blocks: list[tuple[int, str]]
+
+    @classmethod
+    def from_json(cls, text: str) -> 'DeltaSignature':
+        """
+        :raises ValueError: If the text is not a signature.
+        """
+        try:
+            data: dict = json.loads(text)
+            return cls(int(data["size"]), int(data["block_size"]),
+                       [(int(weak), str(strong)) for weak, strong in data["blocks"]])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid delta signature: {e}") from e
+
+
+@dataclass
+class DeltaPatch:
+    """
+    A patch rebuilding a file from the blocks the computer already has, and the data it does not have.
+    """
+    path: str
+    size: int
+    literal_bytes: int
+
+
+class DeltaSyncService:
+    """
+    rsync-like transfer of the big client files: the computer sends the checksums of the blocks of its version of a
+    file, and the server only sends the blocks that changed, with a patch that update.exe applies.
+
+    A patch is computed once for every (version of the file on the computers, new version of the file), so the
+    computers having the same old update.exe share it. It needs an update.exe supporting the --delta-* commands on
+    the computer: an older one would start the update instead, so it is only used on the computers whose update.exe
+    has one of the supported_client_hashes, the sha256 of the releases supporting it.
+    """
+
+    def __init__(self, enabled: bool = False, min_file_size: int = 1024 * 1024, block_size: int = 0,
+                 max_literal_ratio: float = 0.5, supported_client_hashes: list[str] | None = None,
+                 folder: str | None = None):
+        self.enabled: bool = enabled
+        self.min_file_size: int = min_file_size
+        self.block_size: int = block_size
+        self.max_literal_ratio: float = max_literal_ratio
+        self.supported_client_hashes: set[str] = {value.lower() for value in supported_client_hashes or []}
+        self.folder: str | None = folder
+        self.lock = Lock()
+        self.patches: dict[str, DeltaPatch] = {}
+        self.patch_locks: dict[str, Lock] = {}
+
+    def configure(self, enabled: bool, min_file_size: int, block_size: int, max_literal_ratio: float,
+                  supported_client_hashes: list[str]) -> None:
+        self.enabled = enabled
+        self.min_file_size = min_file_size
+        self.block_size = block_size
+        self.max_literal_ratio = max_literal_ratio
+        self.supported_client_hashes = {value.lower() for value in supported_client_hashes}
+
+    def is_supported_by(self, client_exe_hash: str | None) -> bool:
+        """
+        :param client_exe_hash: The sha256 of the update.exe of the computer, None if it is not known.
+        :return: True if that update.exe supports the --delta-* commands.
+        """
+        return client_exe_hash is not None and client_exe_hash.lower() in self.supported_client_hashes
+
+    def get_folder(self) -> str:
+        if self.folder is None:
+            self.folder = ServerPath.get_client_bundles_folder()
+        return self.folder
+
+    def get_block_size(self, file_size: int) -> int:
+        """
+        :return: The configured block size, or about the square root of the file size, like rsync.
+        """
+        if self.block_size > 0:
+            return self.block_size
+        return min(64 * 1024, max(2048, math.isqrt(file_size) // 1024 * 1024))
+
+    def is_worth_it(self, file_path: str) -> bool:
+        return self.enabled and os.path.getsize(file_path) >= self.min_file_size
+
+    def get_patch(self, signature_text: str, file_path: str) -> DeltaPatch:
+        """
+        Returns the patch turning the file of the computer into the local file, computed once per signature.
+        Different patches are computed at the same time, the computers waiting for the same patch share it.
+        :param signature_text: The output of update.exe --delta-signature.
+        :param file_path: The new version of the file, on the server.
+        :raises ValueError: If the signature is invalid.
+        """
+        stat: os.stat_result = os.stat(file_path)
+        key: str = hashlib.sha256(f"{file_path}:{stat.st_size}:{stat.st_mtime}\n{signature_text}".encode()).hexdigest()
+        with self.lock:
+            patch: DeltaPatch | None = self.get_cached_patch(key)
+            if patch is not None:
+                return patch
+            patch_lock: Lock = self.patch_locks.setdefault(key, Lock())
+
+        with patch_lock:
+            with self.lock:
+                patch = self.get_cached_patch(key)
+            if patch is not None:
+                return patch
+
+            signature: DeltaSignature = DeltaSignature.from_json(signature_text)
+            os.makedirs(self.get_folder(), exist_ok=True)
+            path: str = os.path.join(self.get_folder(), f"{os.path.basename(file_path)}.{key[:16]}.delta")
+            with open(file_path, "rb") as file, open(path + ".tmp", "wb") as output:
+                literal_bytes: int = self.compute_patch(signature, file, output)
+            os.replace(path + ".tmp", path)
+
+            patch = DeltaPatch(path, os.path.getsize(path), literal_bytes)
+            with self.lock:
+                self.patches[key] = patch
+                self.patch_locks.pop(key, None)
+            return patch
+
+    def get_cached_patch(self, key: str) -> DeltaPatch | None:
+        patch: DeltaPatch | None = self.patches.get(key)
+        return patch if patch is not None and os.path.exists(patch.path) else None
+
+    @staticmethod
+    def compute_patch(signature: DeltaSignature, file: BinaryIO, output: BinaryIO) -> int:
+        """
+        Finds the blocks of the signature in the new file, with the rolling checksum of rsync, and writes the
+        compressed patch to output. The file is read by chunks, only a few blocks of it are in memory.
+        :return: The number of bytes that were not found on the computer.
+        """
+        block_size: int = signature.block_size
+        # The last block is only indexed if it is complete, the rolling window always has block_size bytes.
+        full_blocks: int = signature.size // block_size
+        index: dict[int, dict[str, int]] = {}
+        for block_index, (weak, strong) in enumerate(signature.blocks[:full_blocks]):
+            index.setdefault(weak, {}).setdefault(strong, block_index)
+
+        hasher = hashlib.sha256()
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+        file.seek(0)
+
+        compressor = zlib.compressobj(9)
+        output.write(compressor.compress(PATCH_MAGIC + struct.pack("<I", block_size) + hasher.digest()))
+
+        literal = bytearray()
+        literal_bytes: int = 0
+        copy_start: int | None = None
+        copy_count: int = 0
+
+        def flush_literal() -> None:
+            if literal:
+                output.write(compressor.compress(struct.pack("<BI", DATA_OPERATION, len(literal)) + bytes(literal)))
+                literal.clear()
+
+        def flush_copy() -> None:
+            nonlocal copy_start, copy_count
+            if copy_start is not None:
+                output.write(compressor.compress(struct.pack("<BII", COPY_OPERATION, copy_start, copy_count)))
+                copy_start, copy_count = None, 0
+
+        buffer = bytearray()
+        position: int = 0
+        end_of_file: bool = False
+
+        def fill() -> None:
+            """
+            Reads the file until the buffer has the window and the byte after it, or the file ends.
+            """
+            nonlocal position, end_of_file
+            if position + block_size < len(buffer) or end_of_file:
+                return
+            del buffer[:position]
+            position = 0
+            while len(buffer) <= block_size and not end_of_file:
+                read: bytes = file.read(max(CHUNK_SIZE, block_size))
+                buffer.extend(read)
+                end_of_file = not read
+
+        a: int = 0
+        b: int = 0
+        window_ready: bool = False
+        while True:
+            fill()
+            if position + block_size > len(buffer):
+                break
+            if not window_ready:
+                window: bytes = bytes(buffer[position:position + block_size])
+                a = sum(window) & 0xFFFF
+                b = sum(itertools.accumulate(window)) & 0xFFFF
+                window_ready = True
+
+            match: int | None = None
+            candidates: dict[str, int] | None = index.get(a | (b << 16))
+            if candidates is not None:
+                match = candidates.get(hashlib.md5(buffer[position:position + block_size]).hexdigest())
+
+            if match is not None:
+                flush_literal()
+                if copy_start is not None and copy_start + copy_count == match:
+                    copy_count += 1
+                else:
+                    flush_copy()
+                    copy_start, copy_count = match, 1
+                position += block_size
+                window_ready = False
+                continue
+
+            flush_copy()
+            outgoing: int = buffer[position]
+            literal.append(outgoing)
+            literal_bytes += 1
+            if len(literal) >= CHUNK_SIZE:
+                flush_literal()
+            if position + block_size < len(buffer):
+                incoming: int = buffer[position + block_size]
+                a = (a - outgoing + incoming) & 0xFFFF
+                b = (b - block_size * outgoing + a) & 0xFFFF
+            position += 1
+
+        flush_copy()
+        literal.extend(buffer[position:])
+        literal_bytes += len(buffer) - position
+        flush_literal()
+        output.write(compressor.flush())
+        return literal_bytes
+
+
+delta_sync_service = DeltaSyncService()
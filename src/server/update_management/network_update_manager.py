@@ -1,19 +1,33 @@
 import concurrent
+import heapq
+import itertools
 import json
 import os
+import time
 import traceback
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 
+from src.server.core.host_records import host_record_store
+from src.server.core.reachability import scan_reachability_blocking
 from src.server.core.remote_computers_database import RemoteComputerDatabase
-from src.server.exceptions.ConnectionSSHException import ConnectionSSHException
 from src.server.factory.computer_updater_manager_factory import ComputerUpdaterManagerFactory
 from src.server.factory.auto_update_factory import AutoUpdateFactory
 from src.server.infrastructure.config import Infos
 from src.server.infrastructure.paths import ServerPath
+from src.server.infrastructure.artifact_server import artifact_server
+from src.server.infrastructure.rollout_config import RolloutConfig
 from src.server.logs_management.server_logger import log, log_new_lines, log_error
 from src.server.report.mails import EmailResults
+from src.server.ssh.connection_pool import ssh_connection_pool
+from src.server.update_management.async_update_orchestrator import AsyncUpdateOrchestrator
+from src.server.update_management.client_manifest import client_manifest_service
 from src.server.update_management.computer_update_manager import ComputerUpdateManager
+from src.server.update_management.peer_distribution import peer_distributor
+from src.server.update_management.pending_update_scan import PendingUpdateScanner, RolloutPlan
+from src.server.update_management.retry_scheduler import RetryScheduler
+from src.server.wake_on_lan.bulk_wake import BulkWaker
+from src.server.update_management.rollout_journal import RolloutJournal, HostCheckpoint
 
 
 class UpdateManager(RemoteComputerDatabase):
@@ -59,31 +73,61 @@ class UpdateManager(RemoteComputerDatabase):
             log_new_lines(2)
             self.update_all_computers()
 
-    def update_all_computers(self):
-        max_workers = self.get_max_number_of_simultaneous_updates()
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            computers: list[ComputerUpdateManager] = self.get_computers()
-            if not computers:
-                log("No computers to update.")
+    def resume_update(self):
+        """
+        Resumes the last rollout if the server stopped in the middle of it. The computers that already finished are
+        skipped, and the other ones restart after their last completed phase.
+        :returns: None
+        """
+        with self.lock:
+            journal: RolloutJournal | None = RolloutJournal.find_unfinished()
+            if journal is None:
+                log("There is no interrupted rollout to resume.", print_formatted=False)
                 return
 
-            # Lancer les tâches de mise à jour et récupérer les résultats
-            future_to_computer = {
-                executor.submit(self.update_one_computer, computer): computer for computer in computers
-            }
+            log(f"Resuming the interrupted rollout of the journal {journal.path}...", print_formatted=False)
+            self.load_computer_data()
+            self.load_email_infos()
+            log_new_lines(2)
+            self.update_all_computers(journal)
 
-            # Itérer sur les résultats pour détecter et traiter les exceptions
-            for future in concurrent.futures.as_completed(future_to_computer):
-                computer = future_to_computer[future]
-                try:
-                    future.result()  # Cela lèvera une exception si la tâche a échoué
-                    # Traiter le résultat ici si nécessaire
-                except Exception as exc:
-                    # Récupérer le traceback complet
-                    tb = traceback.format_exc()
-                    log(f"Computer update failed for {computer} with exception: {exc}\nTraceback: {tb}",
-                        print_formatted=False)
+    def update_all_computers(self, journal: RolloutJournal | None = None):
+        if not self.get_computers():
+            log("No computers to update.")
+            return
+
+        if journal is None:
+            journal = RolloutJournal.create()
+        computers: list[ComputerUpdateManager] = self.attach_journal(journal)
+
+        config: RolloutConfig = RolloutConfig.load()
+        config.apply()
+        peer_distributor.build([computer.ipv4 for computer in computers])
+        retry_scheduler: RetryScheduler = RetryScheduler.from_config(config.retry)
+        try:
+            if artifact_server.enabled:
+                artifact_server.start()
+            try:
+                # Hashes the client files once, before the computers compare their files with them.
+                log(f"Client files version: {client_manifest_service.get_manifest().version}", print_formatted=False)
+            except FileNotFoundError as e:
+                log_error(f"Could not compute the manifest of the client files: {e}")
+            if config.pending_scan.enabled:
+                computers = self.plan_rollout(computers, config)
+            if config.is_asyncio_mode():
+                AsyncUpdateOrchestrator(computers, config, retry_scheduler).run()
+            else:
+                if config.adaptive_concurrency.enabled:
+                    log_error("Adaptive concurrency needs the asyncio orchestrator mode, using "
+                              "max_computers_per_iteration instead.")
+                self.scan_fleet(computers, config)
+                self.update_all_computers_threaded(computers, retry_scheduler)
+        finally:
+            ssh_connection_pool.close_all()
+            artifact_server.stop()
+            host_record_store.flush()
+        # Only a rollout that went through is finished, an interrupted one stays resumable with --resume.
+        journal.finish()
 
         log("Update rollout over. Checks logs for more informations.", print_formatted=False)
         if Infos.email_send:
@@ -91,26 +135,140 @@ class UpdateManager(RemoteComputerDatabase):
             EmailResults(self).send_email_results()
 
     @staticmethod
-    def update_one_computer(computer: ComputerUpdateManager):
-        log(message="Updating computer " + computer.get_hostname() + "...")
+    def plan_rollout(computers: list[ComputerUpdateManager], config: RolloutConfig) -> list[ComputerUpdateManager]:
+        """
+        Scans the pending updates of the computers that are on, and finishes the ones with none right away.
+        :return: The computers that still have to be updated.
+        """
+        scanner: PendingUpdateScanner = PendingUpdateScanner.from_config(config.pending_scan, config.reachability)
+        # Only the computers starting from scratch are scanned, the resumed ones may have installed their updates.
+        plan: RolloutPlan = scanner.plan([computer for computer in computers if computer.checkpoint is None])
+        skipped: set[ComputerUpdateManager] = set()
+
+        with ThreadPoolExecutor(max_workers=scanner.max_concurrent_scans) as executor:
+            futures = {executor.submit(computer.finish_without_updates): computer
+                       for computer in plan.nothing_to_install}
+            for future in concurrent.futures.as_completed(futures):
+                computer: ComputerUpdateManager = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # The computer goes through the whole update instead.
+                    computer.log_error(f"Could not finish the computer without updates: {e}")
+                    computer.updated_successfully = False
+                    computer.no_updates = False
+                    continue
+                computer.record_result()
+                skipped.add(computer)
+
+        return [computer for computer in computers if computer not in skipped]
 
-        try:
-            if not computer.update():
-                computer.updated_successfully = False
-                computer.no_updates = False
+    @staticmethod
+    def scan_fleet(computers: list[ComputerUpdateManager], config: RolloutConfig):
+        """
+        Probes every computer at once, so that only the computers that are off are woken up. They are all woken up
+        now in the background, so that they boot while the first computers are updated.
+        """
+        states: dict[str, bool] = scan_reachability_blocking(
+            [computer.ipv4 for computer in computers],
+            timeout=config.reachability.probe_timeout,
+            max_probes_in_flight=config.reachability.max_probes_in_flight
+        )
+        for computer in computers:
+            computer.set_scanned_state(states[computer.ipv4])
+        log(f"Reachability scan: {sum(states.values())} of {len(states)} computers are on.", print_formatted=False)
+
+        off_computers = [computer for computer in computers if not states[computer.ipv4]]
+        if off_computers and config.bulk_wake.enabled:
+            bulk_waker: BulkWaker = BulkWaker.from_config(config.bulk_wake, config.reachability)
+            bulk_waker.start_in_background([(computer.mac_address, computer.ipv4) for computer in off_computers])
+            for computer in off_computers:
+                computer.bulk_waker = bulk_waker
+
+    def update_all_computers_threaded(self, computers: list[ComputerUpdateManager], retry_scheduler: RetryScheduler):
+        max_workers = self.get_max_number_of_simultaneous_updates()
+        # Computers waiting for their retry, as (time of the retry, order, computer).
+        retries: list[tuple[float, int, ComputerUpdateManager]] = []
+        retries_order = itertools.count()
 
-                log_error("Error while updating computer " + computer.get_hostname())
-                log_error("Skipping this computer...")
-                return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Lancer les tâches de mise à jour et récupérer les résultats
+            future_to_computer = {
+                executor.submit(self.update_one_computer, computer, retry_scheduler): computer
+                for computer in computers
+            }
 
-            if computer.no_updates:
-                log("Computer " + computer.get_hostname() + " has no updates.")
-                return
+            try:
+                while future_to_computer or retries:
+                    timeout: float | None = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+                    if future_to_computer:
+                        done, _ = concurrent.futures.wait(future_to_computer, timeout=timeout,
+                                                          return_when=concurrent.futures.FIRST_COMPLETED)
+                    else:
+                        done = set()
+                        time.sleep(timeout)
+
+                    # Itérer sur les résultats pour détecter et traiter les exceptions
+                    for future in done:
+                        computer = future_to_computer.pop(future)
+                        try:
+                            # Cela lèvera une exception si la tâche a échoué
+                            retry_delay: float | None = future.result()
+                            if retry_delay is not None:
+                                heapq.heappush(retries, (time.monotonic() + retry_delay, next(retries_order), computer))
+                        except Exception as exc:
+                            # Récupérer le traceback complet
+                            tb = traceback.format_exc()
+                            log(f"Computer update failed for {computer} with exception: {exc}\nTraceback: {tb}",
+                                print_formatted=False)
+
+                    # The retries are queued behind the first attempts still waiting for a worker.
+                    while retries and retries[0][0] <= time.monotonic():
+                        _, _, computer = heapq.heappop(retries)
+                        computer.reset_for_retry()
+                        future_to_computer[executor.submit(self.update_one_computer, computer, retry_scheduler)] = \
+                            computer
+            except BaseException:
+                # Aborted (Ctrl-C): the commands of the running updates are cancelled, so that their workers return
+                # before the executor waits for them.
+                executor.shutdown(wait=False, cancel_futures=True)
+                for computer in future_to_computer.values():
+                    computer.cancel_commands()
+                raise
+
+    def attach_journal(self, journal: RolloutJournal) -> list[ComputerUpdateManager]:
+        """
+        Gives the journal to every computer, and restores the state of the computers of a resumed rollout.
+        :param journal: The journal of the rollout.
+        :return: The computers that still have to be updated.
+        """
+        checkpoints: dict[str, HostCheckpoint] = journal.load_checkpoints()
+        computers: list[ComputerUpdateManager] = []
+        for computer in self.computers:
+            computer.journal = journal
+            checkpoint: HostCheckpoint | None = checkpoints.get(computer.get_hostname())
+
+            if checkpoint is not None and checkpoint.result in (RolloutJournal.RESULT_UPDATED,
+                                                                RolloutJournal.RESULT_NO_UPDATES):
+                computer.updated_successfully = True
+                computer.no_updates = checkpoint.result == RolloutJournal.RESULT_NO_UPDATES
+                log(f"Computer {computer.get_hostname()} already finished before the restart, skipping it.",
+                    print_formatted=False)
+                continue
+
+            if checkpoint is not None and checkpoint.result is None:
+                computer.checkpoint = checkpoint
+            computers.append(computer)
+        return computers
 
-            log("Computer " + computer.get_hostname() + " updated successfully!")
-        except ConnectionSSHException:
-            log_error("SSH connection error on :" + computer.get_hostname())
-            log_error("Skipping this computer...")
+    @staticmethod
+    def update_one_computer(computer: ComputerUpdateManager, retry_scheduler: RetryScheduler) -> float | None:
+        """
+        Updates a computer, and asks the retry scheduler what to do if it failed.
+        :return: The delay before the computer is tried again, in seconds, or None if it is done.
+        """
+        log(message="Updating computer " + computer.get_hostname() + "...")
+        return retry_scheduler.finish_attempt(computer, computer.update())
 
     def get_successfully_number_of_updated_computers(self) -> int:
         res = 0
@@ -0,0 +1,145 @@
+import ipaddress
+import itertools
+from threading import Lock
+
+from src.server.logs_management.server_logger import log_error
+from src.server.ssh.commands import encode_powershell_command
+
+
+class PeerDistributor:
+    """
+    Fan-out distribution of the client files: the first computers of a subnet that have the current client files
+    become seeds, and serve them over http (update.exe --serve-artifacts) to the other computers of their subnet,
+    instead of the server sending them to every computer.
+
+    The subnet of a computer is the configured subnet containing its address in computers_database.json, or its
+    /prefix_length network. The files a computer downloads from a seed are always checked against the client
+    manifest by the server, and a seed that served wrong or no files is not used anymore. A seed is also withdrawn
+    once it reboots or shuts down, and its --serve-artifacts process is stopped before its own client files change.
+    """
+
+    def __init__(self, enabled: bool = False, seeds_per_subnet: int = 2, prefix_length: int = 24,
+                 subnets: list[str] | None = None, port: int = 8765, idle_timeout: int = 600):
+        self.enabled: bool = enabled
+        self.seeds_per_subnet: int = seeds_per_subnet
+        self.prefix_length: int = prefix_length
+        self.networks: list[ipaddress.IPv4Network] = []
+        self.set_subnets(subnets or [])
+        self.port: int = port
+        self.idle_timeout: int = idle_timeout
+        self.lock = Lock()
+        self.members: dict[ipaddress.IPv4Network, set[str]] = {}
+        self.seeds: dict[ipaddress.IPv4Network, list[str]] = {}
+        self.rotation = itertools.count()
+
+    def configure(self, enabled: bool, seeds_per_subnet: int, prefix_length: int, subnets: list[str], port: int,
+                  idle_timeout: int) -> None:
+        self.enabled = enabled
+        self.seeds_per_subnet = seeds_per_subnet
+        self.prefix_length = prefix_length
+        self.set_subnets(subnets)
+        self.port = port
+        self.idle_timeout = idle_timeout
+
+    def set_subnets(self, subnets: list[str]) -> None:
+        self.networks = []
+        for subnet in subnets:
+            try:
+                self.networks.append(ipaddress.IPv4Network(subnet, strict=False))
+            except ValueError:
+                log_error(f"Invalid subnet '{subnet}' in the peer distribution config, ignoring it.")
+
+    def get_subnet(self, ipv4: str) -> ipaddress.IPv4Network:
+        address = ipaddress.IPv4Address(ipv4)
+        for network in self.networks:
+            if address in network:
+                return network
+        return ipaddress.IPv4Network(f"{ipv4}/{self.prefix_length}", strict=False)
+
+    def build(self, addresses: list[str]) -> dict[ipaddress.IPv4Network, set[str]]:
+        """
+        Groups the computers of the rollout by subnet, and forgets the seeds of the previous rollout.
+        :param addresses: The ipv4 addresses of the computers.
+        :return: The computers of every subnet.
+        """
+        with self.lock:
+            self.members, self.seeds = {}, {}
+            for ipv4 in addresses:
+                try:
+                    self.members.setdefault(self.get_subnet(ipv4), set()).add(ipv4)
+                except ValueError:
+                    log_error(f"Invalid ipv4 address '{ipv4}', the computer is left out of the peer distribution.")
+            return self.members
+
+    def get_seed(self, ipv4: str) -> str | None:
+        """
+        :return: A seed of the subnet of the computer, or None if it has none yet.
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            seeds: list[str] = [seed for seed in self.seeds.get(self.get_subnet(ipv4), []) if seed != ipv4]
+            if not seeds:
+                return None
+            return seeds[next(self.rotation) % len(seeds)]
+
+    def needs_seed(self, ipv4: str) -> bool:
+        """
+        :return: True if the subnet of the computer has other computers, and not enough seeds yet.
+        """
+        if not self.enabled:
+            return False
+        with self.lock:
+            subnet: ipaddress.IPv4Network = self.get_subnet(ipv4)
+            seeds: list[str] = self.seeds.get(subnet, [])
+            return len(self.members.get(subnet, set())) > 1 and len(seeds) < self.seeds_per_subnet \
+                and ipv4 not in seeds
+
+    def add_seed(self, ipv4: str) -> None:
+        with self.lock:
+            seeds: list[str] = self.seeds.setdefault(self.get_subnet(ipv4), [])
+            if ipv4 not in seeds:
+                seeds.append(ipv4)
+
+    def remove_seed(self, ipv4: str) -> None:
+        with self.lock:
+            seeds: list[str] = self.seeds.get(self.get_subnet(ipv4), [])
+            if ipv4 in seeds:
+                seeds.remove(ipv4)
+
+    def get_serve_command(self, update_exe: str, folder: str, file_names: list[str]) -> str:
+        """
+        :return: The command starting update.exe --serve-artifacts on a seed. It is started with WMI, so that it is
+        not killed when the SSH session closes, and prints SEED_STARTED if it started.
+        """
+        script: str = (f"$r = Invoke-CimMethod -ClassName Win32_Process -MethodName Create -Arguments "
+                       f"@{{CommandLine='\"{update_exe}\" --serve-artifacts \"{folder}\" {self.port} "
+                       f"{self.idle_timeout} {' '.join(file_names)}'; CurrentDirectory='{folder}'}}; "
+                       f"if ($r.ReturnValue -eq 0) {{ 'SEED_STARTED' }}")
+        return encode_powershell_command(script)
+
+    @staticmethod
+    def get_stop_command(folder: str) -> str:
+        """
+        :return: The command stopping the update.exe --serve-artifacts processes serving the folder, which hold its
+        files open. It prints SEED_STOPPED.
+        """
+        script: str = (f"Get-CimInstance Win32_Process -Filter \"CommandLine LIKE '%--serve-artifacts%'\" | "
+                       f"Where-Object {{ $_.CommandLine.Contains('--serve-artifacts \"{folder}\"') }} | "
+                       f"Invoke-CimMethod -MethodName Terminate | Out-Null; 'SEED_STOPPED'")
+        return encode_powershell_command(script)
+
+    def get_download_command(self, seed: str, file_names: list[str], folder: str) -> str:
+        """
+        :return: The command downloading the files from the seed with the curl.exe of Windows, to .part files moved
+        in place only once they are complete. It prints PEER_DOWNLOADED if all the files were downloaded, and deletes
+        the .part files otherwise.
+        """
+        downloads: list[str] = [f"curl.exe -fsS --connect-timeout 10 -o \"{folder}\\{name}.part\" "
+                                f"http://{seed}:{self.port}/{name}" for name in file_names]
+        moves: list[str] = [f"move /Y \"{folder}\\{name}.part\" \"{folder}\\{name}\" >nul" for name in file_names]
+        parts: str = " ".join(f"\"{folder}\\{name}.part\"" for name in file_names)
+        return f"({' && '.join(downloads + moves + ['echo PEER_DOWNLOADED'])}) || (del /F /Q {parts} 2>nul & exit /b 1)"
+
+
+peer_distributor = PeerDistributor()
@@ -0,0 +1,133 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from src.server.core.reachability import scan_reachability_blocking
+from src.server.infrastructure.rollout_config import PendingScanConfig, ReachabilityConfig
+from src.server.logs_management.server_logger import log
+from src.server.ssh.commands import SSHCommandResult
+
+if TYPE_CHECKING:
+    from src.server.update_management.computer_update_manager import ComputerUpdateManager
+
+
+@dataclass
+class RolloutPlan:
+    """
+    The computers of the rollout, split by the pending update scan: the ones with updates to install, the ones with
+    none, and the ones that could not be scanned (off, unreachable, or the scan failed), which go through the whole
+    update as before.
+    """
+    to_install: list = field(default_factory=list)
+    nothing_to_install: list = field(default_factory=list)
+    unknown: list = field(default_factory=list)
+
+    def get_pipeline_computers(self) -> list:
+        """
+        :return: The computers that still go through the update: the ones with updates, and the ones not scanned.
+        """
+        return self.to_install + self.unknown
+
+    def describe(self) -> str:
+        return (f"{len(self.to_install)} computers with updates to install, {len(self.nothing_to_install)} with none, "
+                f"{len(self.unknown)} not scanned")
+
+
+class PendingUpdateScanner:
+    """
+    Asks every computer that is on for the updates Windows Update would install, all at once, before the update
+    starts. The computers without any are not sent the client nor run it, only the other ones go through the upload
+    and install phases.
+
+    The scan runs the query of Update.ps1, Get-WindowsUpdate of the PSWindowsUpdate module keeping the updates that
+    are not installed, and prints their titles as json on a line starting with MARKER. Any error of the query stops
+    the script before the line is printed, so a computer without the module, or whose search failed, is not scanned
+    and goes through the whole update, where Update.ps1 decides.
+    """
+    MARKER: str = "UG_PENDING"
+
+    def __init__(self, max_concurrent_scans: int = 32, scan_timeout: float = 600, probe_timeout: float = 5.0,
+                 max_probes_in_flight: int = 256):
+        self.max_concurrent_scans: int = max(1, max_concurrent_scans)
+        self.scan_timeout: float = scan_timeout
+        self.probe_timeout: float = probe_timeout
+        self.max_probes_in_flight: int = max_probes_in_flight
+
+    @classmethod
+    def from_config(cls, config: PendingScanConfig, reachability_config: ReachabilityConfig) -> 'PendingUpdateScanner':
+        return cls(config.max_concurrent_scans, config.scan_timeout, reachability_config.probe_timeout,
+                   reachability_config.max_probes_in_flight)
+
+    def get_script(self) -> str:
+        return (
+            "$ErrorActionPreference = 'Stop'\n"
+            "Import-Module PSWindowsUpdate\n"
+            "$titles = @(Get-WindowsUpdate -IgnoreReboot | Where-Object { $_.IsInstalled -eq $false } | "
+            "ForEach-Object { $_.Title })\n"
+            f"'{self.MARKER} ' + (ConvertTo-Json -Compress -InputObject $titles)\n"
+        )
+
+    @classmethod
+    def parse(cls, stdout: str | None) -> list[str] | None:
+        """
+        :return: The titles of the pending updates, or None if the output has no scan result.
+        """
+        for line in (stdout or "").splitlines():
+            if not line.startswith(cls.MARKER + " "):
+                continue
+            try:
+                titles = json.loads(line[len(cls.MARKER) + 1:])
+            except json.JSONDecodeError:
+                return None
+            if isinstance(titles, str):
+                return [titles]
+            return [str(title) for title in titles] if isinstance(titles, list) else None
+        return None
+
+    def scan_one(self, computer: 'ComputerUpdateManager') -> list[str] | None:
+        """
+        :return: The titles of the updates pending on the computer, or None if it could not be scanned.
+        """
+        # noinspection PyBroadException
+        try:
+            if not computer.computer.connect():
+                return None
+            result: SSHCommandResult = computer.computer.execute_powershell(self.get_script(), self.scan_timeout)
+        except Exception as e:
+            computer.log(f"Could not scan the pending updates: {e}", level="warning")
+            return None
+
+        titles: list[str] | None = self.parse(result.stdout)
+        if titles is None:
+            computer.log(f"Could not scan the pending updates: {result.stderr or result.stdout}", level="warning")
+            return None
+        computer.log(f"Pending update scan: {len(titles)} update(s) to install.")
+        for title in titles:
+            computer.log(f"Pending update: {title}")
+        return titles
+
+    def plan(self, computers: list['ComputerUpdateManager']) -> RolloutPlan:
+        """
+        Scans the computers that are on, at most max_concurrent_scans at the same time.
+        :return: The plan of the rollout.
+        """
+        plan = RolloutPlan()
+        states: dict[str, bool] = scan_reachability_blocking(
+            [computer.ipv4 for computer in computers], timeout=self.probe_timeout,
+            max_probes_in_flight=self.max_probes_in_flight
+        )
+        awake: list['ComputerUpdateManager'] = [computer for computer in computers if states[computer.ipv4]]
+        plan.unknown.extend(computer for computer in computers if not states[computer.ipv4])
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_scans) as executor:
+            for computer, titles in zip(awake, executor.map(self.scan_one, awake)):
+                if titles is None:
+                    plan.unknown.append(computer)
+                elif titles:
+                    plan.to_install.append(computer)
+                else:
+                    plan.nothing_to_install.append(computer)
+
+        log(f"Pending update scan: {plan.describe()}.", print_formatted=False)
+        return plan
@@ -0,0 +1,101 @@
+import asyncio
+from dataclasses import dataclass
+
+from src.server.core.reachability import is_port_open
+from src.server.logs_management.server_logger import log
+
+
+@dataclass
+class ParkedComputer:
+    """
+    A computer waiting for its reboot in the RebootWatcher.
+    """
+    hostname: str
+    ipv4: str
+    deadline: float
+    future: asyncio.Future
+    went_down: bool = False
+
+
+class RebootWatcher:
+    """
+    Single component tracking every rebooting computer of the rollout.
+
+    Rebooting computers are parked here instead of each one polling its own socket. One task probes all of them
+    concurrently every probe_interval seconds, first waiting for the SSH port to go down, then for it to come back.
+    The coroutine of the computer is resumed as soon as SSH is back, or when its deadline is reached.
+    """
+
+    def __init__(self, probe_interval: float = 10.0, probe_timeout: float = 5.0, max_probes_in_flight: int = 256,
+                 port: int = 22):
+        self.probe_interval: float = probe_interval
+        self.probe_timeout: float = probe_timeout
+        self.port: int = port
+        self.parked: dict[str, ParkedComputer] = {}
+        self.probes_semaphore = asyncio.Semaphore(max_probes_in_flight)
+        self.new_computer_parked = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.watch())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        for parked_computer in self.parked.values():
+            if not parked_computer.future.done():
+                parked_computer.future.set_result(False)
+        self.parked.clear()
+
+    async def wait_for_reboot(self, hostname: str, ipv4: str, timeout: float) -> bool:
+        """
+        Parks a computer until it went down and its SSH server is reachable again.
+        :param hostname: The hostname of the computer.
+        :param ipv4: The ip address of the computer.
+        :param timeout: How long to wait for the computer, in seconds.
+        :return: True if the computer is back online, False if the timeout was reached.
+        """
+        loop = asyncio.get_running_loop()
+        parked_computer = ParkedComputer(hostname, ipv4, loop.time() + timeout, loop.create_future())
+        self.parked[hostname] = parked_computer
+        self.new_computer_parked.set()
+        log(f"{hostname} parked in the reboot watcher ({len(self.parked)} computers rebooting).",
+            print_formatted=False)
+        return await parked_computer.future
+
+    async def watch(self) -> None:
+        while True:
+            if not self.parked:
+                self.new_computer_parked.clear()
+                await self.new_computer_parked.wait()
+
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+
+    async def probe_all(self) -> None:
+        parked_computers: list[ParkedComputer] = list(self.parked.values())
+        states: list[bool] = await asyncio.gather(*(self.probe(parked) for parked in parked_computers))
+        now: float = asyncio.get_running_loop().time()
+
+        for parked_computer, is_open in zip(parked_computers, states):
+            if not parked_computer.went_down and not is_open:
+                parked_computer.went_down = True
+                log(f"{parked_computer.hostname} is down, waiting for it to be up again...", print_formatted=False)
+            elif parked_computer.went_down and is_open:
+                self.release(parked_computer, True)
+            elif now >= parked_computer.deadline:
+                self.release(parked_computer, False)
+
+    async def probe(self, parked_computer: ParkedComputer) -> bool:
+        async with self.probes_semaphore:
+            return await is_port_open(parked_computer.ipv4, self.port, self.probe_timeout)
+
+    def release(self, parked_computer: ParkedComputer, is_back_online: bool) -> None:
+        self.parked.pop(parked_computer.hostname, None)
+        if not parked_computer.future.done():
+            parked_computer.future.set_result(is_back_online)
@@ -0,0 +1,118 @@
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from src.server.infrastructure.rollout_config import RetryConfig
+from src.server.logs_management.server_logger import log, log_error
+
+if TYPE_CHECKING:
+    from src.server.update_management.computer_update_manager import ComputerUpdateManager
+
+
+class FailureKind(Enum):
+    """
+    Why the update of a computer failed. Each kind has its own retry policy.
+    """
+    WAKE = "wake"
+    AUTH = "auth"
+    TRANSIENT_SSH = "transient_ssh"
+    OTHER = "other"
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 0
+    base_delay: float = 60.0
+    max_delay: float = 600.0
+
+
+class RetryScheduler:
+    """
+    Decides if and when a failed computer is tried again during the rollout.
+
+    The delay grows exponentially with the number of attempts of the computer (base_delay * 2^n, capped at max_delay),
+    with a random jitter so that computers failing together are not all retried at the same time. No retry is
+    scheduled after the time budget of the rollout.
+    """
+
+    def __init__(self, policies: dict[FailureKind, RetryPolicy], time_budget: float, jitter: float = 0.5):
+        self.policies: dict[FailureKind, RetryPolicy] = policies
+        self.time_budget: float = time_budget
+        self.jitter: float = min(1.0, max(0.0, jitter))
+        self.start_time: float = time.monotonic()
+        self.retries: dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: 'RetryConfig') -> 'RetryScheduler':
+        """
+        Builds the scheduler from the retry section of the config. Kinds of failure without a policy are not retried.
+        """
+        policies: dict[FailureKind, RetryPolicy] = {kind: RetryPolicy() for kind in FailureKind}
+        if config.enabled:
+            known_kinds = {kind.value for kind in FailureKind}
+            for kind_name, policy in config.policies.items():
+                if kind_name not in known_kinds:
+                    log_error(f"Unknown kind of failure '{kind_name}' in the retry config, ignoring it.")
+                    continue
+                policies[FailureKind(kind_name)] = RetryPolicy(**{key: value for key, value in policy.items()
+                                                                  if key in RetryPolicy.__dataclass_fields__})
+        return cls(policies, config.time_budget, config.jitter)
+
+    def get_retry_delay(self, hostname: str, failure_kind: FailureKind) -> float | None:
+        """
+        Registers a failure of a computer, and computes when it should be tried again.
+        :param hostname: The hostname of the computer.
+        :param failure_kind: Why the update failed.
+        :return: The delay before the next attempt, in seconds, or None if the computer should not be tried again.
+        """
+        policy: RetryPolicy = self.policies[failure_kind]
+        retries: int = self.retries.get(hostname, 0)
+        if retries >= policy.max_retries:
+            return None
+
+        delay: float = min(policy.max_delay, policy.base_delay * 2 ** retries)
+        delay *= random.uniform(1 - self.jitter, 1)
+        if time.monotonic() + delay - self.start_time > self.time_budget:
+            return None
+
+        self.retries[hostname] = retries + 1
+        return delay
+
+    def schedule_retry(self, hostname: str, failure_kind: FailureKind) -> float | None:
+        """
+        Same as get_retry_delay, and logs what will happen to the computer.
+        """
+        delay: float | None = self.get_retry_delay(hostname, failure_kind)
+        if delay is None:
+            log_error("Skipping this computer...")
+        else:
+            log(f"Retrying {hostname} in {delay:.0f} seconds ({failure_kind.value} failure, retry "
+                f"{self.retries[hostname]}/{self.policies[failure_kind].max_retries}).")
+        return delay
+
+    def finish_attempt(self, computer: 'ComputerUpdateManager', updated: bool) -> float | None:
+        """
+        Handles the end of an update attempt, the same way for both orchestrators. A failed computer is tried again
+        after the returned delay. Once it is done, its result is written in the journal, and the error of a computer
+        that failed for good is reported, only once whatever its number of attempts.
+        :param updated: What ComputerUpdateManager.update returned.
+        :return: The delay before the computer is tried again, in seconds, or None if it is done.
+        """
+        hostname: str = computer.get_hostname()
+        if not updated:
+            computer.updated_successfully = False
+            computer.no_updates = False
+            log_error("Error while updating computer " + hostname)
+            retry_delay: float | None = self.schedule_retry(hostname, computer.get_failure_kind())
+            if retry_delay is not None:
+                return retry_delay
+            computer.report_final_failure()
+        elif computer.no_updates:
+            log("Computer " + hostname + " has no updates.")
+        else:
+            log("Computer " + hostname + " updated successfully!")
+
+        computer.record_result()
+        return None
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from src.server.infrastructure.paths import ServerPath
+from src.server.update_management.rollout_phases import RolloutPhase
+
+
+@dataclass
+class HostCheckpoint:
+    """
+    What the journal knows about a computer of an interrupted rollout.
+    """
+    completed_phases: list[RolloutPhase] = field(default_factory=list)
+    phase_details: dict[RolloutPhase, dict] = field(default_factory=dict)
+    result: str | None = None
+
+    def is_phase_completed(self, phase: RolloutPhase) -> bool:
+        return phase in self.completed_phases
+
+
+class RolloutJournal:
+    """
+    Append-only, crash-safe journal of a rollout.
+
+    Every completed phase and every final result of a computer is appended as a JSON line, and flushed to the disk
+    before the rollout goes on. If the server dies in the middle of a rollout, the journal has no "run_finished" line,
+    and the rollout can be resumed with the --resume option: finished computers are skipped, and the other ones
+    restart after their last completed phase.
+    """
+    JOURNALS_TO_KEEP: int = 10
+
+    RESULT_UPDATED: str = "updated"
+    RESULT_NO_UPDATES: str = "no_updates"
+    RESULT_FAILED: str = "failed"
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self.lock = Lock()
+
+    @classmethod
+    def create(cls) -> 'RolloutJournal':
+        """
+        Creates the journal of a new rollout, and removes the oldest journals.
+        """
+        folder: str = ServerPath.get_rollout_journals_folder()
+        os.makedirs(folder, exist_ok=True)
+        cls.remove_old_journals(folder)
+
+        journal = cls(ServerPath.join(folder, f"rollout-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"))
+        journal.append({"event": "run_started"})
+        return journal
+
+    @classmethod
+    def find_unfinished(cls) -> 'RolloutJournal | None':
+        """
+        :return: The journal of the last rollout if it was interrupted, None otherwise.
+        """
+        journals: list[str] = cls.list_journals(ServerPath.get_rollout_journals_folder())
+        if not journals:
+            return None
+
+        journal = cls(journals[-1])
+        if any(entry["event"] == "run_finished" for entry in journal.read_entries()):
+            return None
+
+        # Terminate a line truncated by the crash, so that the next entries stay readable.
+        with open(journal.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        journal.append({"event": "run_resumed"})
+        return journal
+
+    @staticmethod
+    def list_journals(folder: str) -> list[str]:
+        if not ServerPath.exists(folder):
+            return []
+        return sorted(ServerPath.join(folder, filename) for filename in os.listdir(folder)
+                      if filename.startswith("rollout-") and filename.endswith(".jsonl"))
+
+    @classmethod
+    def remove_old_journals(cls, folder: str) -> None:
+        journals: list[str] = cls.list_journals(folder)
+        for journal_path in journals[:max(0, len(journals) - cls.JOURNALS_TO_KEEP + 1)]:
+            os.remove(journal_path)
+
+    def append(self, entry: dict) -> None:
+        entry = {"time": time.time(), **entry}
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record_phase(self, hostname: str, phase: RolloutPhase, **details) -> None:
+        self.append({"event": "phase_completed", "hostname": hostname, "phase": phase.value, "details": details})
+
+    def record_result(self, hostname: str, result: str) -> None:
+        self.append({"event": "host_finished", "hostname": hostname, "result": result})
+
+    def finish(self) -> None:
+        self.append({"event": "run_finished"})
+
+    def read_entries(self) -> list[dict]:
+        entries: list[dict] = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line may be truncated if the server died while writing it.
+                    continue
+        return entries
+
+    def load_checkpoints(self) -> dict[str, HostCheckpoint]:
+        """
+        :return: The checkpoint of every computer found in the journal, by hostname.
+        """
+        checkpoints: dict[str, HostCheckpoint] = {}
+        for entry in self.read_entries():
+            if "hostname" not in entry:
+                continue
+            checkpoint = checkpoints.setdefault(entry["hostname"], HostCheckpoint())
+            if entry["event"] == "phase_completed":
+                if checkpoint.result is not None:
+                    # The computer is tried again after a failure, forget the phases of the failed attempt.
+                    checkpoint = checkpoints[entry["hostname"]] = HostCheckpoint()
+                phase = RolloutPhase(entry["phase"])
+                checkpoint.completed_phases.append(phase)
+                checkpoint.phase_details[phase] = entry.get("details", {})
+            elif entry["event"] == "host_finished":
+                checkpoint.result = entry["result"]
+        return checkpoints
@@ -0,0 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+from enum import Enum
+
+
+class RolloutPhase(Enum):
+    """
+    The stages a computer goes through during a rollout. Each one has its own queue and concurrency limit, except
+    REBOOT_WAIT, handled by the RebootWatcher.
+    """
+    WAKE = "wake"
+    CONNECT = "connect"
+    UPLOAD = "upload"
+    INSTALL = "install"
+    REBOOT_WAIT = "reboot_wait"
+    SHUTDOWN = "shutdown"
+
+
+class PhaseSlot:
+    """
+    The slot held by a computer in a phase. It can be given back before the end of the phase, for instance once the
+    updates of the computer are downloaded, so that the next computer starts without waiting for the installation.
+    """
+
+    def __init__(self, limiter: 'PhaseLimiter', phase: RolloutPhase):
+        self.limiter: 'PhaseLimiter' = limiter
+        self.phase: RolloutPhase = phase
+        self.released: bool = False
+
+    def release(self) -> None:
+        """
+        Gives the slot back, once. It must be called from the event loop thread.
+        """
+        if self.released:
+            return
+        self.released = True
+        self.limiter.active[self.phase] -= 1
+        self.limiter.semaphores[self.phase].release()
+
+
+class PhaseLimiter:
+    """
+    Limits how many computers can be in each phase at the same time.
+    Computers waiting for a phase are queued in arrival order (asyncio.Semaphore wakes its waiters in FIFO order).
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.semaphores: dict[RolloutPhase, asyncio.Semaphore] = {}
+        self.queued: dict[RolloutPhase, int] = {}
+        self.active: dict[RolloutPhase, int] = {}
+        for phase_name, limit in limits.items():
+            phase = RolloutPhase(phase_name)
+            self.semaphores[phase] = asyncio.Semaphore(max(1, int(limit)))
+            self.queued[phase] = 0
+            self.active[phase] = 0
+
+    @asynccontextmanager
+    async def phase(self, phase: RolloutPhase):
+        """
+        Waits for a free slot in the phase, and holds it for the duration of the context, unless it is released
+        earlier.
+        :return: The PhaseSlot of the computer.
+        """
+        self.queued[phase] += 1
+        try:
+            await self.semaphores[phase].acquire()
+        finally:
+            self.queued[phase] -= 1
+
+        self.active[phase] += 1
+        slot = PhaseSlot(self, phase)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def get_status(self) -> str:
+        """
+        :return: A one line summary of the active and queued computers of every phase.
+        """
+        return ", ".join(f"{phase.value}: {self.active[phase]} active / {self.queued[phase]} queued"
+                         for phase in self.semaphores)
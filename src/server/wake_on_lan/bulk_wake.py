@@ -0,0 +1,166 @@
+import asyncio
+import ipaddress
+import socket
+import threading
+from dataclasses import dataclass, field
+
+from wakeonlan import create_magic_packet
+
+from src.server.core.reachability import scan_reachability
+from src.server.infrastructure.rollout_config import BulkWakeConfig, ReachabilityConfig
+from src.server.logs_management.server_logger import log, log_error
+
+
+@dataclass
+class WakeTarget:
+    """
+    A computer woken up by the BulkWaker.
+    """
+    mac_address: str
+    ipv4: str
+    awake: asyncio.Event = field(default_factory=asyncio.Event)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    # Set with done, for the threads waiting outside the event loop of the waker.
+    finished: threading.Event = field(default_factory=threading.Event)
+
+    def finish(self, awake: bool = False) -> None:
+        if awake:
+            self.awake.set()
+        self.done.set()
+        self.finished.set()
+
+
+class BulkWaker:
+    """
+    Wakes a whole batch of computers at once, so that their boot times overlap.
+
+    The magic packets of every computer are sent in one burst, limited to packets_per_second. A computer in one of the
+    configured subnets gets its packet on the directed broadcast address of the subnet, the other ones get it on their
+    own address, like send_wol. The computers are then scanned every check_interval seconds, and the ones still off
+    after resend_interval seconds get their packet again, up to max_resends times.
+    """
+
+    def __init__(self, packets_per_second: float = 100.0, subnets: list[str] | None = None, port: int = 9,
+                 resend_interval: float = 30.0, max_resends: int = 3, check_interval: float = 5.0,
+                 probe_timeout: float = 5.0, max_probes_in_flight: int = 256):
+        self.packet_interval: float = 1 / max(1.0, packets_per_second)
+        self.networks: list[ipaddress.IPv4Network] = []
+        for subnet in subnets or []:
+            try:
+                self.networks.append(ipaddress.IPv4Network(subnet, strict=False))
+            except ValueError:
+                log_error(f"Invalid subnet '{subnet}' in the bulk wake config, ignoring it.")
+        self.port: int = port
+        self.resend_interval: float = resend_interval
+        self.max_resends: int = max_resends
+        self.check_interval: float = check_interval
+        self.probe_timeout: float = probe_timeout
+        self.max_probes_in_flight: int = max_probes_in_flight
+        self.targets: dict[str, WakeTarget] = {}
+
+    @classmethod
+    def from_config(cls, config: 'BulkWakeConfig', reachability_config: 'ReachabilityConfig') -> 'BulkWaker':
+        return cls(config.packets_per_second, config.subnets, config.port, config.resend_interval, config.max_resends,
+                   config.check_interval, reachability_config.probe_timeout, reachability_config.max_probes_in_flight)
+
+    def get_destination(self, ipv4: str) -> str:
+        """
+        :return: The directed broadcast address of the subnet of the computer, or its own address if it is in none of
+        the configured subnets.
+        """
+        address = ipaddress.IPv4Address(ipv4)
+        for network in self.networks:
+            if address in network:
+                return str(network.broadcast_address)
+        return ipv4
+
+    async def send_packets(self, targets: list[WakeTarget]) -> None:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            for target in targets:
+                try:
+                    destination: tuple[str, int] = (self.get_destination(target.ipv4), self.port)
+                    sock.sendto(create_magic_packet(target.mac_address), destination)
+                except (OSError, ValueError) as e:
+                    log_error(f"Could not send the wake on lan packet to {target.ipv4}: {e}")
+                await asyncio.sleep(self.packet_interval)
+
+    def add_targets(self, computers: list[tuple[str, str]]) -> list[WakeTarget]:
+        targets: list[WakeTarget] = []
+        for mac_address, ipv4 in computers:
+            target = self.targets[ipv4] = WakeTarget(mac_address, ipv4)
+            targets.append(target)
+        return targets
+
+    def start(self, computers: list[tuple[str, str]]) -> asyncio.Task:
+        """
+        Starts waking the computers up in a task of the running event loop.
+        :param computers: The (mac address, ipv4) of the computers to wake up.
+        """
+        return asyncio.create_task(self.wake(self.add_targets(computers)))
+
+    def start_in_background(self, computers: list[tuple[str, str]]) -> threading.Thread:
+        """
+        Starts waking the computers up in a daemon thread, for the code not running in an event loop.
+        :param computers: The (mac address, ipv4) of the computers to wake up.
+        """
+        thread = threading.Thread(target=asyncio.run, args=(self.wake(self.add_targets(computers)),),
+                                  name="bulk-wake", daemon=True)
+        thread.start()
+        return thread
+
+    async def wake(self, targets: list[WakeTarget]) -> None:
+        """
+        Wakes the computers up, and re-sends the packets to the ones still off until they are all awake, or
+        max_resends is reached.
+        """
+        loop = asyncio.get_running_loop()
+        log(f"Bulk wake: sending wake on lan packets to {len(targets)} computers.", print_formatted=False)
+        try:
+            await self.send_packets(targets)
+            last_send: float = loop.time()
+            resends: int = 0
+            while targets:
+                await asyncio.sleep(self.check_interval)
+                states: dict[str, bool] = await scan_reachability([target.ipv4 for target in targets],
+                                                                  timeout=self.probe_timeout,
+                                                                  max_probes_in_flight=self.max_probes_in_flight)
+                for target in targets:
+                    if states[target.ipv4]:
+                        target.finish(awake=True)
+                targets = [target for target in targets if not target.awake.is_set()]
+
+                if targets and loop.time() - last_send >= self.resend_interval:
+                    if resends >= self.max_resends:
+                        log(f"Bulk wake: {len(targets)} computers did not wake up.", print_formatted=False)
+                        break
+                    resends += 1
+                    log(f"Bulk wake: {len(targets)} computers are still off, sending the packets again "
+                        f"({resends}/{self.max_resends}).", print_formatted=False)
+                    await self.send_packets(targets)
+                    last_send = loop.time()
+        finally:
+            for target in self.targets.values():
+                target.finish()
+
+    def is_waking(self, ipv4: str) -> bool:
+        return ipv4 in self.targets
+
+    async def wait_until_awake(self, ipv4: str) -> bool:
+        """
+        Waits until the computer answered, or the bulk waker gave up on it.
+        :return: True if the computer is awake, False otherwise.
+        """
+        target: WakeTarget = self.targets[ipv4]
+        await target.done.wait()
+        return target.awake.is_set()
+
+    def wait_until_awake_blocking(self, ipv4: str) -> bool:
+        """
+        Blocking counterpart of wait_until_awake, for the threads waiting for a computer woken up by
+        start_in_background.
+        :return: True if the computer is awake, False otherwise.
+        """
+        target: WakeTarget = self.targets[ipv4]
+        target.finished.wait()
+        return target.awake.is_set()
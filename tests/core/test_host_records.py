@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.server.core.host_records import HostRecordStore
+
+
+class TestHostRecordStore(unittest.TestCase):
+    def setUp(self) -> None:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path: str = os.path.join(folder.name, "computers_database.json")
+        with open(self.path, "w") as file:
+            json.dump({"pc-1": {"ip": "10.0.0.1"}, "pc-2": {"ip": "10.0.0.2"}}, file)
+        self.store = HostRecordStore(self.path)
+
+    def test_records_are_written_once_per_flush(self):
+        self.store.update("pc-1", {"encoding": "cp850"})
+        self.store.update("pc-2", {"encoding": "cp1252"})
+        self.store.update("unknown", {"encoding": "cp850"})
+
+        with patch("src.server.core.host_records.os.replace", wraps=os.replace) as replace:
+            self.assertEqual(self.store.flush(), 2)
+            self.assertEqual(self.store.flush(), 0)
+        replace.assert_called_once()
+
+        with open(self.path) as file:
+            hosts: dict = json.load(file)
+        self.assertEqual(hosts["pc-1"], {"ip": "10.0.0.1", "encoding": "cp850"})
+        self.assertEqual(hosts["pc-2"]["encoding"], "cp1252")
+
+
+if __name__ == '__main__':
+    unittest.main()
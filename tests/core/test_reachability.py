@@ -0,0 +1,30 @@
+import socket
+import time
+import unittest
+
+from src.server.core.reachability import scan_reachability_blocking
+
+
+class TestReachabilityScanner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.open_port: int = self.server.getsockname()[1]
+        self.addCleanup(self.server.close)
+
+    def test_scan_open_port(self):
+        states = scan_reachability_blocking(["127.0.0.1", "127.0.0.1"], port=self.open_port, timeout=1)
+        self.assertEqual(states, {"127.0.0.1": True})
+
+    def test_scan_is_concurrent(self):
+        # 192.0.2.0/24 is reserved for documentation, the probes time out.
+        ips = [f"192.0.2.{i}" for i in range(1, 21)]
+        start = time.monotonic()
+        states = scan_reachability_blocking(ips, timeout=0.5)
+        self.assertFalse(any(states.values()))
+        self.assertLess(time.monotonic() - start, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import socket
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from src.server.infrastructure.artifact_server import ArtifactServer
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestArtifactServer(unittest.TestCase):
+    def setUp(self) -> None:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path: str = os.path.join(folder.name, "client.tar.gz")
+        with open(path, "wb") as file:
+            file.write(bytes(range(256)) * 10)
+
+        self.server = ArtifactServer(enabled=True, host="127.0.0.1", port=get_free_port(), connections=4,
+                                     min_segment_size=1000)
+        self.assertTrue(self.server.start())
+        self.addCleanup(self.server.stop)
+        self.artifact = self.server.publish(path)
+        self.url: str = self.server.get_url(self.artifact, "127.0.0.1")
+
+    def request(self, headers: dict[str, str]):
+        return urllib.request.urlopen(urllib.request.Request(self.url, headers=headers), timeout=5)
+
+    def test_range_request(self):
+        with self.request({"Range": "bytes=256-511"}) as response:
+            self.assertEqual(response.status, 206)
+            self.assertEqual(response.headers["Content-Range"], "bytes 256-511/2560")
+            self.assertEqual(response.read(), bytes(range(256)))
+
+    def test_etag(self):
+        with self.request({}) as response:
+            self.assertEqual(len(response.read()), 2560)
+            etag: str = response.headers["ETag"]
+
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request({"If-None-Match": etag})
+        self.assertEqual(context.exception.code, 304)
+
+    def test_url_is_made_of_the_hash(self):
+        self.assertIn(self.artifact.sha256, self.url)
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(self.url.replace(self.artifact.sha256, "0" * 64), timeout=5)
+        self.assertEqual(context.exception.code, 404)
+
+    def test_changed_file_is_published_again(self):
+        self.assertIs(self.server.publish(self.artifact.path, self.artifact.sha256), self.artifact)
+
+        republished = self.server.publish(self.artifact.path, "0" * 64)
+        self.assertEqual(list(self.server.artifacts.values()), [republished])
+
+    def test_segments_cover_the_file(self):
+        self.assertEqual(self.server.get_segments(2560), [(0, 1279), (1280, 2559)])
+
+
+if __name__ == '__main__':
+    unittest.main()
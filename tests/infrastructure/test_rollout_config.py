@@ -0,0 +1,43 @@
+import unittest
+
+from src.server.infrastructure.artifact_server import artifact_server
+from src.server.infrastructure.rollout_config import RolloutConfig
+from src.server.ssh.commands import command_deadlines
+from src.server.ssh.connection_pool import ssh_connection_pool
+from src.server.ssh.persistent_shell import persistent_shell_settings
+from src.server.update_management.delta_sync import delta_sync_service
+from src.server.update_management.peer_distribution import peer_distributor
+
+
+class TestRolloutConfig(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(RolloutConfig().apply)
+
+    def test_apply_configures_the_services(self):
+        RolloutConfig.from_dict({
+            "ssh_pool": {"keepalive_interval": 5, "dead_peer_probes": 2},
+            "command_timeouts": {"default_timeout": 60},
+            "persistent_shell": {"enabled": True},
+            "delta_sync": {"enabled": True, "supported_client_hashes": ["ABC"]},
+            "peer_distribution": {"enabled": True, "port": 9000},
+            "artifact_server": {"enabled": True, "port": 9001},
+        }).apply()
+
+        self.assertEqual(ssh_connection_pool.get_dead_peer_timeout_ms(), 10_000)
+        self.assertEqual(command_deadlines.default_timeout, 60)
+        self.assertTrue(persistent_shell_settings.enabled)
+        self.assertTrue(delta_sync_service.is_supported_by("abc"))
+        self.assertEqual(peer_distributor.port, 9000)
+        self.assertTrue(artifact_server.enabled)
+
+    def test_defaults_disable_the_optional_services(self):
+        RolloutConfig().apply()
+
+        self.assertFalse(persistent_shell_settings.enabled)
+        self.assertFalse(delta_sync_service.enabled)
+        self.assertFalse(peer_distributor.enabled)
+        self.assertFalse(artifact_server.enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import re
+import unittest
+
+from src.server.ssh.commands import SSHCommandExecutor, SSHCommandResult, SSHCommands
+
+
+class FakeBatchExecutor(SSHCommandExecutor):
+    """
+    Answers a batch like cmd would: the first command prints "a" and fails, the second one prints "b" on stderr.
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.scripts: list[str] = []
+
+    def execute(self, command: str, delayed_expansion: bool = False) -> SSHCommandResult:
+        self.scripts.append(command)
+        token: str = re.match(r"echo (UG\w{8})B0", command).group(1)
+        count: int = command.count("(call )")
+        stdout, stderr = [], []
+        for index in range(count):
+            stdout.append(f"{token}B{index}")
+            stderr.append(f"{token}B{index}")
+            if index % 2 == 0:
+                stdout.append("a")
+            else:
+                stderr.append("b")
+            stdout.append(f"{token}E{index} {1 if index % 2 == 0 else 0}")
+            stderr.append(f"{token}E{index}")
+        return SSHCommandResult("\n".join(stdout), "\n".join(stderr), 0)
+
+
+class TestBatchCommands(unittest.TestCase):
+    def setUp(self) -> None:
+        self.executor = FakeBatchExecutor()
+        self.commands = SSHCommands(self.executor)
+
+    def test_results_are_split_by_command(self):
+        results = self.commands.batch(["first", "second"])
+
+        self.assertEqual(len(self.executor.scripts), 1)
+        self.assertEqual(results, [SSHCommandResult("a", None, 1), SSHCommandResult(None, "b", 0)])
+
+    def test_long_batches_are_split(self):
+        results = self.commands.batch(["x" * 3000 for _ in range(5)])
+
+        self.assertGreater(len(self.executor.scripts), 1)
+        self.assertTrue(all(len(script) < 8191 for script in self.executor.scripts))
+        self.assertEqual(len(results), 5)
+
+    def test_files_are_hashed_remotely(self):
+        digest: str = "ab" * 32
+        self.commands.batch = lambda commands: [
+            SSHCommandResult(f"SHA256 hash of C:\\a:\n{digest.upper()}\nCertUtil: -hashfile command completed "
+                             f"successfully.", None, 0),
+            SSHCommandResult("CertUtil: -hashfile command FAILED: 0x80070002 (WIN32: 2 ERROR_FILE_NOT_FOUND)", None,
+                             SSHCommands.FILE_NOT_FOUND_ERROR),
+            SSHCommandResult(None, "'certutil' is not recognized as an internal or external command", 9009),
+        ]
+
+        self.assertEqual(self.commands.get_files_sha256(["a", "b", "c"]), [digest, "", None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import base64
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.server.ssh.commands import SSHCommandExecutor, SSHCommandResult, SSHCommandTimeoutResult, command_deadlines
+from src.server.ssh.output_decoder import OutputDecoder
+
+
+class FakeChannel:
+    """
+    A channel whose command never ends by itself, like update.exe on a computer that hangs.
+    """
+
+    def __init__(self, hangs: bool):
+        self.status_event = threading.Event()
+        self.exit_status: int = -1 if hangs else 0
+        if not hangs:
+            self.status_event.set()
+
+    def close(self) -> None:
+        self.status_event.set()
+
+    def exit_status_ready(self) -> bool:
+        return self.exit_status != -1
+
+
+def create_ssh() -> MagicMock:
+    def exec_command(command: str, timeout: float | None = None):
+        channel = FakeChannel(hangs=not command.startswith("powershell"))
+        stdout, stderr = MagicMock(), MagicMock()
+        stdout.channel = channel
+        stdout.read.side_effect = lambda: channel.status_event.wait() and b"Checking for updates..."
+        stderr.read.return_value = b""
+        return None, stdout, stderr
+
+    ssh = MagicMock()
+    ssh.exec_command.side_effect = exec_command
+    ssh.get_transport.return_value.is_active.return_value = True
+    return ssh
+
+
+class TestCommandDeadlines(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ssh = create_ssh()
+        self.executor = SSHCommandExecutor(self.ssh, decoder=OutputDecoder("cp850"))
+
+    def test_command_past_its_deadline_is_killed(self):
+        result: SSHCommandResult = self.executor.execute("update.exe", timeout=0.05)
+
+        self.assertIsInstance(result, SSHCommandTimeoutResult)
+        self.assertEqual(result.reason, SSHCommandTimeoutResult.TIMEOUT)
+        self.assertEqual(result.stdout, "Checking for updates...")
+        self.assertIsNone(result.exit_code)
+        command: str = self.ssh.exec_command.call_args_list[0].args[0]
+        token: str = command.split("UGCMD=")[1].split("&&")[0]
+        kill_command: str = self.ssh.exec_command.call_args_list[1].args[0]
+        script: str = base64.b64decode(kill_command.split()[-1]).decode("utf-16-le")
+        self.assertIn(f"UGCMD={token}", script)
+        self.assertIn("taskkill.exe /PID $_.ProcessId /T /F", script)
+
+    def test_running_commands_can_be_cancelled(self):
+        results: list[SSHCommandResult] = []
+        thread = threading.Thread(target=lambda: results.append(self.executor.execute("update.exe", timeout=0)))
+        thread.start()
+        while not self.executor.running:
+            time.sleep(0.001)
+
+        self.executor.cancel_all()
+        thread.join(5)
+        self.assertEqual(results[0].reason, SSHCommandTimeoutResult.CANCELLED)
+        self.assertEqual(self.executor.running, [])
+
+    def test_missing_exit_status_is_not_waited_for_forever(self):
+        stdout, stderr = MagicMock(), MagicMock()
+        stdout.channel = FakeChannel(hangs=True)
+        stdout.read.return_value = b"Checking for updates..."
+        stderr.read.return_value = b""
+        self.ssh.exec_command.side_effect = None
+        self.ssh.exec_command.return_value = None, stdout, stderr
+
+        with patch.object(SSHCommandExecutor, "EXIT_STATUS_TIMEOUT", 0.05), \
+                patch.object(command_deadlines, "kill_on_timeout", False):
+            result: SSHCommandResult = self.executor.execute("update.exe", timeout=0)
+
+        self.assertIsInstance(result, SSHCommandTimeoutResult)
+        self.assertEqual(result.reason, SSHCommandTimeoutResult.CONNECTION_LOST)
+        self.assertEqual(self.executor.running, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
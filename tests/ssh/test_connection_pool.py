@@ -0,0 +1,80 @@
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from src.server.ssh.connection_pool import SSHConnectionPool
+
+
+def create_session(active: bool = True) -> MagicMock:
+    session = MagicMock()
+    session.get_transport.return_value.is_active.return_value = active
+    return session
+
+
+class TestSSHConnectionPool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = SSHConnectionPool(max_concurrent_handshakes=2, keepalive_interval=15)
+
+    def test_session_is_reused(self):
+        connect = MagicMock(side_effect=lambda: create_session())
+        first = self.pool.get_session("pc-1", connect)
+        second = self.pool.get_session("pc-1", connect)
+
+        self.assertIs(first, second)
+        connect.assert_called_once()
+        first.get_transport.return_value.set_keepalive.assert_called_once_with(15)
+
+    def test_dead_session_is_replaced(self):
+        dead = create_session()
+        connect = MagicMock(side_effect=[dead, create_session()])
+        self.pool.get_session("pc-1", connect)
+        dead.get_transport.return_value.is_active.return_value = False
+
+        session = self.pool.get_session("pc-1", connect)
+        self.assertIsNot(session, dead)
+        dead.close.assert_called_once()
+
+    def test_failed_connection_is_not_kept(self):
+        self.assertIsNone(self.pool.get_session("pc-1", lambda: None))
+        self.assertNotIn("pc-1", self.pool.sessions)
+
+    def test_concurrent_handshakes_are_capped(self):
+        running, max_running = 0, 0
+        lock = threading.Lock()
+
+        def slow_connect():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return create_session()
+
+        threads = [threading.Thread(target=self.pool.get_session, args=(f"pc-{i}", slow_connect)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.pool.handshakes, 6)
+        self.assertLessEqual(max_running, 2)
+
+    @unittest.skipUnless(hasattr(socket, "TCP_USER_TIMEOUT"), "TCP_USER_TIMEOUT is Linux only")
+    def test_dead_peer_detection_sets_socket_options(self):
+        pool = SSHConnectionPool(keepalive_interval=15, dead_peer_probes=4)
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            pool.enable_dead_peer_detection(sock)
+
+            self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE), 15)
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL), 15)
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT), 4)
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT), 60_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
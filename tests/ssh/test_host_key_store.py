@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import paramiko
+
+from src.server.ssh.host_key_store import HostKeyStore
+
+
+class TestHostKeyStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.key = paramiko.RSAKey.generate(1024)
+
+    def setUp(self) -> None:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "known_hosts")
+        self.write_known_hosts(["pc-1", paramiko.HostKeys.hash_host("pc-2")])
+        self.store = HostKeyStore(self.path)
+
+    def write_known_hosts(self, hostnames: list[str]) -> None:
+        with open(self.path, "w") as f:
+            for hostname in hostnames:
+                f.write(f"{hostname} {self.key.get_name()} {self.key.get_base64()}\n")
+
+    def test_plain_and_hashed_hostnames(self):
+        self.assertEqual(self.store.get_host_keys("pc-1"), {"ssh-rsa": self.key})
+        self.assertEqual(self.store.get_host_keys("pc-2"), {"ssh-rsa": self.key})
+        self.assertEqual(self.store.get_host_keys("pc-3"), {})
+
+    def test_reloaded_when_the_file_changes(self):
+        self.assertEqual(self.store.get_host_keys("pc-3"), {})
+        self.write_known_hosts(["pc-1", "pc-3"])
+        os.utime(self.path, (0, self.store.mtime + 10))
+        self.assertEqual(self.store.get_host_keys("pc-3"), {"ssh-rsa": self.key})
+
+    def test_apply_to_client(self):
+        ssh_session = paramiko.SSHClient()
+        self.store.apply_to(ssh_session, "pc-1")
+        self.assertEqual(ssh_session.get_host_keys().lookup("pc-1")["ssh-rsa"], self.key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.server.ssh.commands import SSHCommandExecutor
+from src.server.ssh.output_decoder import OutputDecoder, get_code_page_encoding
+
+
+def create_ssh(outputs: dict[str, bytes]) -> MagicMock:
+    def exec_command(command: str, timeout: float | None = None):
+        stdout, stderr = MagicMock(), MagicMock()
+        stdout.read.return_value = next(output for prefix, output in outputs.items() if prefix in command)
+        stdout.channel.exit_status = 0
+        stderr.read.return_value = b""
+        return None, stdout, stderr
+
+    ssh = MagicMock()
+    ssh.exec_command.side_effect = exec_command
+    return ssh
+
+
+class TestOutputDecoder(unittest.TestCase):
+    def test_code_page_is_read_from_chcp(self):
+        self.assertEqual(get_code_page_encoding("Active code page: 850"), "cp850")
+        self.assertEqual(get_code_page_encoding("Page de codes active : 1252\r\n"), "cp1252")
+        self.assertEqual(get_code_page_encoding("Aktive Codepage: 65001."), "utf-8")
+        self.assertIsNone(get_code_page_encoding("'chcp' is not recognized"))
+
+    def test_code_page_is_learned_once_and_saved(self):
+        learned: list[str] = []
+        ssh = create_ssh({"chcp": b"Page de codes active : 1252", "dir": "Répertoire".encode("cp1252")})
+        executor = SSHCommandExecutor(ssh, decoder=OutputDecoder(on_learned=learned.append))
+
+        self.assertEqual(executor.execute("dir", timeout=0).stdout, "Répertoire")
+        self.assertEqual(executor.execute("dir", timeout=0).stdout, "Répertoire")
+        self.assertEqual(learned, ["cp1252"])
+        self.assertEqual(sum("chcp" in call.args[0] for call in ssh.exec_command.call_args_list), 1)
+
+    def test_invalid_output_falls_back_to_detection(self):
+        decoder = OutputDecoder("utf-8")
+
+        self.assertEqual(decoder.decode("Mise à jour terminée, redémarrage nécessaire.".encode("cp1252")),
+                         "Mise à jour terminée, redémarrage nécessaire.")
+
+    def test_unknown_code_page_is_detected(self):
+        decoder = OutputDecoder()
+
+        self.assertEqual(decoder.decode("Mise à jour terminée, redémarrage nécessaire.".encode("utf-8")),
+                         "Mise à jour terminée, redémarrage nécessaire.")
+
+    def test_split_characters_are_decoded_incrementally(self):
+        decoder = OutputDecoder("utf-8").get_incremental_decoder()
+        encoded: bytes = "Téléchargé".encode("utf-8")
+
+        self.assertEqual(decoder.decode(encoded[:2]) + decoder.decode(encoded[2:], final=True), "Téléchargé")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import base64
+import queue
+import re
+import socket
+import unittest
+from unittest.mock import MagicMock
+
+from src.server.infrastructure.rollout_config import RolloutConfig
+from src.server.ssh.commands import SSHCommandExecutor, SSHCommandTimeoutResult
+from src.server.ssh.output_decoder import OutputDecoder
+from src.server.ssh.persistent_shell import PersistentShell
+
+
+class FakeShellChannel:
+    """
+    Answers the lines sent to the shell like the bootstrap functions would: a cmd command prints its arguments, a
+    script prints "done" and exits with the code of its exit statement, and a command containing "hang" never answers.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.lines: queue.Queue = queue.Queue()
+        self.sent: list[str] = []
+        self.timeout: float | None = None
+
+    def sendall(self, data: bytes) -> None:
+        line: str = data.decode("ascii").strip()
+        self.sent.append(line)
+        if not line.startswith("Invoke-UG"):
+            return
+        function, token, argument = line.split(" ")
+        argument = base64.b64decode(argument.strip("'")).decode("utf-8")
+        if "hang" in argument:
+            return
+        stdout: str = argument if function == "Invoke-UGCommand" else "done"
+        exit_statement = re.search(r"\bexit (\d+)", argument) if function == "Invoke-UGScript" else None
+        exit_code: int = int(exit_statement.group(1)) if exit_statement else 0
+        encoded: str = base64.b64encode(stdout.encode("utf-8")).decode("ascii")
+        self.lines.put(f"PS> noise\r\nUGR_{token.strip(chr(39))} {exit_code} {encoded} \r\n".encode("ascii"))
+
+    def settimeout(self, timeout: float | None) -> None:
+        self.timeout = timeout
+
+    def makefile(self, mode: str):
+        channel = self
+
+        class Reader:
+            def __init__(self):
+                self.buffer: list[bytes] = []
+
+            def readline(self) -> bytes:
+                if not self.buffer:
+                    try:
+                        self.buffer.extend(line + b"\n" for line in channel.lines.get(timeout=channel.timeout)
+                                           .split(b"\n") if line)
+                    except queue.Empty:
+                        raise socket.timeout()
+                return self.buffer.pop(0)
+
+        return Reader()
+
+    def close(self) -> None:
+        self.closed = True
+
+    def set_combine_stderr(self, combine: bool) -> None:
+        pass
+
+    def exec_command(self, command: str) -> None:
+        self.sent.append(command)
+
+    def get_transport(self):
+        return self.transport
+
+
+class TestPersistentShell(unittest.TestCase):
+    def setUp(self) -> None:
+        RolloutConfig.from_dict({"persistent_shell": {"enabled": True}}).apply()
+        self.addCleanup(RolloutConfig().apply)
+        self.channels: list[FakeShellChannel] = []
+        self.ssh = MagicMock()
+        self.ssh.get_transport.return_value.open_session.side_effect = self.open_session
+        self.executor = SSHCommandExecutor(self.ssh, decoder=OutputDecoder("cp850"))
+
+    def open_session(self) -> FakeShellChannel:
+        channel = FakeShellChannel()
+        channel.transport = self.ssh.get_transport.return_value
+        self.channels.append(channel)
+        return channel
+
+    def test_commands_share_one_shell(self):
+        first = self.executor.execute("echo a", timeout=5)
+        script = self.executor.execute_powershell("Get-Service sshd", timeout=5)
+
+        self.assertEqual(len(self.channels), 1)
+        self.assertEqual(self.channels[0].sent[0], PersistentShell.START_COMMAND)
+        self.assertTrue(first.stdout.startswith("/C \"set UGCMD="))
+        self.assertTrue(first.stdout.endswith("&& echo a\""))
+        self.assertEqual(first.exit_code, 0)
+        self.assertEqual(script.stdout, "done")
+        self.ssh.exec_command.assert_not_called()
+
+    def test_shell_past_its_deadline_is_replaced(self):
+        result = self.executor.execute_powershell("hang", timeout=0.05)
+        self.assertIsInstance(result, SSHCommandTimeoutResult)
+        self.assertTrue(self.channels[0].closed)
+
+        self.assertEqual(self.executor.execute_powershell("Get-Service sshd", timeout=5).stdout, "done")
+        self.assertEqual(len(self.channels), 2)
+
+    def test_script_calling_exit_keeps_the_shell(self):
+        result = self.executor.execute_powershell("if (-not (Test-Path C:\\missing)) { exit 1 }", timeout=5)
+
+        self.assertNotIsInstance(result, SSHCommandTimeoutResult)
+        self.assertEqual(result.exit_code, 1)
+        self.assertEqual(self.executor.execute_powershell("Get-Service sshd", timeout=5).exit_code, 0)
+        self.assertEqual(len(self.channels), 1)
+        self.assertFalse(self.channels[0].closed)
+        self.assertIn("[PowerShell]::Create()", PersistentShell.BOOTSTRAP[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import paramiko
+
+from src.server.ssh.commands import SSHCommands
+from src.server.ssh.sftp_session import SFTPSession, SFTPSettings
+
+
+def create_sftp(ssh: MagicMock) -> MagicMock:
+    sftp = MagicMock()
+    sftp.get_channel.return_value.closed = False
+    sftp.get_channel.return_value.get_transport.return_value = ssh.get_transport.return_value
+    return sftp
+
+
+class TestSFTPSession(unittest.TestCase):
+    def setUp(self) -> None:
+        self.session = SFTPSession(SFTPSettings(window_size=1024, max_packet_size=512))
+        patcher = patch("paramiko.SFTPClient.from_transport",
+                        side_effect=lambda transport, **kwargs: create_sftp(self.ssh))
+        self.from_transport = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ssh = MagicMock()
+
+    def test_session_is_reused(self):
+        first = self.session.get(self.ssh)
+        second = self.session.get(self.ssh)
+
+        self.assertIs(first, second)
+        self.from_transport.assert_called_once_with(self.ssh.get_transport.return_value, window_size=1024,
+                                                    max_packet_size=512)
+
+    def test_session_is_reopened_on_a_new_connection(self):
+        first = self.session.get(self.ssh)
+        self.ssh = MagicMock()
+
+        second = self.session.get(self.ssh)
+        self.assertIsNot(first, second)
+        first.close.assert_called_once()
+
+
+class TestUpload(unittest.TestCase):
+    def test_writes_are_pipelined(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        local_path: str = os.path.join(folder.name, "update.exe")
+        with open(local_path, "wb") as file:
+            file.write(b"x" * 5000)
+
+        commands = SSHCommands(MagicMock())
+        sftp = MagicMock()
+        sftp.stat.return_value.st_size = 5000
+        remote_file = sftp.open.return_value.__enter__.return_value
+        commands.sftp_session.get = MagicMock(return_value=sftp)
+
+        with patch("src.server.ssh.commands.sftp_settings", SFTPSettings(max_packet_size=1024,
+                                                                         max_prefetch_requests=2)):
+            self.assertTrue(commands.upload_files([local_path], "C:\\ug"))
+
+        remote_file.set_pipelined.assert_called_once_with(True)
+        self.assertEqual([len(call.args[0]) for call in remote_file.write.call_args_list], [2048, 2048, 904])
+
+    def test_size_mismatch_fails_the_upload(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        local_path: str = os.path.join(folder.name, "update.exe")
+        with open(local_path, "wb") as file:
+            file.write(b"x" * 10)
+
+        commands = SSHCommands(MagicMock())
+        sftp = MagicMock()
+        sftp.stat.return_value.st_size = 4
+        commands.sftp_session.get = MagicMock(return_value=sftp)
+
+        self.assertFalse(commands.upload_files([local_path], "C:\\ug"))
+
+    def test_refused_channel_fails_the_parallel_upload(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        local_paths: list[str] = []
+        for name in ("update.exe", "Update.ps1"):
+            local_paths.append(os.path.join(folder.name, name))
+            with open(local_paths[-1], "wb") as file:
+                file.write(b"x")
+
+        commands = SSHCommands(MagicMock())
+        commands.sftp_session.open = MagicMock(side_effect=paramiko.ChannelException(1, "Administratively prohibited"))
+        computer = MagicMock()
+
+        with patch("src.server.ssh.commands.sftp_settings", SFTPSettings(max_concurrent_transfers=2)):
+            self.assertFalse(commands.upload_files(local_paths, "C:\\ug", computer))
+        computer.log_error.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+
+from src.server.update_management.adaptive_concurrency import AdaptiveConcurrencyController, HostSlots
+from src.server.update_management.rollout_phases import RolloutPhase
+
+
+class TestAdaptiveConcurrencyController(unittest.TestCase):
+    def setUp(self) -> None:
+        self.slots = HostSlots(3)
+        self.controller = AdaptiveConcurrencyController(self.slots, floor=2, ceiling=5, window_size=4)
+
+    def record_window(self, duration: float, failures: int = 0):
+        for i in range(self.controller.window_size):
+            self.controller.record(RolloutPhase.INSTALL, duration, i >= failures)
+
+    def test_additive_increase_up_to_ceiling(self):
+        for expected_limit in [4, 5, 5]:
+            self.record_window(10)
+            self.assertEqual(self.slots.limit, expected_limit)
+
+    def test_multiplicative_decrease_on_failures(self):
+        self.record_window(10)
+        self.record_window(10, failures=2)
+        self.assertEqual(self.slots.limit, 2)
+
+    def test_multiplicative_decrease_on_latency_spike(self):
+        self.record_window(10)
+        self.record_window(10)
+        self.assertEqual(self.slots.limit, 5)
+        self.record_window(60)
+        self.assertEqual(self.slots.limit, 2)
+
+
+class TestHostSlots(unittest.TestCase):
+    def test_raising_the_limit_starts_queued_computers(self):
+        async def scenario():
+            slots = HostSlots(1)
+            await slots.acquire()
+            waiters = [asyncio.create_task(slots.acquire()) for _ in range(2)]
+            await asyncio.sleep(0)
+            self.assertFalse(any(waiter.done() for waiter in waiters))
+
+            slots.set_limit(3)
+            await asyncio.gather(*waiters)
+            self.assertEqual(slots.in_use, 3)
+
+            slots.set_limit(1)
+            slots.release()
+            self.assertEqual(slots.in_use, 2)
+
+        asyncio.run(scenario())
+
+    def test_retries_wait_for_first_attempts(self):
+        async def scenario():
+            slots = HostSlots(1)
+            await slots.acquire()
+            order: list[str] = []
+
+            async def acquire(name: str, is_retry: bool):
+                await slots.acquire(is_retry)
+                order.append(name)
+                slots.release()
+
+            retry = asyncio.create_task(acquire("retry", True))
+            await asyncio.sleep(0)
+            first = asyncio.create_task(acquire("first", False))
+            await asyncio.sleep(0)
+
+            slots.release()
+            await asyncio.gather(retry, first)
+            self.assertEqual(order, ["first", "retry"])
+
+        asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.server.exceptions.ConnectionSSHException import ConnectionSSHException
+from src.server.infrastructure.rollout_config import RolloutConfig
+from src.server.update_management.async_update_orchestrator import AsyncUpdateOrchestrator
+from src.server.update_management.retry_scheduler import FailureKind, RetryPolicy, RetryScheduler
+
+
+def create_computer(hostname: str, result: dict | None = None) -> MagicMock:
+    computer = MagicMock()
+    computer.get_hostname.return_value = hostname
+    computer.ipv4 = "192.168.0.10"
+    computer.no_updates = False
+    computer.is_phase_completed.return_value = False
+    computer.get_scanned_state.return_value = None
+    computer.install_prerequisites_client.return_value = True
+    computer.run_client_program.return_value = result or {"RebootRequired": False, "UpdateCount": 1}
+    return computer
+
+
+async def always_on(*_args, **_kwargs):
+    return True
+
+
+class TestAsyncUpdateOrchestrator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config = RolloutConfig.from_dict({"orchestrator": {"mode": "asyncio", "max_executor_workers": 2}})
+        self.config.apply()
+        scan_patcher = patch("src.server.core.reachability.is_port_open", always_on)
+        scan_patcher.start()
+        self.addCleanup(scan_patcher.stop)
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_update_all_computers(self):
+        computers = [create_computer(f"pc-{i}") for i in range(10)]
+        AsyncUpdateOrchestrator(computers, self.config).run()
+
+        for computer in computers:
+            computer.connect.assert_called_once()
+            computer.finish_update.assert_called_once_with(None)
+            computer.computer.send_wake_on_lan.assert_not_called()
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_executor_is_bounded(self):
+        running, max_running = 0, 0
+        lock = threading.Lock()
+
+        def blocking_step():
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return True
+
+        computers = [create_computer(f"pc-{i}") for i in range(8)]
+        for computer in computers:
+            computer.install_prerequisites_client.side_effect = blocking_step
+        AsyncUpdateOrchestrator(computers, self.config).run()
+
+        self.assertLessEqual(max_running, self.config.orchestrator.max_executor_workers)
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_reboot_reconnects(self):
+        probes = iter([False, True])
+
+        async def rebooting(*_args, **_kwargs):
+            return next(probes)
+
+        computer = create_computer("pc-reboot", {"RebootRequired": True, "UpdateCount": 2})
+        self.config.reboot_watcher.probe_interval = 0
+        with patch("src.server.update_management.reboot_watcher.is_port_open", rebooting):
+            AsyncUpdateOrchestrator([computer], self.config).run()
+
+        computer.computer.force_close_ssh_session.assert_called_once()
+        computer.computer.connect.assert_called_once()
+        computer.finish_update.assert_called_once_with(None)
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_failed_computer_is_retried(self):
+        computer = create_computer("pc-retry")
+        computer.connect.side_effect = [ConnectionSSHException(), True]
+        computer.get_failure_kind.return_value = FailureKind.TRANSIENT_SSH
+        retry_scheduler = RetryScheduler({**{kind: RetryPolicy() for kind in FailureKind},
+                                          FailureKind.TRANSIENT_SSH: RetryPolicy(max_retries=1, base_delay=0)},
+                                         time_budget=60)
+        AsyncUpdateOrchestrator([computer], self.config, retry_scheduler).run()
+
+        self.assertEqual(computer.connect.call_count, 2)
+        computer.reset_for_retry.assert_called_once()
+        computer.record_result.assert_called_once()
+        computer.finish_update.assert_called_once_with(None)
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_journal_is_written_from_the_executor(self):
+        threads: set[str] = set()
+        computer = create_computer("pc-journal")
+        computer.record_phase.side_effect = lambda *_args, **_kwargs: threads.add(threading.current_thread().name)
+        computer.record_result.side_effect = lambda: threads.add(threading.current_thread().name)
+        AsyncUpdateOrchestrator([computer], self.config).run()
+
+        self.assertEqual(computer.record_phase.call_count, 5)
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("update-worker") for name in threads))
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_installs_do_not_use_the_shared_executor(self):
+        computers = [create_computer(f"pc-{i}") for i in range(3 * self.config.orchestrator.max_executor_workers)]
+        # Every install only ends once all the computers are installing, after giving their install slot back.
+        installing = threading.Barrier(len(computers), timeout=5)
+        self.config.phase_limits.install = 1
+
+        def client_program(computer):
+            computer.progress_listener({"Stage": "downloaded"})
+            installing.wait()
+            return {"RebootRequired": False, "UpdateCount": 1}
+
+        for computer in computers:
+            computer.run_client_program.side_effect = functools.partial(client_program, computer)
+        AsyncUpdateOrchestrator(computers, self.config).run()
+
+        self.assertFalse(installing.broken)
+        for computer in computers:
+            computer.finish_update.assert_called_once_with(None)
+
+    @patch("src.server.update_management.async_update_orchestrator.is_port_open", always_on)
+    def test_aborted_rollout_cancels_the_running_commands(self):
+        started, cancelled = threading.Event(), threading.Event()
+        computer = create_computer("pc-aborted")
+        computer.run_client_program.side_effect = lambda: started.set() or cancelled.wait(5) and None
+        computer.cancel_commands.side_effect = cancelled.set
+
+        async def abort():
+            rollout = asyncio.create_task(AsyncUpdateOrchestrator([computer], self.config).update_all_computers())
+            await asyncio.to_thread(started.wait, 5)
+            rollout.cancel()
+            await rollout
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(abort())
+        computer.cancel_commands.assert_called_once()
+        self.assertTrue(cancelled.is_set())
+
+    def test_scanned_computers_are_not_probed_again(self):
+        async def never_called(*_args, **_kwargs):
+            raise AssertionError("The computer should not be probed again.")
+
+        async def awake(*_args, **_kwargs):
+            return True
+
+        off, on = create_computer("pc-off"), create_computer("pc-on")
+        off.get_scanned_state.return_value = False
+        on.get_scanned_state.return_value = True
+        with patch("src.server.update_management.async_update_orchestrator.is_port_open", never_called), \
+                patch("src.server.update_management.async_update_orchestrator.wait_for_port_state", awake):
+            AsyncUpdateOrchestrator([off, on], self.config).run()
+
+        off.computer.send_wake_on_lan.assert_called_once()
+        on.computer.send_wake_on_lan.assert_not_called()
+        off.set_scanned_state.assert_called_once_with(True)
+
+    def test_unknown_config_keys_are_ignored(self):
+        config = RolloutConfig.from_dict({"orchestrator": {"mode": "asyncio", "not_a_setting": 1}})
+        self.assertTrue(config.is_asyncio_mode())
+        self.assertEqual(config.max_computers_per_iteration, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
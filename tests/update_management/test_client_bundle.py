@@ -0,0 +1,46 @@
+import os
+import tarfile
+import tempfile
+import unittest
+
+from src.server.update_management.client_bundle import ClientBundleService
+from src.server.update_management.client_manifest import ClientArtifact, ClientManifest
+
+
+class TestClientBundle(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        path: str = os.path.join(self.folder.name, "update.exe")
+        with open(path, "wb") as file:
+            file.write(b"exe" * 1000)
+        self.manifest = ClientManifest((ClientArtifact(path, 3000, 0.0, "hash"),), "v1")
+        self.service = ClientBundleService(folder=os.path.join(self.folder.name, "bundles"))
+
+    def test_bundle_is_built_once_per_version(self):
+        bundle: str = self.service.get_bundle(self.manifest)
+        mtime: float = os.stat(bundle).st_mtime_ns
+
+        self.assertEqual(self.service.get_bundle(self.manifest), bundle)
+        self.assertEqual(os.stat(bundle).st_mtime_ns, mtime)
+        self.assertLess(os.path.getsize(bundle), 3000)
+        with tarfile.open(bundle) as archive:
+            self.assertEqual(archive.getnames(), ["update.exe"])
+
+    def test_install_command_swaps_the_folder(self):
+        command: str = ClientBundleService.get_install_command("C:\\Users\\u\\b.tar.gz", "C:\\Users\\u\\updateguardian")
+
+        self.assertIn("tar -xzf \"C:\\Users\\u\\b.tar.gz\" -C \"C:\\Users\\u\\updateguardian.staging\"", command)
+        self.assertIn("move \"C:\\Users\\u\\updateguardian.staging\" \"C:\\Users\\u\\updateguardian\"", command)
+
+    def test_failed_swap_restores_the_old_folder(self):
+        command: str = ClientBundleService.get_install_command("C:\\b.tar.gz", "C:\\ug")
+
+        swap, restore = command.split(" || ", 1)
+        self.assertTrue(swap.endswith("(move \"C:\\ug.staging\" \"C:\\ug\" >nul"))
+        self.assertTrue(restore.startswith("((if exist \"C:\\ug.old\" (move \"C:\\ug.old\" \"C:\\ug\" >nul)) & (call)))"
+                                           " && echo BUNDLE_INSTALLED"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.server.security.encryption import Hasher
+from src.server.update_management.client_manifest import ClientManifestService
+
+
+class TestClientManifest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.files: list[str] = []
+        for name, content in (("update.exe", b"exe"), ("Update.ps1", b"ps1")):
+            path: str = os.path.join(self.folder.name, name)
+            with open(path, "wb") as file:
+                file.write(content)
+            self.files.append(path)
+
+        patcher = patch("src.server.infrastructure.paths.ServerPath.get_client_files", return_value=self.files)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.folder.cleanup)
+        self.service = ClientManifestService()
+
+    def test_files_are_hashed_once(self):
+        with patch.object(Hasher, "sha256", wraps=Hasher.sha256) as sha256:
+            first = self.service.get_manifest()
+            second = self.service.get_manifest()
+
+        self.assertEqual(sha256.call_count, 2)
+        self.assertEqual(first, second)
+        self.assertEqual(first.get_hash(self.files[0]), Hasher.sha256(self.files[0]))
+
+    def test_version_changes_with_the_files(self):
+        version: str = self.service.get_manifest().version
+
+        with open(self.files[0], "wb") as file:
+            file.write(b"new exe")
+        os.utime(self.files[0], (0, 0))
+
+        self.assertNotEqual(self.service.get_manifest().version, version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.server.infrastructure.artifact_server import ArtifactServer
+from src.server.update_management.client_manifest import ClientArtifact, ClientManifest
+from src.server.update_management.computer_dependencies_manager import ComputerDependenciesManager
+from src.server.update_management.delta_sync import DeltaSyncService
+
+
+class TestVersionMarker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.computer = MagicMock()
+        self.computer.paths.join.side_effect = lambda *parts: "\\".join(parts)
+        self.computer.paths.get_project_directory.return_value = "C:\\Users\\user\\updateguardian"
+        self.manager = ComputerDependenciesManager(self.computer)
+        self.manager.verify_client_files = MagicMock(return_value=True)
+
+        patcher = patch("src.server.update_management.computer_dependencies_manager.client_manifest_service")
+        patcher.start().get_manifest.return_value = ClientManifest((), "v2")
+        self.addCleanup(patcher.stop)
+
+    def test_up_to_date_marker_skips_the_verification(self):
+        self.computer.read_file.return_value = "v2\r\n"
+
+        self.assertTrue(self.manager.send_client_application())
+        self.manager.verify_client_files.assert_not_called()
+        self.computer.write_file.assert_not_called()
+
+    def test_outdated_marker_verifies_the_files_and_writes_the_marker(self):
+        self.computer.read_file.return_value = "v1"
+
+        self.assertTrue(self.manager.send_client_application())
+        self.manager.verify_client_files.assert_called_once()
+        self.computer.write_file.assert_called_once_with(
+            "C:\\Users\\user\\updateguardian\\client_version.txt", "v2")
+
+    def test_outdated_files_are_hashed_at_windows_paths(self):
+        manifest = ClientManifest((ClientArtifact("/srv/client/update.exe", 1, 0.0, "abc"),
+                                   ClientArtifact("/srv/client/Update.ps1", 1, 0.0, "def")), "v2")
+        self.computer.get_files_sha256.return_value = ["abc", "old"]
+        with patch("src.server.update_management.computer_dependencies_manager.client_manifest_service") as service:
+            service.get_manifest.return_value = manifest
+            self.assertEqual(self.manager.get_outdated_client_files(), ["/srv/client/Update.ps1"])
+
+        self.computer.get_files_sha256.assert_called_once_with(["C:\\Users\\user\\updateguardian\\update.exe",
+                                                                "C:\\Users\\user\\updateguardian\\Update.ps1"])
+
+
+class TestDeltaUpdate(unittest.TestCase):
+    def setUp(self) -> None:
+        self.computer = MagicMock()
+        self.computer.paths.join.side_effect = lambda *parts: "\\".join(parts)
+        self.computer.paths.get_project_directory.return_value = "C:\\Users\\user\\updateguardian"
+        self.manager = ComputerDependenciesManager(self.computer)
+        self.manager.upload_client_files = MagicMock(return_value=True)
+        self.manager.delta_update_client_file = MagicMock(return_value=True)
+
+        patcher = patch("src.server.update_management.computer_dependencies_manager.delta_sync_service",
+                        DeltaSyncService(enabled=True, supported_client_hashes=["ABC"]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unknown_update_exe_gets_the_files_uploaded(self):
+        self.computer.get_files_sha256.return_value = ["old"]
+
+        self.assertTrue(self.manager.update_outdated_client_files(["update.exe"]))
+        self.manager.delta_update_client_file.assert_not_called()
+        self.manager.upload_client_files.assert_called_once()
+
+    def test_supported_update_exe_gets_a_delta(self):
+        self.computer.get_files_sha256.return_value = ["abc"]
+
+        self.assertTrue(self.manager.update_outdated_client_files(["update.exe"]))
+        self.manager.delta_update_client_file.assert_called_once_with("update.exe")
+        self.manager.upload_client_files.assert_not_called()
+
+
+class TestClientFilesPull(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.files: list[str] = []
+        for name, size in (("update.exe", 4096), ("Update.ps1", 10)):
+            self.files.append(os.path.join(self.folder.name, name))
+            with open(self.files[-1], "wb") as file:
+                file.write(b"x" * size)
+
+        self.computer = MagicMock()
+        self.computer.paths.join.side_effect = lambda *parts: "\\".join(parts)
+        self.computer.paths.get_project_directory.return_value = "C:\\Users\\user\\updateguardian"
+        self.computer.get_local_address.return_value = "10.0.0.1"
+        self.computer.execute_powershell.return_value.stdout = "PULL_OK"
+        self.computer.upload_files.return_value = True
+        self.manager = ComputerDependenciesManager(self.computer)
+        self.manager.download_from_peer = MagicMock(return_value=False)
+
+        self.server = ArtifactServer(enabled=True, min_segment_size=1024)
+        self.server.httpd = MagicMock()
+        for patcher in (
+                patch("src.server.update_management.computer_dependencies_manager.artifact_server", self.server),
+                patch("src.server.infrastructure.paths.ServerPath.get_client_files", return_value=self.files),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_large_files_are_downloaded_from_the_artifact_server(self):
+        self.assertTrue(self.manager.upload_client_files())
+
+        self.computer.execute_powershell.assert_called_once()
+        self.assertIn("C:\\Users\\user\\updateguardian\\update.exe",
+                      self.computer.execute_powershell.call_args.args[0])
+        self.computer.upload_files.assert_called_once_with([self.files[1]], "C:\\Users\\user\\updateguardian")
+
+    def test_files_are_uploaded_without_the_artifact_server(self):
+        self.server.httpd = None
+        self.assertTrue(self.manager.upload_client_files())
+
+        self.computer.execute_powershell.assert_not_called()
+        self.computer.upload_files.assert_called_once_with(self.files, "C:\\Users\\user\\updateguardian")
+
+
+if __name__ == '__main__':
+    unittest.main()
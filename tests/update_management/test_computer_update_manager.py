@@ -0,0 +1,61 @@
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src.server.exceptions.ConnectionSSHException import ConnectionSSHException
+from src.server.update_management.computer_update_manager import ComputerUpdateManager
+from src.server.update_management.retry_scheduler import FailureKind
+from src.server.wake_on_lan.bulk_wake import BulkWaker
+
+
+class TestParseResultEvent(unittest.TestCase):
+    def test_last_result_line_is_read(self):
+        result = {"UpdateCount": 1, "UpdateNames": ["KB5034441"], "UpdateFinished": True, "ErrorMessage": None}
+        stdout = ("Starting Windows Update and launching the scheduled task...\n"
+                  "{'UpdateCount': 1}\n"
+                  f"{json.dumps({'event': 'result', 'data': result})}\r\n")
+
+        self.assertEqual(result, ComputerUpdateManager.parse_result_event(stdout))
+
+    def test_output_of_an_old_client_has_no_result(self):
+        stdout = "Windows Update finished, json file dumped.\n{\"UpdateCount\": 1}\n"
+
+        self.assertIsNone(ComputerUpdateManager.parse_result_event(stdout))
+
+
+class TestWakeUp(unittest.TestCase):
+    def setUp(self) -> None:
+        remote_computer = MagicMock()
+        remote_computer.get_hostname.return_value = "pc-1"
+        remote_computer.get_ipv4.return_value = "10.0.0.1"
+        remote_computer.get_mac_address.return_value = "aa:bb:cc:dd:ee:ff"
+        self.computer = ComputerUpdateManager(remote_computer)
+        self.computer.set_scanned_state(False)
+        self.computer.bulk_waker = BulkWaker()
+        self.target = self.computer.bulk_waker.add_targets([("aa:bb:cc:dd:ee:ff", "10.0.0.1")])[0]
+
+    def test_waits_for_the_bulk_waker(self):
+        threading.Timer(0.1, self.target.finish, kwargs={"awake": True}).start()
+        self.computer.wake_up()
+
+        self.computer.computer.awake_pc.assert_not_called()
+        self.computer.computer.is_pc_on.assert_not_called()
+
+    def test_computer_not_woken_up_by_the_bulk_waker(self):
+        threading.Timer(0.1, self.target.finish).start()
+        with self.assertRaises(ConnectionSSHException):
+            self.computer.wake_up()
+
+        self.assertEqual(self.computer.failure_kind, FailureKind.WAKE)
+        self.computer.computer.awake_pc.assert_not_called()
+
+    def test_wakes_up_itself_without_bulk_wake(self):
+        self.computer.bulk_waker = None
+        self.computer.wake_up()
+
+        self.computer.computer.awake_pc.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from src.client.delta_sync import apply_patch, compute_signature
+from src.server.update_management.delta_sync import DeltaSyncService
+
+
+class TestDeltaSync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.service = DeltaSyncService(enabled=True, block_size=2048, folder=self.folder.name)
+
+    def write(self, name: str, content: bytes) -> str:
+        path: str = os.path.join(self.folder.name, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def test_patch_rebuilds_the_new_file(self):
+        generator = random.Random(0)
+        old: bytes = generator.randbytes(200_000)
+        new: bytes = old[:50_000] + b"changed" * 100 + old[50_000:150_000] + old[160_000:] + b"end"
+        old_path, new_path = self.write("old.exe", old), self.write("new.exe", new)
+
+        signature: str = json.dumps(compute_signature(old_path, 2048))
+        patch = self.service.get_patch(signature, new_path)
+        apply_patch(old_path, patch.path, os.path.join(self.folder.name, "out.exe"))
+
+        with open(os.path.join(self.folder.name, "out.exe"), "rb") as file:
+            self.assertEqual(file.read(), new)
+        self.assertLess(patch.literal_bytes, 10_000)
+        self.assertIs(self.service.get_patch(signature, new_path), patch)
+
+    def test_invalid_signature(self):
+        with self.assertRaises(ValueError):
+            self.service.get_patch("'update.exe' is not recognized", self.write("new.exe", b"new"))
+
+
+if __name__ == '__main__':
+    unittest.main()
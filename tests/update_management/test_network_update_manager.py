@@ -0,0 +1,73 @@
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.server.infrastructure.rollout_config import RolloutConfig
+from src.server.update_management.network_update_manager import UpdateManager
+from src.server.update_management.retry_scheduler import RetryScheduler
+from src.server.update_management.rollout_journal import RolloutJournal
+
+
+class TestInterruptedRollout(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.addCleanup(RolloutConfig().apply)
+        for patcher in (
+                patch("src.server.infrastructure.paths.ServerPath.get_rollout_journals_folder",
+                      return_value=self.folder.name),
+                patch.object(RolloutConfig, "load", return_value=RolloutConfig()),
+                patch("src.server.update_management.network_update_manager.client_manifest_service"),
+                patch("src.server.update_management.network_update_manager.ssh_connection_pool"),
+                patch("src.server.update_management.network_update_manager.host_record_store"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.computer = MagicMock(ipv4="10.0.0.1", checkpoint=None)
+        self.computer.get_hostname.return_value = "pc-1"
+        self.manager = UpdateManager()
+        self.manager.computers = [self.computer]
+
+    def test_interrupted_rollout_stays_resumable(self):
+        with patch.object(UpdateManager, "scan_fleet", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.manager.update_all_computers()
+
+        journal = RolloutJournal.find_unfinished()
+        self.assertIsNotNone(journal)
+        self.assertEqual(journal.path, self.computer.journal.path)
+
+    def test_completed_rollout_is_finished(self):
+        with patch.object(UpdateManager, "scan_fleet"), \
+                patch.object(UpdateManager, "update_all_computers_threaded"), \
+                patch("src.server.update_management.network_update_manager.Infos") as infos:
+            infos.email_send = False
+            self.manager.update_all_computers()
+
+        self.assertIsNone(RolloutJournal.find_unfinished())
+
+
+class TestAbortedRollout(unittest.TestCase):
+    def test_running_commands_are_cancelled(self):
+        started, cancelled = threading.Event(), threading.Event()
+        computer = MagicMock()
+        computer.update.side_effect = lambda: started.set() or cancelled.wait(5) and False
+        computer.cancel_commands.side_effect = cancelled.set
+        manager = UpdateManager()
+        manager.max_number_of_simultaneous_updates = 2
+
+        def interrupted_wait(*args, **kwargs):
+            started.wait(5)
+            raise KeyboardInterrupt()
+
+        with patch("concurrent.futures.wait", interrupted_wait), self.assertRaises(KeyboardInterrupt):
+            manager.update_all_computers_threaded([computer], MagicMock(spec=RetryScheduler))
+
+        computer.cancel_commands.assert_called_once()
+        self.assertTrue(cancelled.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
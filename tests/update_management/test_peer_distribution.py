@@ -0,0 +1,71 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from src.client.artifact_server import serve
+from src.server.update_management.peer_distribution import PeerDistributor
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestPeerDistribution(unittest.TestCase):
+    def setUp(self) -> None:
+        self.distributor = PeerDistributor(enabled=True, seeds_per_subnet=1, subnets=["10.1.0.0/16"])
+        self.distributor.build(["10.1.1.1", "10.1.2.2", "192.168.1.1", "192.168.1.2", "192.168.2.1"])
+
+    def test_distribution_tree_is_built_from_the_subnets(self):
+        self.assertEqual(len(self.distributor.members), 3)
+        self.assertTrue(self.distributor.needs_seed("10.1.1.1"))
+        self.assertFalse(self.distributor.needs_seed("192.168.2.1"))
+
+        self.distributor.add_seed("10.1.1.1")
+        self.assertFalse(self.distributor.needs_seed("10.1.2.2"))
+        self.assertEqual(self.distributor.get_seed("10.1.2.2"), "10.1.1.1")
+        self.assertIsNone(self.distributor.get_seed("10.1.1.1"))
+        self.assertIsNone(self.distributor.get_seed("192.168.1.2"))
+
+        self.distributor.remove_seed("10.1.1.1")
+        self.assertIsNone(self.distributor.get_seed("10.1.2.2"))
+
+    def test_failed_download_deletes_the_part_files(self):
+        command: str = self.distributor.get_download_command("10.1.1.1", ["update.exe", "Update.ps1"], "C:\\ug")
+
+        downloads, cleanup = command.split(" || ")
+        self.assertIn("echo PEER_DOWNLOADED", downloads)
+        self.assertIn("del /F /Q \"C:\\ug\\update.exe.part\" \"C:\\ug\\Update.ps1.part\"", cleanup)
+
+    def test_local_peer_serves_only_the_client_files(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        for name in ("update.exe", "update_windows.log"):
+            with open(os.path.join(folder.name, name), "wb") as file:
+                file.write(name.encode())
+
+        port: int = get_free_port()
+        threading.Thread(target=serve, args=(folder.name, port, 2, ["update.exe"], "127.0.0.1"), daemon=True).start()
+
+        url: str = f"http://127.0.0.1:{port}"
+        for _ in range(50):
+            try:
+                with urllib.request.urlopen(f"{url}/update.exe", timeout=1) as response:
+                    self.assertEqual(response.read(), b"update.exe")
+                break
+            except urllib.error.URLError:
+                threading.Event().wait(0.05)
+        else:
+            self.fail("The local peer did not start.")
+
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/update_windows.log", timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.server.ssh.commands import SSHCommandResult
+from src.server.update_management.pending_update_scan import PendingUpdateScanner
+
+
+def create_computer(ipv4: str, stdout: str | None) -> MagicMock:
+    computer = MagicMock()
+    computer.ipv4 = ipv4
+    computer.computer.connect.return_value = True
+    computer.computer.execute_powershell.return_value = SSHCommandResult(stdout, None, 0)
+    return computer
+
+
+class TestPendingUpdateScanner(unittest.TestCase):
+    def test_scan_output_is_parsed(self):
+        self.assertEqual(PendingUpdateScanner.parse('UG_PENDING ["KB5034441", "KB890830"]'),
+                         ["KB5034441", "KB890830"])
+        self.assertEqual(PendingUpdateScanner.parse("Warning\nUG_PENDING []"), [])
+        self.assertIsNone(PendingUpdateScanner.parse("Exception from HRESULT: 0x8024402C"))
+
+    def test_scan_runs_the_query_of_the_client(self):
+        script: str = PendingUpdateScanner().get_script()
+
+        self.assertIn("Get-WindowsUpdate -IgnoreReboot | Where-Object { $_.IsInstalled -eq $false }", script)
+        self.assertTrue(script.startswith("$ErrorActionPreference = 'Stop'"))
+
+    def test_only_computers_with_updates_are_planned(self):
+        with_updates = create_computer("10.0.0.1", 'UG_PENDING ["KB5034441"]')
+        without_updates = create_computer("10.0.0.2", "UG_PENDING []")
+        failed_scan = create_computer("10.0.0.3", None)
+        off = create_computer("10.0.0.4", None)
+        states = {"10.0.0.1": True, "10.0.0.2": True, "10.0.0.3": True, "10.0.0.4": False}
+
+        with patch("src.server.update_management.pending_update_scan.scan_reachability_blocking",
+                   return_value=states):
+            plan = PendingUpdateScanner(max_concurrent_scans=2).plan([with_updates, without_updates, failed_scan,
+                                                                      off])
+
+        self.assertEqual(plan.to_install, [with_updates])
+        self.assertEqual(plan.nothing_to_install, [without_updates])
+        self.assertEqual(plan.get_pipeline_computers(), [with_updates, off, failed_scan])
+        off.computer.connect.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
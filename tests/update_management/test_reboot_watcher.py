@@ -0,0 +1,38 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from src.server.update_management.reboot_watcher import RebootWatcher
+
+
+class TestRebootWatcher(unittest.TestCase):
+    def run_watcher(self, port_states: dict[str, list[bool]], timeout: float) -> list[bool]:
+        async def probe(ip, *_args):
+            states = port_states[ip]
+            return states.pop(0) if len(states) > 1 else states[0]
+
+        async def scenario():
+            watcher = RebootWatcher(probe_interval=0.01)
+            watcher.start()
+            try:
+                return await asyncio.gather(*(watcher.wait_for_reboot(ip, ip, timeout) for ip in port_states))
+            finally:
+                await watcher.stop()
+
+        with patch("src.server.update_management.reboot_watcher.is_port_open", probe):
+            return asyncio.run(scenario())
+
+    def test_computers_are_released_when_back_online(self):
+        results = self.run_watcher({
+            "10.0.0.1": [False, True],
+            "10.0.0.2": [True, True, False, False, True],
+        }, timeout=5)
+        self.assertEqual(results, [True, True])
+
+    def test_computer_that_never_goes_down_times_out(self):
+        results = self.run_watcher({"10.0.0.1": [True], "10.0.0.2": [False, True]}, timeout=0.05)
+        self.assertEqual(results, [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.server.infrastructure.rollout_config import RetryConfig
+from src.server.update_management.retry_scheduler import FailureKind, RetryPolicy, RetryScheduler
+
+
+class TestRetryScheduler(unittest.TestCase):
+    def test_exponential_backoff(self):
+        scheduler = RetryScheduler({FailureKind.WAKE: RetryPolicy(max_retries=4, base_delay=10, max_delay=30)},
+                                   time_budget=3600, jitter=0)
+        delays = [scheduler.get_retry_delay("pc-1", FailureKind.WAKE) for _ in range(5)]
+        self.assertEqual(delays, [10, 20, 30, 30, None])
+
+    def test_jitter_stays_below_the_delay(self):
+        scheduler = RetryScheduler({FailureKind.OTHER: RetryPolicy(max_retries=1, base_delay=100, max_delay=100)},
+                                   time_budget=3600, jitter=0.5)
+        delay = scheduler.get_retry_delay("pc-1", FailureKind.OTHER)
+        self.assertTrue(50 <= delay <= 100)
+
+    def test_time_budget(self):
+        scheduler = RetryScheduler({FailureKind.TRANSIENT_SSH: RetryPolicy(max_retries=3, base_delay=60)},
+                                   time_budget=30, jitter=0)
+        self.assertIsNone(scheduler.get_retry_delay("pc-1", FailureKind.TRANSIENT_SSH))
+
+    def test_from_config(self):
+        config = RetryConfig(policies={"auth": {"max_retries": 0}, "wake": {"max_retries": 1, "unknown": 1}})
+        scheduler = RetryScheduler.from_config(config)
+        self.assertIsNone(scheduler.get_retry_delay("pc-1", FailureKind.AUTH))
+        self.assertIsNotNone(scheduler.get_retry_delay("pc-1", FailureKind.WAKE))
+
+        scheduler = RetryScheduler.from_config(RetryConfig(enabled=False))
+        self.assertIsNone(scheduler.get_retry_delay("pc-1", FailureKind.WAKE))
+
+    def test_only_the_final_failure_is_reported(self):
+        scheduler = RetryScheduler({**{kind: RetryPolicy() for kind in FailureKind},
+                                    FailureKind.OTHER: RetryPolicy(max_retries=1, base_delay=0)}, time_budget=3600)
+        computer = MagicMock()
+        computer.get_hostname.return_value = "pc-1"
+        computer.get_failure_kind.return_value = FailureKind.OTHER
+
+        self.assertIsNotNone(scheduler.finish_attempt(computer, False))
+        computer.report_final_failure.assert_not_called()
+        computer.record_result.assert_not_called()
+
+        self.assertIsNone(scheduler.finish_attempt(computer, False))
+        computer.report_final_failure.assert_called_once()
+        computer.record_result.assert_called_once()
+        self.assertFalse(computer.updated_successfully)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.server.update_management.rollout_journal import RolloutJournal
+from src.server.update_management.rollout_phases import RolloutPhase
+
+
+class TestRolloutJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        patcher = patch("src.server.infrastructure.paths.ServerPath.get_rollout_journals_folder",
+                        return_value=self.folder.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.folder.cleanup)
+
+    def test_finished_rollout_is_not_resumed(self):
+        journal = RolloutJournal.create()
+        journal.record_phase("pc-1", RolloutPhase.WAKE)
+        journal.finish()
+        self.assertIsNone(RolloutJournal.find_unfinished())
+
+    def test_checkpoints_of_interrupted_rollout(self):
+        journal = RolloutJournal.create()
+        journal.record_phase("pc-1", RolloutPhase.UPLOAD)
+        journal.record_phase("pc-1", RolloutPhase.INSTALL, no_updates=True)
+        journal.record_result("pc-2", RolloutJournal.RESULT_UPDATED)
+        journal.record_phase("pc-3", RolloutPhase.UPLOAD)
+        journal.record_result("pc-3", RolloutJournal.RESULT_FAILED)
+        journal.record_phase("pc-3", RolloutPhase.WAKE)
+        with open(journal.path, "a") as f:
+            f.write('{"event": "phase_completed", "hostna')
+
+        resumed = RolloutJournal.find_unfinished()
+        self.assertEqual(resumed.path, journal.path)
+        resumed.record_phase("pc-4", RolloutPhase.WAKE)
+
+        checkpoints = resumed.load_checkpoints()
+        self.assertTrue(checkpoints["pc-1"].is_phase_completed(RolloutPhase.INSTALL))
+        self.assertTrue(checkpoints["pc-1"].phase_details[RolloutPhase.INSTALL]["no_updates"])
+        self.assertIsNone(checkpoints["pc-1"].result)
+        self.assertEqual(checkpoints["pc-2"].result, RolloutJournal.RESULT_UPDATED)
+        self.assertFalse(checkpoints["pc-3"].is_phase_completed(RolloutPhase.UPLOAD))
+        self.assertIn("pc-4", checkpoints)
+
+    def test_old_journals_are_removed(self):
+        with patch("time.strftime", side_effect=[f"2024010{i}" for i in range(1, 10)] + ["20240110", "20240111"]):
+            for _ in range(RolloutJournal.JOURNALS_TO_KEEP + 1):
+                RolloutJournal.create().finish()
+        self.assertEqual(len(RolloutJournal.list_journals(self.folder.name)), RolloutJournal.JOURNALS_TO_KEEP)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from src.server.infrastructure.rollout_config import PhaseLimitsConfig
+from src.server.update_management.rollout_phases import PhaseLimiter, RolloutPhase
+
+
+class TestPhaseLimiter(unittest.TestCase):
+    def test_each_phase_has_its_own_limit(self):
+        async def scenario():
+            limiter = PhaseLimiter(PhaseLimitsConfig(upload=2, wake=10).as_dict())
+            max_active: dict[RolloutPhase, int] = {RolloutPhase.UPLOAD: 0, RolloutPhase.WAKE: 0}
+
+            async def computer(phase: RolloutPhase):
+                async with limiter.phase(phase):
+                    max_active[phase] = max(max_active[phase], limiter.active[phase])
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(computer(RolloutPhase.UPLOAD) for _ in range(6)),
+                                 *(computer(RolloutPhase.WAKE) for _ in range(6)))
+            return limiter, max_active
+
+        limiter, max_active = asyncio.run(scenario())
+        self.assertEqual(max_active[RolloutPhase.UPLOAD], 2)
+        self.assertEqual(max_active[RolloutPhase.WAKE], 6)
+        self.assertEqual(limiter.queued[RolloutPhase.UPLOAD], 0)
+        self.assertEqual(limiter.active[RolloutPhase.UPLOAD], 0)
+
+    def test_released_slot_is_given_to_the_next_computer(self):
+        async def scenario():
+            limiter = PhaseLimiter(PhaseLimitsConfig(install=1).as_dict())
+            order: list[str] = []
+
+            async def first():
+                async with limiter.phase(RolloutPhase.INSTALL) as slot:
+                    order.append("first downloaded")
+                    slot.release()
+                    await asyncio.sleep(0.02)
+                    order.append("first installed")
+
+            async def second():
+                await asyncio.sleep(0.005)
+                async with limiter.phase(RolloutPhase.INSTALL):
+                    order.append("second started")
+
+            await asyncio.gather(first(), second())
+            return limiter, order
+
+        limiter, order = asyncio.run(scenario())
+        self.assertEqual(["first downloaded", "second started", "first installed"], order)
+        self.assertEqual(limiter.active[RolloutPhase.INSTALL], 0)
+        self.assertEqual(limiter.semaphores[RolloutPhase.INSTALL]._value, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
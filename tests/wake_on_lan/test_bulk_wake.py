@@ -0,0 +1,58 @@
+import asyncio
+import socket
+import unittest
+from unittest.mock import patch
+
+from src.server.wake_on_lan.bulk_wake import BulkWaker
+
+MAC_ADDRESS = "aa:bb:cc:dd:ee:ff"
+
+
+class TestBulkWaker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(("127.0.0.1", 0))
+        self.receiver.settimeout(1)
+        self.addCleanup(self.receiver.close)
+        self.waker = BulkWaker(packets_per_second=1000, subnets=["10.0.0.0/24"],
+                               port=self.receiver.getsockname()[1], resend_interval=0, max_resends=2,
+                               check_interval=0)
+
+    def test_directed_broadcast(self):
+        self.assertEqual(self.waker.get_destination("10.0.0.42"), "10.0.0.255")
+        self.assertEqual(self.waker.get_destination("127.0.0.1"), "127.0.0.1")
+
+    def test_resends_until_awake(self):
+        scans = iter([{"127.0.0.1": False}, {"127.0.0.1": True}])
+
+        async def scan(*_args, **_kwargs):
+            return next(scans)
+
+        async def scenario():
+            wake_task = self.waker.start([(MAC_ADDRESS, "127.0.0.1")])
+            self.assertTrue(self.waker.is_waking("127.0.0.1"))
+            self.assertTrue(await self.waker.wait_until_awake("127.0.0.1"))
+            await wake_task
+
+        with patch("src.server.wake_on_lan.bulk_wake.scan_reachability", scan):
+            asyncio.run(scenario())
+
+        for _ in range(2):
+            packet, _ = self.receiver.recvfrom(1024)
+            self.assertEqual(packet[:6], b"\xff" * 6)
+            self.assertEqual(packet[6:12], bytes.fromhex("aabbccddeeff"))
+
+    def test_gives_up_after_max_resends(self):
+        async def scan(*_args, **_kwargs):
+            return {"127.0.0.1": False}
+
+        async def scenario():
+            await self.waker.start([(MAC_ADDRESS, "127.0.0.1")])
+            return await self.waker.wait_until_awake("127.0.0.1")
+
+        with patch("src.server.wake_on_lan.bulk_wake.scan_reachability", scan):
+            self.assertFalse(asyncio.run(scenario()))
+
+
+if __name__ == '__main__':
+    unittest.main()